@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_EXTENSOES_DELTA = {
+    "spark.sql.extensions": "io.delta.sql.DeltaSparkSessionExtension",
+    "spark.sql.catalog.spark_catalog": "org.apache.spark.sql.delta.catalog.DeltaCatalog",
+}
+
+
+def _construtor():
+    from pyspark.sql import SparkSession
+
+    return SparkSession.builder \
+        .master("local[2]") \
+        .appName("testes_utils") \
+        .config("spark.ui.enabled", "false") \
+        .config("spark.sql.shuffle.partitions", "4") \
+        .config("spark.sql.session.timeZone", "UTC")
+
+
+@pytest.fixture(scope="session")
+def spark():
+    """SparkSession local; com Delta quando os jars do delta-spark puderem ser resolvidos."""
+    pytest.importorskip("pyspark")
+    if not os.environ.get("JAVA_HOME") and shutil.which("java") is None:
+        pytest.skip("Java não encontrado para o Spark local")
+
+    sessao = None
+    try:
+        from delta import configure_spark_with_delta_pip
+
+        construtor = _construtor()
+        for chave, valor in _EXTENSOES_DELTA.items():
+            construtor = construtor.config(chave, valor)
+        sessao = configure_spark_with_delta_pip(construtor).getOrCreate()
+        sessao.range(1).write.format("delta").mode("overwrite").save(os.path.join(
+            sessao.conf.get("spark.local.dir", "/tmp"), "_sonda_delta"))
+        sessao.delta_disponivel = True
+    except Exception:
+        if sessao is not None:
+            sessao.stop()
+        sessao = _construtor().getOrCreate()
+        sessao.delta_disponivel = False
+    yield sessao
+    sessao.stop()
+
+
+@pytest.fixture
+def spark_delta(spark):
+    if not spark.delta_disponivel:
+        pytest.skip("Delta Lake indisponível no Spark local (jars do delta-spark)")
+    return spark
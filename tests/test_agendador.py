@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from utils.agendador import Etapa, caminho_critico, executar_dag  # noqa: E402
+
+
+class _Conf:
+    def get(self, chave, padrao=None):
+        return "FAIR" if chave == "spark.scheduler.mode" else padrao
+
+
+class _Contexto:
+    """Só o que executar_dag usa do SparkContext: conf e propriedades locais."""
+
+    def __init__(self):
+        self.pools = []
+        self._trava = threading.Lock()
+
+    def getConf(self):
+        return _Conf()
+
+    def setLocalProperty(self, chave, valor):
+        if valor is not None:
+            with self._trava:
+                self.pools.append(valor)
+
+    def setJobDescription(self, descricao):
+        pass
+
+
+class _Sessao:
+    def __init__(self):
+        self.sparkContext = _Contexto()
+
+
+def _registrando(ordem, nome, retorno=None, espera=0.0):
+    def funcao(deps):
+        ordem.append(("inicio", nome, dict(deps)))
+        time.sleep(espera)
+        ordem.append(("fim", nome))
+        return nome if retorno is None else retorno
+    return funcao
+
+
+def test_executa_na_ordem_das_dependencias():
+    ordem = []
+    etapas = [
+        Etapa("fato", _registrando(ordem, "fato"), ("dim_a", "dim_b")),
+        Etapa("dim_b", _registrando(ordem, "dim_b"), ("dim_a",)),
+        Etapa("dim_a", _registrando(ordem, "dim_a", retorno=42)),
+    ]
+    sessao = _Sessao()
+    res = executar_dag(sessao, etapas, prefixo_pool="gold")
+
+    inicios = [e[1] for e in ordem if e[0] == "inicio"]
+    assert inicios == ["dim_a", "dim_b", "fato"]
+    assert ("inicio", "dim_b", {"dim_a": 42}) in ordem
+    assert ("inicio", "fato", {"dim_a": 42, "dim_b": "dim_b"}) in ordem
+    assert res.resultados == {"dim_a": 42, "dim_b": "dim_b", "fato": "fato"}
+    assert sorted(sessao.sparkContext.pools) == ["gold_dim_a", "gold_dim_b", "gold_fato"]
+
+
+def test_etapas_independentes_rodam_ao_mesmo_tempo():
+    # Cada etapa só termina se as três estiverem rodando juntas
+    barreira = threading.Barrier(3, timeout=10)
+
+    def esperar(_):
+        barreira.wait()
+        return threading.get_ident()
+
+    etapas = [Etapa(f"dim_{i}", esperar) for i in range(3)] + [
+        Etapa("fato", lambda deps: len(set(deps.values())), ("dim_0", "dim_1", "dim_2"))
+    ]
+    res = executar_dag(_Sessao(), etapas, max_paralelo=3)
+    assert res.resultados["fato"] == 3
+
+
+def test_falha_propaga_e_nao_inicia_dependentes():
+    ordem = []
+
+    def falhar(_):
+        raise RuntimeError("gravação falhou")
+
+    etapas = [
+        Etapa("dim_a", falhar),
+        Etapa("dim_b", _registrando(ordem, "dim_b"), ("dim_a",)),
+        Etapa("fato", _registrando(ordem, "fato"), ("dim_b",)),
+    ]
+    with pytest.raises(RuntimeError, match="gravação falhou"):
+        executar_dag(_Sessao(), etapas)
+    assert ordem == []
+
+
+def test_falha_cancela_etapas_na_fila():
+    ordem = []
+    liberar = threading.Event()
+
+    def falhar(_):
+        liberar.wait(10)
+        raise RuntimeError("falhou")
+
+    # Com um único worker as etapas independentes ficam na fila atrás de dim_a
+    etapas = [Etapa("dim_a", falhar)] + [Etapa(f"dim_{i}", _registrando(ordem, f"dim_{i}")) for i in range(3)]
+    threading.Timer(0.2, liberar.set).start()
+    with pytest.raises(RuntimeError):
+        executar_dag(_Sessao(), etapas, max_paralelo=1)
+    assert ordem == []
+
+
+@pytest.mark.parametrize("etapas, mensagem", [
+    ([Etapa("a", None, ("b",)), Etapa("b", None, ("a",))], "Ciclo"),
+    ([Etapa("a", None), Etapa("b", None, ("c",))], "inexistentes"),
+    ([Etapa("a", None), Etapa("a", None)], "repetidos"),
+])
+def test_dag_invalido(etapas, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        executar_dag(_Sessao(), etapas)
+
+
+def test_caminho_critico():
+    etapas = [
+        Etapa("dim_a", None),
+        Etapa("dim_b", None),
+        Etapa("dim_cliente", None, ("dim_b",)),
+        Etapa("fato", None, ("dim_a", "dim_cliente")),
+    ]
+    tempos = {"dim_a": (0.0, 5.0), "dim_b": (0.0, 2.0), "dim_cliente": (2.0, 6.0), "fato": (6.0, 7.0)}
+    caminho, duracao = caminho_critico(etapas, tempos)
+    assert caminho == ["dim_b", "dim_cliente", "fato"]
+    assert duracao == pytest.approx(7.0)
+    assert caminho_critico([], {}) == ([], 0.0)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip("pyspark")
+
+from pyspark import StorageLevel  # noqa: E402
+
+from utils import cache  # noqa: E402
+
+
+def test_escolher_nivel():
+    mb = 1024 ** 2
+    assert cache.escolher_nivel(10 * mb, 1, 1000 * mb) is None
+    assert cache.escolher_nivel(10 * mb, 3, 1000 * mb) == StorageLevel.MEMORY_AND_DISK_DESER
+    assert cache.escolher_nivel(600 * mb, 3, 1000 * mb) == StorageLevel.MEMORY_AND_DISK
+    assert cache.escolher_nivel(5000 * mb, 3, 1000 * mb) == StorageLevel.DISK_ONLY
+    assert cache.escolher_nivel(5000 * mb, 2, 1000 * mb) is None
+
+
+def test_tamanho_estimado_vem_do_plano(spark):
+    tamanho = cache.tamanho_estimado(spark.range(1000))
+    assert isinstance(tamanho, int) and tamanho > 0
+
+
+def test_gerenciador_libera_no_ultimo_consumidor(spark):
+    with cache.GerenciadorCache(spark) as gerenciador:
+        df = gerenciador.registrar("numeros", spark.range(100), consumidores=2)
+        assert df.storageLevel == StorageLevel.MEMORY_AND_DISK_DESER
+        with gerenciador.consumir("numeros") as d:
+            assert d.count() == 100
+        assert gerenciador.pendentes() == {"numeros": 1}
+        with gerenciador.consumir("numeros"):
+            pass
+        assert gerenciador.pendentes() == {}
+        assert not df.is_cached
+
+
+def test_acerto_cache_so_dos_caches_registrados(spark):
+    # Um cache de fora do gerenciador não entra na conta
+    externo = spark.range(10).persist(StorageLevel.MEMORY_ONLY)
+    externo.count()
+    try:
+        with cache.GerenciadorCache(spark) as gerenciador:
+            usado = gerenciador.registrar("usado", spark.range(100).repartition(3), consumidores=2)
+            gerenciador.registrar("nao_lido", spark.range(50), consumidores=2)
+            with gerenciador.etapa("leitura"):
+                usado.count()
+            metricas = gerenciador.metricas[0]
+            assert metricas.acerto_por_cache == {"usado": 1.0}
+            assert metricas.acerto_cache == 1.0
+    finally:
+        externo.unpersist()
+
+
+def test_encerrar_libera_pendentes(spark):
+    gerenciador = cache.GerenciadorCache(spark)
+    df = gerenciador.registrar("numeros", spark.range(10), consumidores=3)
+    df.count()
+    gerenciador.encerrar()
+    assert gerenciador.pendentes() == {}
+    assert not df.is_cached
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import cronograma
+
+
+def _entrada():
+    transacoes = pd.DataFrame({
+        "transacao_id": [1, 2, 3, 4],
+        "estab_pos_id": [10, 10, 20, 20],
+        "data_transacao": pd.to_datetime(["2024-01-05 10:00", "2024-01-05 15:00", "2024-01-06 00:00", "2024-01-07 00:00"]),
+        "valor_transacao": [100.0, 50.0, 100.01, 30.0],
+        "num_parcelas": [0, 2, 3, 1],
+    })
+    estab_pos = pd.DataFrame({
+        "estab_pos_id": [10, 20],
+        "estab_id": [1, 2],
+        "taxa_mdr": [2.0, 1.0],
+        "taxa_juros": [0.0, 3.0],
+        "taxa_rav": [1.5, 2.0],
+    })
+    return transacoes, estab_pos
+
+
+def test_expandir_parcelas_resto_na_primeira():
+    transacoes, estab_pos = _entrada()
+    parcelas = cronograma.expandir_parcelas(cronograma.taxas_por_transacao(transacoes, estab_pos))
+
+    assert len(parcelas) == 2 + 3 + 1
+    t3 = parcelas[parcelas["transacao_id"] == 3]
+    assert t3["valor_parcela"].tolist() == [33.35, 33.33, 33.33]
+    assert t3["transacao_parc_id"].tolist() == [301, 302, 303]
+    assert t3["data_vencimento"].tolist() == list(pd.to_datetime(["2024-02-05", "2024-03-06", "2024-04-05"]))
+
+
+def test_calendario_liquidacao_com_antecipacao():
+    transacoes, estab_pos = _entrada()
+    antecipacoes = pd.DataFrame({"transacao_parc_id": [202], "nr_dias_antecipados": [15]})
+    cal = cronograma.calendario_liquidacao(transacoes, estab_pos, antecipacoes)
+
+    ant = cal["antecipacoes"].iloc[0]
+    assert ant["valor_rav"] == pytest.approx(round(25.0 * 0.015 * 15 / 30, 2))
+    assert ant["data_vencimento_antecipado"] == pd.Timestamp("2024-02-19")
+
+    rec = cal["recebiveis"]
+    parcela = rec[rec["transacao_parc_id"] == 202].iloc[0]
+    assert parcela["data_recebimento"] == pd.Timestamp("2024-02-19")
+    assert parcela["valor_rav"] == ant["valor_rav"]
+
+    # Débito de 100 recebido no dia, um título por (estab_id, data)
+    recebimentos = cal["recebimentos"]
+    assert recebimentos["recebimento_id"].is_unique
+    debito = recebimentos[(recebimentos["estab_id"] == 1)
+                          & (recebimentos["data_recebimento"] == pd.Timestamp("2024-01-05"))].iloc[0]
+    assert debito["valor_titulo_bruto"] == 100.0
+    assert debito["valor_liquido"] == 98.0
+    assert np.isclose(recebimentos["valor_titulo_bruto"].sum(), rec["valor_bruto"].sum())
+
+
+@pytest.mark.parametrize("com_antecipacao", [False, True])
+def test_cronograma_spark_igual_ao_pandas(spark, com_antecipacao):
+    transacoes, estab_pos = _entrada()
+    antecipacoes = pd.DataFrame({"transacao_parc_id": [202, 302], "nr_dias_antecipados": [15, 5]})
+    esperado = cronograma.calendario_liquidacao(
+        transacoes, estab_pos, antecipacoes if com_antecipacao else None
+    )
+
+    df_recebiveis, df_recebimentos = cronograma.cronograma_spark(
+        spark.createDataFrame(transacoes),
+        spark.createDataFrame(estab_pos),
+        spark.createDataFrame(antecipacoes) if com_antecipacao else None,
+        n_baldes=3,
+    )
+    recebiveis = df_recebiveis.toPandas()
+    recebimentos = df_recebimentos.toPandas().sort_values("recebimento_id").reset_index(drop=True)
+
+    assert len(recebiveis) == len(esperado["recebiveis"])
+    assert recebiveis["valor_rav"].sum() == pytest.approx(esperado["recebiveis"]["valor_rav"].sum())
+    assert recebimentos["recebimento_id"].tolist() == esperado["recebimentos"]["recebimento_id"].tolist()
+    assert recebimentos["valor_liquido"].tolist() == pytest.approx(esperado["recebimentos"]["valor_liquido"].tolist())
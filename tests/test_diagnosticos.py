@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyspark")
+
+from utils import diagnosticos  # noqa: E402
+
+
+def test_histograma_do_sketch_aproxima_contagens():
+    x = np.random.default_rng(0).normal(size=20_000)
+    probabilidades = diagnosticos._grade_probabilidades(1000)
+    quantis = np.quantile(x, probabilidades)
+    hist = diagnosticos._histograma_do_sketch(probabilidades, quantis, len(x), x.min(), x.max(), 20)
+    esperado, _ = np.histogram(x, bins=hist.limites)
+
+    assert not hist.exato
+    assert hist.contagens.sum() == pytest.approx(len(x))
+    assert np.abs(hist.contagens - esperado).max() < 0.01 * len(x)
+
+
+def test_diagnostico_spark_com_limites_exatos(spark):
+    rng = np.random.default_rng(1)
+    pdf = pd.DataFrame({"normal": rng.normal(10.0, 2.0, 5000),
+                        "TotalVendas": [f"{v:,.2f}" for v in rng.exponential(1500.0, 5000)]})
+    df = spark.createDataFrame(pdf)
+    limites = np.linspace(0.0, 20.0, 11)
+
+    diag = diagnosticos.diagnosticar_colunas(df, ["normal", "TotalVendas"], n_quantis=200,
+                                             limites={"normal": limites})
+    normal, vendas = diag["normal"], diag["TotalVendas"]
+
+    assert normal.histograma.exato
+    assert normal.histograma.contagens.tolist() == np.histogram(pdf["normal"], bins=limites)[0].tolist()
+    assert not vendas.histograma.exato and len(vendas.histograma.contagens) == 30
+    assert normal.media == pytest.approx(pdf["normal"].mean())
+    assert normal.ks.p_valor > 0.01
+    assert vendas.jarque_bera.p_valor < 1e-6
+    assert normal.anderson.estatistica < normal.anderson.valores_criticos[-1]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import gerador_fake as gf
+
+pytest.importorskip("faker")
+
+
+def _iguais(a, b):
+    assert a.keys() == b.keys()
+    for nome in a:
+        pd.testing.assert_frame_equal(a[nome], b[nome], check_like=False)
+
+
+def test_mesma_semente_mesmos_dados():
+    # As tabelas usam data_hora() com "agora"; congela o relógio entre as gerações
+    with mock.patch.object(gf, "datetime", wraps=datetime) as relogio:
+        relogio.now.return_value = datetime(2025, 6, 1, 12, 0, 0)
+        primeira = gf.gerar_modelo(gf.ESPEC_PAGAMENTOS, semente=42)
+        segunda = gf.gerar_modelo(gf.ESPEC_PAGAMENTOS, semente=42)
+        outra = gf.gerar_modelo(gf.ESPEC_PAGAMENTOS, semente=7)
+
+    assert len(primeira) == 13
+    _iguais(primeira, segunda)
+    assert not primeira["cidades"]["nome"].equals(outra["cidades"]["nome"])
+
+
+def test_data_hora_le_agora_na_geracao():
+    gerador = gf.data_hora()
+    ctx = {"n": 50, "rng": np.random.default_rng(0)}
+    with mock.patch.object(gf, "datetime", wraps=datetime) as relogio:
+        relogio.now.return_value = datetime(2031, 3, 1)
+        valores = gerador(ctx)
+    assert valores.min() >= np.datetime64("2030-01-01")
+    assert valores.max() < np.datetime64("2031-03-01")
+
+
+def test_integridade_referencial_e_parcelas():
+    tabelas = gf.gerar_modelo(gf.ESPEC_PAGAMENTOS, semente=1)
+    transacoes, estab_pos = tabelas["transacoes"], tabelas["estabelecimento_pos"]
+
+    assert transacoes["estab_pos_id"].isin(estab_pos["estab_pos_id"]).all()
+    assert tabelas["enderecos"]["cidade_id"].isin(tabelas["cidades"]["cidade_id"]).all()
+    limite = transacoes.merge(estab_pos, on="estab_pos_id")
+    assert (limite["num_parcelas"] <= limite["num_parcela"].clip(lower=1)).all()
+
+    parcelas = tabelas["transacoes_parcelas"]
+    por_transacao = parcelas.groupby("transacao_id")["valor_parcela"].sum().round(2)
+    valores = transacoes.set_index("transacao_id")["valor_transacao"].reindex(por_transacao.index)
+    assert np.allclose(por_transacao, valores)
+
+    # Parcelas de crédito pagam juros de 1% a 5%
+    assert (parcelas["valor_juros"] > 0).any()
+    taxa = (parcelas["valor_juros"] / parcelas["valor_parcela"])[parcelas["valor_parcela"] >= 10]
+    assert taxa.between(0.0099, 0.0501).all()
+
+
+def test_cnpj_digitos_verificadores():
+    numeros = gf.cnpj(formatado=False)({"n": 200, "rng": np.random.default_rng(3)})
+    for numero in numeros:
+        d = [int(c) for c in numero]
+        for tamanho, pesos in ((12, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]),
+                               (13, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])):
+            resto = sum(x * p for x, p in zip(d[:tamanho], pesos)) % 11
+            assert d[tamanho] == (0 if resto < 2 else 11 - resto)
+
+
+@pytest.mark.parametrize("semente", [0, 3, 5])
+def test_desativacao_so_com_ativacao(semente):
+    pos = gf.gerar_modelo(gf.ESPEC_PAGAMENTOS, semente=semente)["estabelecimento_pos"]
+    assert not (pos["data_ativacao"].isna() & pos["data_desativacao"].notna()).any()
+    ativados = pos.dropna(subset=["data_desativacao"])
+    assert (ativados["data_desativacao"] > ativados["data_ativacao"]).all()
+
+
+def test_derivada_herda_nulos_da_origem():
+    tabela = gf.Tabela("t", 500, [
+        gf.Coluna("inicio", gf.data_hora(datetime(2020, 1, 1), datetime(2021, 1, 1)), taxa_nulos=0.5),
+        gf.Coluna("fim", gf.deslocar_dias("inicio", 1, 10)),
+        gf.Coluna("copia", gf.copiar("fim"), taxa_nulos=0.1),
+    ])
+    df = gf.gerar_tabela(tabela, {}, np.random.default_rng(0))
+    assert df["fim"].isna().equals(df["inicio"].isna())
+    assert (df["copia"].isna() >= df["fim"].isna()).all()
+    assert df["copia"].isna().sum() > df["fim"].isna().sum()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyspark")
+
+from utils import indice, layout  # noqa: E402
+
+Entrada = namedtuple("Entrada", ["arquivo", "minimo", "maximo", "bits", "hashes", "bloom"])
+
+
+def _entrada(arquivo, valores):
+    textos = np.array([str(v) for v in valores], dtype=object)
+    bits, hashes = indice._dimensionar(len(textos), indice.FPP_PADRAO)
+    return Entrada(arquivo, str(min(valores)), str(max(valores)), bits, hashes,
+                   indice._construir_bloom(textos, bits, hashes))
+
+
+def test_bloom_sem_falso_negativo_e_fpp_baixa():
+    presentes = np.array([f"cliente{i}@x.com" for i in range(5000)], dtype=object)
+    ausentes = np.array([f"outro{i}@y.com" for i in range(20000)], dtype=object)
+    bits, hashes = indice._dimensionar(len(presentes), 0.01)
+    bloom = indice._construir_bloom(presentes, bits, hashes)
+
+    assert indice._bloom_contem(bloom, bits, hashes, presentes).all()
+    assert indice._bloom_contem(bloom, bits, hashes, ausentes).mean() < 0.02
+
+
+def test_podem_conter_usa_min_max_e_bloom():
+    entradas = [
+        _entrada("a.parquet", [1, 2, 3]),
+        _entrada("b.parquet", [10, 12, 14]),
+        _entrada("c.parquet", [100, 200]),
+    ]
+    assert indice._podem_conter(entradas, [12], numerico=True) == ["b.parquet"]
+    assert indice._podem_conter(entradas, [2, 200], numerico=True) == ["a.parquet", "c.parquet"]
+    # Fora de todos os intervalos: nenhum arquivo; dentro do intervalo de b
+    # só b pode ser candidato (o Bloom ainda pode dar falso positivo)
+    assert indice._podem_conter(entradas, [50], numerico=True) == []
+    assert set(indice._podem_conter(entradas, [13], numerico=True)) <= {"b.parquet"}
+
+
+def test_resumir_arquivo():
+    pdf = pd.DataFrame({
+        "_arquivo": ["f1"] * 4,
+        "sk_cliente": [5, 3, None, 9],
+        "_str_sk_cliente": ["5", "3", None, "9"],
+    })
+    resumo = indice._resumir_arquivo(["sk_cliente"], 0.01)(pdf).iloc[0]
+    assert (resumo["n_linhas"], resumo["n_distintos"]) == (4, 3)
+    assert (resumo["minimo"], resumo["maximo"]) == ("3.0", "9.0")
+    assert indice._bloom_contem(resumo["bloom"], resumo["bits"], resumo["hashes"],
+                                np.array(["3", "5", "9"], dtype=object)).all()
+
+
+def test_ler_arquivos_le_so_os_candidatos(spark, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    caminho = str(tmp_path / "vendas com espaço")
+    spark.range(0, 400).selectExpr("id AS customer_id", "id % 2 AS grupo") \
+        .repartition(4, "customer_id") \
+        .write.partitionBy("grupo").parquet(caminho)
+    tabela = spark.read.parquet(caminho)
+    arquivos = sorted(indice._normalizar(a) for a in tabela.inputFiles())
+    assert len(arquivos) > 2 and " " in arquivos[0]
+
+    dados = indice._ler_arquivos(spark, caminho, arquivos[:1], tabela.schema)
+    lidos, _ = layout.bytes_varridos(spark, dados)
+
+    assert lidos == 1 < len(arquivos)
+    assert dados.columns == tabela.columns
+    assert dados.count() == pq.read_metadata(arquivos[0].replace("file:", "", 1)).num_rows
+    assert {r.grupo for r in dados.select("grupo").distinct().collect()} == {int(arquivos[0].split("grupo=")[1][0])}
+
+
+def test_buscar_inclui_arquivos_fora_do_indice_e_respeita_deletes(spark_delta, tmp_path):
+    spark = spark_delta
+    caminho = str(tmp_path / "clientes")
+    spark.range(0, 100).withColumnRenamed("id", "customer_id").coalesce(1) \
+        .write.format("delta").save(caminho)
+    indice.atualizar_indice(spark, caminho, ["customer_id"])
+
+    # Arquivo gravado sem atualizar o índice
+    spark.range(100, 200).withColumnRenamed("id", "customer_id").coalesce(1) \
+        .write.format("delta").mode("append").save(caminho)
+    assert [r.customer_id for r in indice.buscar(spark, caminho, "customer_id", [150]).collect()] == [150]
+    # Só o arquivo de 0..99 é podado; o de 100..199 (fora do índice) é lido
+    lidos, _ = layout.bytes_varridos(spark, indice.buscar(spark, caminho, "customer_id", [150]))
+    assert lidos == 1 < len(spark.read.format("delta").load(caminho).inputFiles())
+
+    from delta.tables import DeltaTable
+
+    DeltaTable.forPath(spark, caminho).delete("customer_id = 42")
+    indice.atualizar_indice(spark, caminho, ["customer_id"])
+    assert indice.buscar(spark, caminho, "customer_id", [42]).count() == 0
+    assert indice.buscar(spark, caminho, "customer_id", [41]).count() == 1
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyspark")
+
+from utils import layout  # noqa: E402
+
+
+def _amostra(n=4000, semente=0):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        "Ano": rng.choice([2011, 2012, 2013], n),
+        "Mes": rng.integers(1, 13, n),
+        "IDCliente": rng.integers(0, 500, n),
+    })
+
+
+def _consultas(filtros):
+    return [layout.Consulta("t", layout._normalizar_filtros(f), [], [], 0.0) for f in filtros]
+
+
+def test_arquivos_simulados_respeitam_particao_e_tamanho():
+    amostra = _amostra()
+    codigos, _ = layout._codificar(amostra, ["Ano", "Mes"])
+    arquivos = layout._arquivos_simulados(codigos, layout.Layout(("Ano",), ("Mes",)), 500)
+
+    por_arquivo = amostra.groupby(arquivos)
+    assert (por_arquivo["Ano"].nunique() == 1).all()
+    assert por_arquivo.size().max() <= 500
+
+
+def test_simular_particao_pula_arquivos():
+    amostra = _amostra()
+    codigos, universos = layout._codificar(amostra, ["Ano", "Mes"])
+    consultas = _consultas([{"Ano": 2012, "Mes": 10}])
+
+    # Arquivos atuais em ordem de chegada: todos contêm todos os anos
+    chegada = np.arange(len(amostra)) // 500
+    atual = layout._simular(codigos, chegada, layout.LAYOUT_ATUAL, consultas, universos)
+    proposto = layout.Layout(("Ano",), ("Mes",))
+    simulado = layout._simular(codigos, layout._arquivos_simulados(codigos, proposto, 500),
+                               proposto, consultas, universos)
+
+    assert atual.fracao_lida == 1.0
+    assert simulado.fracao_lida < 0.34
+
+
+def test_candidatos_limitam_cardinalidade_da_particao():
+    frequencias = {"filtro": Counter({"Ano": 3, "IDCliente": 2}), "junta": Counter(), "agrupamento": Counter()}
+    cards = {"Ano": 3, "IDCliente": 50000}
+    layouts = layout.candidatos(frequencias, cards)
+
+    assert layout.Layout(("Ano",), ("IDCliente",)) in layouts
+    assert all("IDCliente" not in l.particao for l in layouts)
+    assert layout.Layout((), ("Ano", "IDCliente"), "cluster") in layouts
+
+
+def test_escolher_mantem_layout_atual_sem_ganho():
+    atual = layout.Simulacao(layout.LAYOUT_ATUAL, 0.5, 10, [0.5])
+    sem_particao = layout.Simulacao(layout.Layout((), ()), 0.5, 8, [0.5])
+    pouco_melhor = layout.Simulacao(layout.Layout(("Ano",), ()), 0.48, 12, [0.48])
+    assert layout._escolher(atual, [sem_particao, pouco_melhor]) is atual
+    assert layout._escolher(atual, []) is atual
+
+    melhor = layout.Simulacao(layout.Layout(("Ano",), ("Mes",)), 0.2, 12, [0.2])
+    assert layout._escolher(atual, [sem_particao, melhor]) is melhor
+
+
+def test_aplicar_layout_atual_recusado():
+    with pytest.raises(ValueError):
+        layout.aplicar_layout(None, "/tmp/tabela", layout.LAYOUT_ATUAL)
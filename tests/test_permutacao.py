@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from scipy import stats
+
+from utils import permutacao
+
+
+def test_duas_amostras_proximo_do_scipy():
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(0.0, 1.0, 30), rng.normal(0.6, 1.0, 25)
+    res = permutacao.teste_permutacao_duas_amostras(a, b, n_permutacoes=20_000, parada_antecipada=False, semente=1)
+    referencia = stats.permutation_test(
+        (a, b), lambda x, y: x.mean() - y.mean(), n_resamples=20_000, random_state=1
+    )
+
+    assert res.estatistica == pytest.approx(a.mean() - b.mean())
+    assert res.n_permutacoes == 20_000 and not res.parada_antecipada
+    assert res.p_valor == pytest.approx(referencia.pvalue, abs=0.01)
+
+
+def test_mesma_semente_mesmo_resultado_e_parada_antecipada():
+    rng = np.random.default_rng(1)
+    a, b = rng.normal(0.0, 1.0, 40), rng.normal(2.0, 1.0, 40)
+    primeiro = permutacao.teste_permutacao_duas_amostras(a, b, semente=5)
+    segundo = permutacao.teste_permutacao_duas_amostras(a, b, semente=5)
+
+    assert primeiro == segundo
+    assert primeiro.parada_antecipada
+    assert primeiro.n_permutacoes < 10_000
+    assert primeiro.p_valor < 0.05
+
+
+def test_pareado_e_k_grupos():
+    rng = np.random.default_rng(2)
+    antes = rng.normal(10.0, 1.0, 20)
+    res = permutacao.teste_permutacao_pareado(antes + 0.01 * rng.normal(size=20), antes, semente=0)
+    assert res.p_valor > 0.05
+
+    grupos = [rng.normal(m, 1.0, 15) for m in (0.0, 0.0, 1.5)]
+    res = permutacao.teste_permutacao_k_grupos(*grupos, semente=0)
+    assert res.estatistica == pytest.approx(stats.f_oneway(*grupos).statistic)
+    assert res.p_valor < 0.05
+
+    with pytest.raises(ValueError):
+        permutacao.teste_permutacao_pareado([1.0, 2.0], [1.0])
+    with pytest.raises(TypeError):
+        permutacao.teste_permutacao_duas_amostras([1.0], [2.0], permutacoes=10)
+
+
+def test_qui_quadrado_monte_carlo_e_exato():
+    x = np.array(["a"] * 30 + ["b"] * 30)
+    y = np.array(["s"] * 22 + ["n"] * 8 + ["s"] * 10 + ["n"] * 20)
+    tabela = np.array([[8, 22], [20, 10]])
+
+    mc = permutacao.teste_qui_quadrado_permutacao(x, y, n_permutacoes=20_000, parada_antecipada=False, semente=3)
+    qui2, p_assintotico = stats.chi2_contingency(tabela, correction=False)[:2]
+    assert mc.estatistica == pytest.approx(qui2)
+    assert mc.p_valor == pytest.approx(p_assintotico, abs=0.01)
+
+    # O exato devolve a razão de chances de Fisher junto com o p-valor de Fisher
+    exato = permutacao.teste_qui_quadrado_permutacao(x, y, metodo="exato")
+    razao_chances, p_fisher = stats.fisher_exact(tabela)
+    assert exato.estatistica == pytest.approx(razao_chances)
+    assert exato.p_valor == pytest.approx(p_fisher)
+
+    with pytest.raises(ValueError):
+        permutacao.teste_qui_quadrado_permutacao(x, np.r_[y[:-1], "talvez"], metodo="exato")
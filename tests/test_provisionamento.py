@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils import provisionamento
+from utils.provisionamento import Catalogo, Esquema, Tabela, Volume, planejar, provisionar
+
+COLUNAS = [("id", "BIGINT"), ("nome", "STRING")]
+
+ESPEC = Catalogo("cat_teste", [
+    Esquema("bronze",
+            volumes=[Volume("vol_data")],
+            tabelas=[Tabela("clientes", COLUNAS, local="dbfs:/mnt/bronze/clientes",
+                            propriedades=provisionamento.PROPRIEDADES_CDF)]),
+])
+
+
+class _Sessao:
+    """Registra os comandos executados; o estado vem de _inventario/_detalhe_tabela."""
+
+    def __init__(self):
+        self.comandos = []
+
+    def sql(self, comando):
+        self.comandos.append(comando)
+
+
+def _estado(monkeypatch, existe=True, esquemas=(), volumes=(), tabelas=None):
+    # tabelas: {(esquema, tabela): (local, propriedades, {coluna: tipo})}
+    tabelas = tabelas or {}
+    monkeypatch.setattr(
+        provisionamento, "_inventario",
+        lambda spark, catalogo: (existe, set(esquemas), set(volumes), set(tabelas)),
+    )
+    monkeypatch.setattr(
+        provisionamento, "_detalhe_tabela",
+        lambda spark, nome: tabelas[tuple(nome.split(".")[-2:])],
+    )
+
+
+def _provisionado():
+    """Estado do catálogo logo depois de aplicar ESPEC."""
+    return dict(
+        esquemas={"bronze"},
+        volumes={("bronze", "vol_data")},
+        tabelas={("bronze", "clientes"): (
+            "dbfs:/mnt/bronze/clientes/", {"delta.enableChangeDataFeed": "true"},
+            {"id": "bigint", "nome": "string"},
+        )},
+    )
+
+
+def test_objetos_ausentes_viram_create(monkeypatch):
+    _estado(monkeypatch, existe=False)
+    spark = _Sessao()
+    res = provisionar(spark, ESPEC)
+
+    assert res.conflitos == []
+    assert [a.nivel for a in res.acoes] == [0, 1, 2, 2]
+    assert spark.comandos[0] == "CREATE CATALOG IF NOT EXISTS cat_teste"
+    assert spark.comandos[1] == "CREATE SCHEMA IF NOT EXISTS cat_teste.bronze"
+    assert set(spark.comandos[2:]) == {
+        "CREATE VOLUME IF NOT EXISTS cat_teste.bronze.vol_data",
+        provisionamento._sql_tabela(ESPEC, ESPEC.esquemas[0], ESPEC.esquemas[0].tabelas[0]),
+    }
+
+
+def test_so_cria_o_que_falta(monkeypatch):
+    _estado(monkeypatch, esquemas={"bronze"})
+    spark = _Sessao()
+    res = provisionar(spark, ESPEC)
+
+    assert {a.objeto for a in res.acoes} == {"cat_teste.bronze.vol_data", "cat_teste.bronze.clientes"}
+    assert not any(c.startswith(("CREATE CATALOG", "CREATE SCHEMA")) for c in spark.comandos)
+
+
+def test_coluna_nova_vira_add_columns(monkeypatch):
+    estado = _provisionado()
+    local, propriedades, _ = estado["tabelas"][("bronze", "clientes")]
+    estado["tabelas"][("bronze", "clientes")] = (local, propriedades, {"id": "bigint"})
+    _estado(monkeypatch, **estado)
+
+    acoes, conflitos = planejar(_Sessao(), ESPEC)
+    assert conflitos == []
+    assert [a.sql for a in acoes] == ["ALTER TABLE cat_teste.bronze.clientes ADD COLUMNS (nome STRING)"]
+
+
+def test_propriedades_diferentes_viram_set_tblproperties(monkeypatch):
+    estado = _provisionado()
+    local, _, colunas = estado["tabelas"][("bronze", "clientes")]
+    estado["tabelas"][("bronze", "clientes")] = (local, {"delta.enableChangeDataFeed": "false"}, colunas)
+    _estado(monkeypatch, **estado)
+
+    acoes, conflitos = planejar(_Sessao(), ESPEC)
+    assert conflitos == []
+    assert [a.sql for a in acoes] == [
+        "ALTER TABLE cat_teste.bronze.clientes SET TBLPROPERTIES ('delta.enableChangeDataFeed' = 'true')"
+    ]
+
+
+@pytest.mark.parametrize("local, colunas, trecho", [
+    ("dbfs:/mnt/outro/clientes", {"id": "bigint", "nome": "string"}, "LOCATION"),
+    ("dbfs:/mnt/bronze/clientes", {"id": "int", "nome": "string"}, "clientes.id"),
+])
+def test_conflito_levanta_sem_executar(monkeypatch, local, colunas, trecho):
+    estado = _provisionado()
+    estado["tabelas"][("bronze", "clientes")] = (local, {"delta.enableChangeDataFeed": "true"}, colunas)
+    # Uma ação pendente junto com o conflito: nada pode ser aplicado
+    estado["volumes"] = set()
+    _estado(monkeypatch, **estado)
+    spark = _Sessao()
+
+    with pytest.raises(ValueError, match=trecho):
+        provisionar(spark, ESPEC)
+    assert spark.comandos == []
+
+    res = provisionar(spark, ESPEC, ignorar_conflitos=True)
+    assert len(res.conflitos) == 1
+    assert spark.comandos == ["CREATE VOLUME IF NOT EXISTS cat_teste.bronze.vol_data"]
+
+
+def test_segunda_execucao_sem_acoes(monkeypatch):
+    _estado(monkeypatch, **_provisionado())
+    spark = _Sessao()
+    res = provisionar(spark, ESPEC)
+
+    assert res.acoes == [] and res.conflitos == []
+    assert spark.comandos == []
+
+
+def test_inventario_hive_lista_tabelas_por_show_tables(spark):
+    spark.sql("CREATE DATABASE IF NOT EXISTS prov_teste")
+    spark.sql("CREATE TABLE IF NOT EXISTS prov_teste.t1 (id BIGINT) USING parquet")
+    spark.range(1).createOrReplaceTempView("temporaria_prov")
+    try:
+        espec = Catalogo(None, [Esquema("prov_teste"), Esquema("prov_inexistente")])
+        existe, esquemas, volumes, tabelas = provisionamento._inventario(spark, espec)
+        assert existe
+        assert "prov_teste" in esquemas and "prov_inexistente" not in esquemas
+        assert volumes == set()
+        assert tabelas == {("prov_teste", "t1")}
+    finally:
+        spark.sql("DROP DATABASE IF EXISTS prov_teste CASCADE")
+        spark.catalog.dropTempView("temporaria_prov")
+
+
+def test_provisionar_hive_delta_idempotente(spark_delta, tmp_path):
+    espec = Catalogo(None, [Esquema("prov_delta", tabelas=[
+        Tabela("t", COLUNAS, local=str(tmp_path / "t"), propriedades=provisionamento.PROPRIEDADES_CDF),
+    ])])
+    try:
+        primeira = provisionar(spark_delta, espec)
+        assert [a.nivel for a in primeira.acoes] == [1, 2]
+
+        segunda = provisionar(spark_delta, espec)
+        assert segunda.acoes == [] and segunda.conflitos == []
+    finally:
+        spark_delta.sql("DROP DATABASE IF EXISTS prov_delta CASCADE")
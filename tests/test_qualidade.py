@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip("pyspark")
+
+from utils import qualidade as q  # noqa: E402
+
+
+def _dados(spark):
+    clientes = spark.createDataFrame(
+        [(1, "12345678000195", 10), (2, "123", 10), (2, None, 99), (3, "", None)],
+        "customer_id int, document_number string, cidade_id int",
+    )
+    cidades = spark.createDataFrame([(10,), (20,)], "cidade_id int")
+    regras = [
+        q.nao_nulo("cidade_id"),
+        q.unico("customer_id"),
+        q.regex("document_number", q.REGEX_CNPJ_DIGITOS, nome="cnpj_valido"),
+        q.fk_existe("cidade_id", cidades),
+        q.intervalo("customer_id", minimo=1, maximo=2),
+    ]
+    return clientes, regras
+
+
+def test_validar_conta_violacoes_e_libera_cache(spark):
+    clientes, regras = _dados(spark)
+    persistidos = spark.sparkContext._jsc.getPersistentRDDs().size()
+
+    res = q.validar(clientes, regras, "silver.customers")
+
+    assert res.total_linhas == 4
+    assert res.violacoes == {
+        "nao_nulo_cidade_id": 1, "unico_customer_id": 2, "cnpj_valido": 2,
+        "fk_cidade_id": 1, "intervalo_customer_id": 1,
+    }
+    assert spark.sparkContext._jsc.getPersistentRDDs().size() == persistidos
+
+    linhas = {r.regra: r.taxa_violacao for r in q.metricas(spark, [res]).collect()}
+    assert linhas["unico_customer_id"] == 0.5
+
+
+def test_plano_usa_agregacao_e_left_anti(spark):
+    clientes, regras = _dados(spark)
+    plano = q._anotar(clientes, regras)._jdf.queryExecution().optimizedPlan().toString()
+    assert "Window" not in plano
+    assert "LeftAnti" in plano
+
+
+def test_unico_composto_trata_nulos_como_iguais(spark):
+    df = spark.createDataFrame([(1, None), (1, None), (1, 2), (2, 2)], "a int, b int")
+    res = q.validar(df, [q.unico("a", "b")], "t")
+    assert res.violacoes == {"unico_a_b": 2}
+
+
+def test_nomes_de_regra_repetidos(spark):
+    clientes, _ = _dados(spark)
+    with pytest.raises(ValueError):
+        q.validar(clientes, [q.nao_nulo("cidade_id"), q.nao_nulo("cidade_id")], "t")
+
+
+def test_quarentena_recebe_so_as_linhas_violadas(spark_delta, tmp_path):
+    clientes, regras = _dados(spark_delta)
+    q.validar(clientes, regras, "customers", caminho_quarentena=str(tmp_path))
+
+    quarentena = spark_delta.read.format("delta").load(str(tmp_path / "customers"))
+    regras_por_id = {r.customer_id: sorted(r.dq_regras) for r in quarentena.collect() if r.customer_id != 2}
+    assert quarentena.count() == 3
+    assert regras_por_id == {3: ["cnpj_valido", "intervalo_customer_id", "nao_nulo_cidade_id"]}
+    assert not [c for c in quarentena.columns if c.startswith("_dq_")]
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os
+
+import pytest
+
+pyspark = pytest.importorskip("pyspark")
+
+from pyspark.sql import functions as F  # noqa: E402
+
+from utils.snapshot import SnapshotCache  # noqa: E402
+
+
+def _registrar_varias(diretorio, processo, n):
+    cache = SnapshotCache(None, diretorio)
+    for i in range(n):
+        chave = cache._chave(f"/tabela_{processo}", i)
+        with open(cache._arquivo(chave), "wb") as f:
+            f.write(b"x" * 10)
+        cache._registrar(chave, f"/tabela_{processo}", i)
+
+
+@pytest.mark.skipif(os.name != "posix", reason="trava entre processos usa fcntl")
+def test_indice_consistente_com_varios_processos(tmp_path):
+    contexto = multiprocessing.get_context("fork")
+    processos = [contexto.Process(target=_registrar_varias, args=(str(tmp_path), p, 25)) for p in range(4)]
+    for p in processos:
+        p.start()
+    for p in processos:
+        p.join()
+
+    entradas = SnapshotCache(None, str(tmp_path)).entradas()
+    assert all(p.exitcode == 0 for p in processos)
+    assert len(entradas) == 4 * 25
+    assert not [a for a in os.listdir(tmp_path) if a.endswith(".tmp")]
+
+
+def test_descarte_lru_e_invalidar(tmp_path):
+    cache = SnapshotCache(None, str(tmp_path), limite_bytes=25)
+    for versao in range(3):
+        chave = cache._chave("/dim", versao)
+        with open(cache._arquivo(chave), "wb") as f:
+            f.write(b"x" * 10)
+        cache._registrar(chave, "/dim", versao)
+
+    assert sorted(e["versao"] for e in cache.entradas()) == [1, 2]
+    assert not os.path.exists(cache._arquivo(cache._chave("/dim", 0)))
+
+    cache.invalidar("/dim/")
+    assert cache.entradas() == []
+
+
+def _gravar_snapshot(cache, caminho, versao, df):
+    import pyarrow.parquet as pq
+    from utils import snapshot
+
+    chave = cache._chave(caminho, versao)
+    pq.write_table(snapshot._tabela_arrow(df), cache._arquivo(chave))
+    cache._registrar(chave, caminho, versao)
+
+
+@pytest.mark.parametrize("arrow", ["true", "false"])
+def test_ler_spark_preserva_schema(spark, tmp_path, arrow):
+    pytest.importorskip("pyarrow")
+    df = spark.createDataFrame(
+        [(1, None, "a", "2024-01-05 10:00:00"), (2, 7, None, None)],
+        "sk_cliente long, sk_geografia int, Nome string, data_atualizacao string",
+    ).withColumn("data_atualizacao", F.to_timestamp("data_atualizacao")) \
+        .withColumn("DataVenda", F.to_date("data_atualizacao"))
+    cache = SnapshotCache(spark, str(tmp_path))
+    _gravar_snapshot(cache, "/gold/dim_cliente", 3, df)
+    _gravar_snapshot(cache, "/gold/dim_vazia", 1, df.limit(0))
+
+    anterior = spark.conf.get("spark.sql.execution.arrow.pyspark.enabled")
+    spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", arrow)
+    try:
+        copia = cache.ler_spark("/gold/dim_cliente", versao=3)
+        vazia = cache.ler_spark("/gold/dim_vazia", versao=1)
+    finally:
+        spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", anterior)
+
+    assert copia.schema == df.schema
+    assert vazia.schema == df.schema and vazia.count() == 0
+    assert sorted(copia.collect()) == sorted(df.collect())
+    assert cache.ler_pandas("/gold/dim_cliente", versao=3)["sk_cliente"].dtype == "int64"
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import csv
+import os
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from utils import streaming  # noqa: E402
+
+_CABECALHO = [f.name for f in streaming.SCHEMA_LZ.fields]
+
+
+def _venda(id_produto, produto, id_cliente, data="2012-10-05"):
+    return {
+        "IDProduto": id_produto, "Data": data, "IDCliente": id_cliente, "IDCampanha": 1, "Unidades": 2,
+        "Produto": produto, "Categoria": "Mix", "Segmento": "Moderação", "IDFabricante": 7,
+        "Fabricante": "VanArsdel", "CustoUnitario": 10.0, "PrecoUnitario": 15.5, "CodigoPostal": "01000-000",
+        "EmailNome": f"(cliente{id_cliente}@exemplo.com):Silva, Ana", "Cidade": "São Paulo, SP",
+        "Estado": "SP", "Regiao": "Sudeste", "Distrito": "Centro", "Pais": "Brasil",
+    }
+
+
+def _gravar_csv(pasta, nome, vendas):
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, nome), "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=_CABECALHO)
+        escritor.writeheader()
+        escritor.writerows(vendas)
+
+
+def _ler(spark, caminhos, tabela):
+    return spark.read.format("delta").load(f"{caminhos.gold}/{tabela}")
+
+
+def test_pipeline_local_dois_lotes_e_reprocessamento(spark_delta, tmp_path):
+    spark = spark_delta
+    caminhos = streaming.caminhos_locais(str(tmp_path))
+
+    _gravar_csv(caminhos.landing, "vendas_1.csv", [_venda(1, "Abbas MA-01", 10), _venda(2, "Abbas MA-02", 11)])
+    streaming.executar_disponivel(spark, caminhos)
+    sk_antes = {r.IDProduto: r.sk_produto for r in _ler(spark, caminhos, "dim_produto").collect()}
+
+    # Segundo lote: produto novo, produto 1 renomeado
+    _gravar_csv(caminhos.landing, "vendas_2.csv", [_venda(1, "Abbas MA-01 Plus", 10), _venda(3, "Abbas MA-03", 12)])
+    streaming.executar_disponivel(spark, caminhos)
+
+    produtos = {r.IDProduto: r for r in _ler(spark, caminhos, "dim_produto").collect()}
+    assert sorted(produtos) == [1, 2, 3]
+    assert produtos[1].Produto == "Abbas MA-01 Plus"
+    assert {k: produtos[k].sk_produto for k in sk_antes} == sk_antes
+    assert produtos[3].sk_produto == max(sk_antes.values()) + 1
+    assert _ler(spark, caminhos, "dim_categoria").count() == 1
+    assert _ler(spark, caminhos, "fato_vendas").count() == 4
+
+    # Reprocessar o último micro-lote não duplica a fato nem altera as dimensões
+    ultimo = max(m["batch_id"] for m in streaming.metricas() if m["query"] == "vendas_gold_foreachBatch")
+    lote = spark.read.format("delta").load(caminhos.silver).filter("filename = 'vendas_2.csv'")
+    versao_produto = spark.sql(f"DESCRIBE HISTORY delta.`{caminhos.gold}/dim_produto`").agg({"version": "max"}).first()[0]
+    streaming.processar_lote_gold(spark, caminhos.gold)(lote, ultimo)
+
+    assert _ler(spark, caminhos, "fato_vendas").count() == 4
+    assert _ler(spark, caminhos, "dim_produto").count() == 3
+    alteradas = spark.sql(f"DESCRIBE HISTORY delta.`{caminhos.gold}/dim_produto`") \
+        .filter(f"version > {versao_produto}") \
+        .select("operationMetrics.numTargetRowsUpdated", "operationMetrics.numTargetRowsInserted") \
+        .collect()
+    assert all(int(r[0] or 0) == 0 and int(r[1] or 0) == 0 for r in alteradas)
+
+
+
+class _Consulta:
+    recentProgress = [{"name": "falsa", "batchId": 0, "numInputRows": 1, "durationMs": {"triggerExecution": 5}}]
+
+    def awaitTermination(self):
+        pass
+
+
+def test_metricas_so_da_ultima_execucao_e_limitadas(monkeypatch):
+    def iniciar(spark, caminhos, trigger):
+        streaming._consultas.append(_Consulta())
+        return _Consulta()
+
+    for estagio in ("iniciar_bronze", "iniciar_silver", "iniciar_gold"):
+        monkeypatch.setattr(streaming, estagio, iniciar)
+    for batch_id in range(streaming._MAX_LOTES_GOLD + 10):
+        streaming._metricas_gold.append({"batch_id": batch_id, "linhas": 1, "latencia_s": 1.0})
+    assert len(streaming._metricas_gold) == streaming._MAX_LOTES_GOLD
+    assert streaming._metricas_gold[0]["batch_id"] == 10
+
+    streaming.executar_disponivel(None)
+    assert [m["query"] for m in streaming.metricas()] == ["falsa"] * 3
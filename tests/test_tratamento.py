@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+import utils
+from utils import tratamento
+
+
+def test_importar_nao_carrega_pyspark():
+    codigo = (
+        "import sys, utils; from utils import tratamento; "
+        "tratamento.tratar_cnpj('12345678000195'); "
+        "assert 'pyspark' not in sys.modules, sorted(m for m in sys.modules if 'pyspark' in m)"
+    )
+    subprocess.run([sys.executable, "-c", codigo], check=True, cwd=os.path.dirname(utils.__path__[0]))
+
+
+def test_tratar_cnpj_e_string():
+    assert tratamento.tratar_cnpj("12.345.678/0001-95") == "12.345.678/0001-95"
+    assert tratamento.tratar_cnpj("12345678000195") == "12.345.678/0001-95"
+    assert tratamento.tratar_cnpj("123") == ""
+    assert tratamento.tratar_cnpj(None) is None
+    assert tratamento.tratar_string("  Rua São João, 12 ") == "RUA SO JOO 12"
+
+
+def test_versoes_pandas_iguais_as_escalares():
+    cnpjs = ["12345678000195", "12.345.678/0001-95", "123"]
+    textos = [" abc-1 ", "Çé x"]
+    tratados = tratamento.tratar_cnpj_serie(pd.Series(cnpjs + [None]))
+    assert tratados.tolist()[:3] == [tratamento.tratar_cnpj(c) for c in cnpjs]
+    assert tratados.isna().tolist() == [False, False, False, True]
+    tratados = tratamento.tratar_string_serie(pd.Series(textos + [None]))
+    assert tratados.tolist()[:2] == [tratamento.tratar_string(t) for t in textos]
+    assert tratados.isna().tolist() == [False, False, True]
+
+
+def test_dir_sem_nomes_repetidos():
+    for modulo in (utils, tratamento):
+        nomes = dir(modulo)
+        assert len(nomes) == len(set(nomes))
+    assert "tratar_cnpj_udf" in dir(tratamento)
+    assert "qualidade" in dir(utils)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Módulos de apoio aos notebooks (tratamento, qualidade, Gold, streaming, estatística).
+
+Os submódulos são importados só quando acessados (utils.qualidade,
+from utils import cache), então `import utils` não carrega PySpark, NumPy nem
+SciPy. Cada submódulo importa apenas as dependências de que precisa.
+
+Exemplo:
+    import utils
+    utils.tratamento.tratar_cnpj("12345678000195")   # não importa o PySpark
+    from utils.agendador import construir_gold_vendas
+"""
+
+import importlib
+
+__all__ = [
+    "agendador",
+    "cache",
+    "cronograma",
+    "diagnosticos",
+    "gerador_fake",
+    "indice",
+    "layout",
+    "permutacao",
+    "provisionamento",
+    "qualidade",
+    "snapshot",
+    "streaming",
+    "tratamento",
+]
+
+
+def __getattr__(nome):
+    if nome not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    modulo = importlib.import_module(f".{nome}", __name__)
+    globals()[nome] = modulo
+    return modulo
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
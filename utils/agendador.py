@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Execução concorrente das etapas da carga Gold (dimensões e fato) como um DAG.
+
+No notebook 004 Load Gold Delta as dimensões são gravadas uma depois da outra,
+cada uma relendo df_silver sem cache e disparando um count() só para exibir o
+resultado. Aqui cada etapa declara suas dependências e as que estão prontas
+são submetidas ao mesmo tempo por um pool de threads. Cada thread usa o seu
+próprio pool do scheduler do Spark (spark.scheduler.pool), para que jobs
+pequenos não esperem atrás dos grandes quando spark.scheduler.mode=FAIR.
+
+    dim_produto, dim_categoria, dim_segmento, dim_fabricante, dim_geografia
+    dim_cliente  <- dim_geografia
+    fato_vendas  <- todas as dimensões
+
+Exemplo:
+    res = construir_gold_vendas(spark, silver_path, gold_path)
+    print(res.tempo_total, res.caminho_critico, res.tempo_caminho_critico)
+"""
+
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .cache import GerenciadorCache
+
+logger = logging.getLogger(__name__)
+
+Etapa = namedtuple("Etapa", ["nome", "funcao", "dependencias"], defaults=[()])
+ResultadoDag = namedtuple(
+    "ResultadoDag",
+    ["resultados", "tempos", "caminho_critico", "tempo_caminho_critico", "tempo_total"],
+)
+
+
+def _validar_dag(etapas):
+    nomes = {e.nome for e in etapas}
+    if len(nomes) != len(etapas):
+        raise ValueError("Nomes de etapas repetidos")
+    for e in etapas:
+        faltantes = set(e.dependencias) - nomes
+        if faltantes:
+            raise ValueError(f"Etapa {e.nome} depende de etapas inexistentes: {sorted(faltantes)}")
+    # Ordenação topológica só para detectar ciclos
+    pendentes = {e.nome: set(e.dependencias) for e in etapas}
+    while pendentes:
+        prontas = [n for n, deps in pendentes.items() if not deps]
+        if not prontas:
+            raise ValueError(f"Ciclo entre as etapas: {sorted(pendentes)}")
+        for n in prontas:
+            del pendentes[n]
+        for deps in pendentes.values():
+            deps.difference_update(prontas)
+
+
+def caminho_critico(etapas, tempos):
+    """Maior soma de durações ao longo das dependências: (nomes, segundos)."""
+    por_nome = {e.nome: e for e in etapas}
+    memo = {}
+
+    def mais_longo(nome):
+        if nome not in memo:
+            inicio, fim = tempos[nome]
+            anterior = max((mais_longo(d) for d in por_nome[nome].dependencias),
+                           key=lambda x: x[1], default=([], 0.0))
+            memo[nome] = (anterior[0] + [nome], anterior[1] + (fim - inicio))
+        return memo[nome]
+
+    return max((mais_longo(n) for n in tempos), key=lambda x: x[1], default=([], 0.0))
+
+
+def executar_dag(spark, etapas, max_paralelo=4, prefixo_pool="dag"):
+    """Executa as etapas respeitando as dependências, em paralelo quando possível.
+
+    Cada funcao recebe um dicionário {dependencia: resultado} e o que ela
+    devolver fica disponível para as etapas seguintes.
+    """
+    _validar_dag(etapas)
+    if spark.sparkContext.getConf().get("spark.scheduler.mode", "FIFO") != "FAIR":
+        logger.warning("spark.scheduler.mode não é FAIR: os pools por etapa não terão efeito")
+
+    por_nome = {e.nome: e for e in etapas}
+    resultados = {}
+    tempos = {}
+    pendentes = dict(por_nome)
+    em_execucao = {}
+
+    def rodar(etapa):
+        spark.sparkContext.setLocalProperty("spark.scheduler.pool", f"{prefixo_pool}_{etapa.nome}")
+        spark.sparkContext.setJobDescription(etapa.nome)
+        try:
+            inicio = time.perf_counter()
+            retorno = etapa.funcao({d: resultados[d] for d in etapa.dependencias})
+            return retorno, (inicio, time.perf_counter())
+        finally:
+            spark.sparkContext.setLocalProperty("spark.scheduler.pool", None)
+            spark.sparkContext.setJobDescription(None)
+
+    inicio_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_paralelo) as executor:
+        while pendentes or em_execucao:
+            # Só submete o que cabe nos workers livres: nada fica na fila do
+            # executor, então uma falha não deixa etapas já enfileiradas começarem
+            prontas = [e for e in pendentes.values() if all(d in resultados for d in e.dependencias)]
+            for etapa in prontas[:max_paralelo - len(em_execucao)]:
+                del pendentes[etapa.nome]
+                em_execucao[executor.submit(rodar, etapa)] = etapa.nome
+                logger.info("Etapa %s iniciada", etapa.nome)
+
+            concluidas, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+            for futuro in concluidas:
+                nome = em_execucao.pop(futuro)
+                try:
+                    resultados[nome], (ini, fim) = futuro.result()
+                except Exception:
+                    for f in em_execucao:
+                        f.cancel()
+                    logger.exception("Etapa %s falhou", nome)
+                    raise
+                tempos[nome] = (ini - inicio_total, fim - inicio_total)
+                logger.info("Etapa %s concluída em %.1fs", nome, fim - ini)
+
+    tempo_total = time.perf_counter() - inicio_total
+    caminho, tempo_caminho = caminho_critico(etapas, tempos)
+    logger.info("DAG concluído em %.1fs; caminho crítico %s (%.1fs)",
+                tempo_total, " -> ".join(caminho), tempo_caminho)
+    return ResultadoDag(resultados, tempos, caminho, tempo_caminho, tempo_total)
+
+
+# =====================================
+# CARGA GOLD DE VENDAS (004 Load Gold Delta)
+# =====================================
+
+COLUNAS_SILVER_GOLD = [
+    "Data", "IDProduto", "Produto", "Categoria", "Segmento", "IDFabricante", "Fabricante",
+    "IDCliente", "Nome", "Email", "Cidade", "Estado", "Regiao", "Distrito", "Pais", "CodigoPostal",
+    "Unidades", "PrecoUnitario", "CustoUnitario", "TotalVendas",
+]
+
+COLUNAS_GEOGRAFIA = ["Cidade", "Estado", "Regiao", "Distrito", "Pais", "CodigoPostal"]
+
+DIMENSOES_GOLD = ["dim_produto", "dim_categoria", "dim_segmento", "dim_fabricante", "dim_geografia", "dim_cliente"]
+
+
+def etapas_gold_vendas(spark, df_silver, gold_path):
+    """Etapas do notebook 004 sobre um df_silver já em cache.
+
+    Cada dimensão é relida do Delta depois de gravada: as SKs vêm de
+    monotonically_increasing_id, que poderia gerar outros valores se o
+    DataFrame fosse recalculado para o join da fato.
+    """
+    from pyspark.sql.functions import broadcast, col, month, monotonically_increasing_id, year
+
+    def gravar_dimensao(tb_destino, df):
+        caminho = f"{gold_path}/{tb_destino}"
+        df.write.format("delta").mode("overwrite").save(caminho)
+        return spark.read.format("delta").load(caminho)
+
+    def dimensao(tb_destino, colunas, sk):
+        def funcao(_):
+            df = df_silver.select(*colunas).dropDuplicates() \
+                .withColumn(sk, monotonically_increasing_id() + 1)
+            return gravar_dimensao(tb_destino, df)
+        return funcao
+
+    def dim_cliente(deps):
+        geografia = deps["dim_geografia"]
+        cliente = df_silver.select("IDCliente", "Nome", "Email", *COLUNAS_GEOGRAFIA).dropDuplicates()
+        condicao = [col(f"cliente.{c}") == col(f"geografia.{c}") for c in COLUNAS_GEOGRAFIA]
+        df = cliente.alias("cliente") \
+            .join(broadcast(geografia.alias("geografia")), condicao, "left") \
+            .select("cliente.IDCliente", "cliente.Nome", "cliente.Email", "geografia.sk_geografia") \
+            .withColumn("sk_cliente", monotonically_increasing_id() + 1)
+        return gravar_dimensao("dim_cliente", df)
+
+    def fato_vendas(deps):
+        df = df_silver.alias("s") \
+            .join(broadcast(deps["dim_produto"].select("IDProduto", "sk_produto")), "IDProduto") \
+            .join(broadcast(deps["dim_categoria"].select("Categoria", "sk_categoria")), "Categoria") \
+            .join(broadcast(deps["dim_segmento"].select("Segmento", "sk_segmento")), "Segmento") \
+            .join(broadcast(deps["dim_fabricante"].select("Fabricante", "sk_fabricante")), "Fabricante") \
+            .join(broadcast(deps["dim_cliente"].select("IDCliente", "sk_cliente")), "IDCliente") \
+            .select(
+                col("s.Data").alias("DataVenda"),
+                "sk_produto", "sk_categoria", "sk_segmento", "sk_fabricante", "sk_cliente",
+                "Unidades", col("s.PrecoUnitario"), col("s.CustoUnitario"), col("s.TotalVendas"),
+            )
+        df.withColumn("Ano", year("DataVenda")) \
+            .withColumn("Mes", month("DataVenda")) \
+            .write.format("delta") \
+            .mode("overwrite") \
+            .option("MaxRecordsPerFile", 1000000) \
+            .partitionBy("Ano", "Mes") \
+            .save(f"{gold_path}/fato_vendas")
+        return f"{gold_path}/fato_vendas"
+
+    return [
+        Etapa("dim_produto", dimensao("dim_produto", ["IDProduto", "Produto", "Categoria"], "sk_produto")),
+        Etapa("dim_categoria", dimensao("dim_categoria", ["Categoria"], "sk_categoria")),
+        Etapa("dim_segmento", dimensao("dim_segmento", ["Segmento"], "sk_segmento")),
+        Etapa("dim_fabricante", dimensao("dim_fabricante", ["IDFabricante", "Fabricante"], "sk_fabricante")),
+        Etapa("dim_geografia", dimensao("dim_geografia", COLUNAS_GEOGRAFIA, "sk_geografia")),
+        Etapa("dim_cliente", dim_cliente, ("dim_geografia",)),
+        Etapa("fato_vendas", fato_vendas, tuple(DIMENSOES_GOLD)),
+    ]
+
+
+def _consumindo(cache, nome_cache, etapa):
+    # A etapa conta como um consumidor do cache e registra suas métricas
+    def funcao(deps):
+        with cache.etapa(etapa.nome), cache.consumir(nome_cache):
+            return etapa.funcao(deps)
+    return etapa._replace(funcao=funcao)
+
+
+def construir_gold_vendas(spark, silver_path, gold_path, max_paralelo=4):
+    """Carga completa da Gold: silver em cache uma vez, dimensões em paralelo, fato no fim."""
+    with GerenciadorCache(spark) as cache:
+        # Só as colunas usadas pela Gold; o nível de persistência sai do
+        # tamanho estimado e do número de etapas que leem a silver
+        df_silver = spark.read.format("parquet").load(silver_path).select(*COLUNAS_SILVER_GOLD)
+        df_silver = cache.registrar("silver", df_silver, consumidores=len(DIMENSOES_GOLD) + 1)
+        etapas = [_consumindo(cache, "silver", e) for e in etapas_gold_vendas(spark, df_silver, gold_path)]
+        return executar_dag(spark, etapas, max_paralelo=max_paralelo, prefixo_pool="gold")
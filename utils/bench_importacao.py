@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Tempo de importação dos módulos de utils, medido em processos novos.
+
+Cada módulo é importado num interpretador limpo com `python -X importtime`,
+várias vezes, e o relatório mostra a mediana do tempo acumulado da importação
+e se o PySpark acabou carregado junto. Com --limite-ms o script sai com código
+1 quando algum módulo passa do limite, para servir de verificação em CI.
+
+Exemplo (na raiz do repositório):
+    python -m utils.bench_importacao
+    python -m utils.bench_importacao utils.tratamento --repeticoes 20 --limite-ms 50
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULOS_PADRAO = ["utils", "utils.tratamento"]
+
+_SONDA = "import sys, {modulo}; print('pyspark' in sys.modules)"
+
+
+def _importar(modulo, raiz):
+    """(microssegundos acumulados na importação de `modulo`, pyspark carregado?)."""
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _SONDA.format(modulo=modulo)],
+        cwd=raiz, capture_output=True, text=True, check=True,
+    )
+    # Linhas do -X importtime: "import time: self [us] | cumulative | imported package"
+    acumulado = None
+    for linha in processo.stderr.splitlines():
+        partes = [p.strip() for p in linha.removeprefix("import time:").split("|")]
+        if len(partes) == 3 and partes[2] == modulo:
+            acumulado = int(partes[1])
+    return acumulado, processo.stdout.strip() == "True"
+
+
+def medir(modulos=MODULOS_PADRAO, repeticoes=10, raiz=None):
+    """{modulo: {"mediana_ms", "max_ms", "pyspark"}} com `repeticoes` processos por módulo."""
+    raiz = raiz or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    resultado = {}
+    for modulo in modulos:
+        tempos, pyspark = [], False
+        for _ in range(repeticoes):
+            microssegundos, carregou = _importar(modulo, raiz)
+            tempos.append(microssegundos / 1000)
+            pyspark |= carregou
+        resultado[modulo] = {
+            "mediana_ms": statistics.median(tempos),
+            "max_ms": max(tempos),
+            "pyspark": pyspark,
+        }
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modulos", nargs="*", default=MODULOS_PADRAO)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--limite-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    resultado = medir(args.modulos, args.repeticoes)
+    estourou = False
+    for modulo, r in resultado.items():
+        acima = args.limite_ms is not None and r["mediana_ms"] > args.limite_ms
+        estourou |= acima
+        print(f"{modulo:<30} mediana {r['mediana_ms']:8.2f} ms   máx {r['max_ms']:8.2f} ms   "
+              f"pyspark {'sim' if r['pyspark'] else 'não'}{'   ACIMA DO LIMITE' if acima else ''}")
+    return 1 if estourou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
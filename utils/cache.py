@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""Ciclo de vida de DataFrames em cache controlado pelas etapas do pipeline.
+
+Substitui as células de limpeza dos notebooks (df.unpersist(),
+spark.catalog.clearCache(), gc.collect(), del df_*), que ou jogam fora caches
+ainda úteis ou deixam memória presa nos executores.
+
+Cada etapa declara o que vai reutilizar e quantas vezes:
+
+    cache = GerenciadorCache(spark)
+    df_silver = cache.registrar("silver", df_silver, consumidores=7)
+
+    with cache.etapa("dim_produto"):
+        with cache.consumir("silver") as df:
+            ...
+
+O nível de armazenamento é escolhido pelo tamanho estimado (estatísticas do
+plano do Catalyst) e pelo número de consumidores, comparados com a memória de
+storage livre nos executores. O cache é liberado automaticamente quando o
+último consumidor termina. Ao fim de cada etapa são registrados no log, para
+cada DataFrame registrado e já materializado, a fração das suas partições
+ainda residentes no cache (as que faltam foram despejadas e serão
+recalculadas ou relidas), e a ocupação da memória de storage.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from py4j.protocol import Py4JError
+from pyspark import StorageLevel
+
+logger = logging.getLogger(__name__)
+
+EntradaCache = namedtuple("EntradaCache", ["nome", "df", "nivel", "tamanho_estimado"])
+MetricasEtapa = namedtuple(
+    "MetricasEtapa",
+    ["etapa", "acerto_cache", "acerto_por_cache", "memoria_usada", "memoria_maxima", "pressao_memoria"],
+)
+
+# Frações da memória de storage livre usadas na escolha do nível
+_FRACAO_DESERIALIZADO = 0.25
+_FRACAO_SERIALIZADO = 1.0
+
+
+def memoria_storage(spark):
+    """(máximo, livre) de memória de storage somada em todos os executores, em bytes."""
+    status = spark.sparkContext._jsc.sc().getExecutorMemoryStatus()
+    maximo = livre = 0
+    valores = status.values().iterator()
+    while valores.hasNext():
+        par = valores.next()
+        maximo += par._1()
+        livre += par._2()
+    return maximo, livre
+
+
+def tamanho_estimado(df):
+    """Tamanho em bytes estimado pelo otimizador (pode ser grosseiro sem ANALYZE)."""
+    try:
+        # O py4j já converte o BigInt do Scala em int; str() cobre versões que devolvem o objeto
+        return int(str(df._jdf.queryExecution().optimizedPlan().stats().sizeInBytes()))
+    except Py4JError:
+        logger.warning("Estatísticas do plano indisponíveis; tamanho estimado desconhecido", exc_info=True)
+        return None
+
+
+def escolher_nivel(tamanho, consumidores, memoria_livre):
+    """Nível de persistência para um DataFrame (None = não vale a pena cachear).
+
+    - um único consumidor: sem cache
+    - cabe folgado na memória livre: MEMORY_AND_DISK_DESER (leitura mais rápida)
+    - cabe na memória livre: MEMORY_AND_DISK (serializado, ocupa menos)
+    - maior que a memória, com 3+ consumidores: DISK_ONLY
+    - caso contrário recalcular sai mais barato que gravar em disco
+    """
+    if consumidores < 2:
+        return None
+    if tamanho is None:
+        return StorageLevel.MEMORY_AND_DISK
+    if tamanho <= memoria_livre * _FRACAO_DESERIALIZADO:
+        return StorageLevel.MEMORY_AND_DISK_DESER
+    if tamanho <= memoria_livre * _FRACAO_SERIALIZADO:
+        return StorageLevel.MEMORY_AND_DISK
+    if consumidores >= 3:
+        return StorageLevel.DISK_ONLY
+    return None
+
+
+class GerenciadorCache:
+    """Contagem de referências dos DataFrames reutilizados entre etapas."""
+
+    def __init__(self, spark):
+        self.spark = spark
+        self._entradas = {}
+        self._restantes = {}
+        self._metricas = []
+        # Etapas podem liberar consumidores a partir de threads diferentes
+        self._trava = threading.Lock()
+
+    def registrar(self, nome, df, consumidores, nivel=None):
+        """Declara que `df` será lido por `consumidores` etapas e persiste se compensar.
+
+        Retorna o DataFrame (persistido ou não) a ser usado daqui em diante.
+        """
+        with self._trava:
+            if nome in self._entradas:
+                raise ValueError(f"Cache {nome} já registrado")
+        tamanho = tamanho_estimado(df)
+        if nivel is None:
+            _, livre = memoria_storage(self.spark)
+            nivel = escolher_nivel(tamanho, consumidores, livre)
+        if nivel is not None:
+            df = df.persist(nivel)
+        with self._trava:
+            self._entradas[nome] = EntradaCache(nome, df, nivel, tamanho)
+            self._restantes[nome] = consumidores
+        logger.info("Cache %s: %s consumidores, ~%s bytes, nível %s", nome, consumidores, tamanho, nivel)
+        return df
+
+    def obter(self, nome):
+        return self._entradas[nome].df
+
+    def liberar(self, nome):
+        """Marca o fim de um consumidor; o último libera o cache."""
+        with self._trava:
+            if nome not in self._restantes:
+                raise KeyError(f"Cache {nome} não registrado ou já liberado")
+            self._restantes[nome] -= 1
+            if self._restantes[nome] > 0:
+                return
+            entrada = self._entradas.pop(nome)
+            del self._restantes[nome]
+        if entrada.nivel is not None:
+            entrada.df.unpersist()
+        logger.info("Cache %s liberado após o último consumidor", nome)
+
+    @contextmanager
+    def consumir(self, nome):
+        try:
+            yield self.obter(nome)
+        finally:
+            self.liberar(nome)
+
+    def _rdd_em_cache(self, df):
+        """Id do RDD que guarda o cache de `df`, ou None se ainda não foi materializado."""
+        dados = self.spark._jsparkSession.sharedState().cacheManager().lookupCachedData(df._jdf)
+        if not dados.isDefined():
+            return None
+        construtor = dados.get().cachedRepresentation().cacheBuilder()
+        # cachedColumnBuffers criaria o RDD se ainda não existisse
+        if not construtor.isCachedColumnBuffersLoaded():
+            return None
+        return construtor.cachedColumnBuffers().id()
+
+    def _acerto_cache(self):
+        """(fração agregada, {nome: fração}) das partições residentes dos caches registrados."""
+        with self._trava:
+            entradas = [e for e in self._entradas.values() if e.nivel is not None]
+        try:
+            rdds = {e.nome: self._rdd_em_cache(e.df) for e in entradas}
+            infos = {
+                info.id(): (info.numCachedPartitions(), info.numPartitions())
+                for info in self.spark.sparkContext._jsc.sc().getRDDStorageInfo()
+            }
+        except Py4JError:
+            logger.warning("Informações de storage indisponíveis", exc_info=True)
+            return None, {}
+        # Um RDD materializado sem nenhum bloco residente não aparece em getRDDStorageInfo
+        por_cache = {nome: infos.get(rdd, (0, None)) for nome, rdd in rdds.items() if rdd is not None}
+        em_cache = sum(c for c, _ in por_cache.values())
+        total = sum(t for _, t in por_cache.values() if t)
+        fracoes = {nome: (c / t if t else 0.0) for nome, (c, t) in por_cache.items()}
+        return (em_cache / total if total else None), fracoes
+
+    @contextmanager
+    def etapa(self, nome):
+        """Registra acerto de cache e pressão de memória ao fim da etapa."""
+        try:
+            yield self
+        finally:
+            maximo, livre = memoria_storage(self.spark)
+            usada = maximo - livre
+            acerto, por_cache = self._acerto_cache()
+            metricas = MetricasEtapa(nome, acerto, por_cache, usada, maximo, (usada / maximo) if maximo else 0.0)
+            with self._trava:
+                self._metricas.append(metricas)
+            logger.info(
+                "Etapa %s: acerto de cache %s %s, memória de storage %.1f%% (%d/%d bytes)",
+                nome,
+                "n/a" if acerto is None else f"{acerto:.1%}",
+                {k: f"{v:.1%}" for k, v in por_cache.items()},
+                100 * metricas.pressao_memoria, usada, maximo,
+            )
+
+    @property
+    def metricas(self):
+        return list(self._metricas)
+
+    def pendentes(self):
+        """Caches ainda registrados e quantos consumidores faltam."""
+        with self._trava:
+            return dict(self._restantes)
+
+    def encerrar(self):
+        """Libera tudo o que ainda estiver registrado (fim do pipeline ou erro)."""
+        with self._trava:
+            entradas = list(self._entradas.values())
+            restantes = dict(self._restantes)
+            self._entradas.clear()
+            self._restantes.clear()
+        for entrada in entradas:
+            if entrada.nivel is not None:
+                entrada.df.unpersist()
+            if restantes.get(entrada.nome, 0) > 0:
+                logger.warning("Cache %s encerrado com %d consumidores pendentes",
+                               entrada.nome, restantes[entrada.nome])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.encerrar()
+        return False
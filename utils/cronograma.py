@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""Cronograma de parcelas, antecipações e recebimentos do modelo de pagamentos.
+
+Fluxo transacoes -> transacoes_parcelas -> antecipacoes -> recebimentos
+calculado de forma colunar, sem os dicionários transacao_parc_map e
+recebimento_map montados a partir de .collect():
+
+    1. taxas_por_transacao: junta a cada transação as taxas do estabelecimento_pos
+    2. expandir_parcelas: repete cada transação de crédito em num_parcelas linhas,
+       com vencimentos e valores calculados como arrays
+    3. antecipar: aplica a taxa RAV (mensal, pró-rata pelos dias antecipados)
+    4. recebiveis: débitos + parcelas, já com a data efetiva de recebimento
+    5. agregar_recebimentos: um único groupby por (estab_id, data_recebimento)
+
+As chaves geradas são compostas e determinísticas, para que o mesmo
+cálculo possa rodar em partes (Spark) sem numeração global:
+    transacao_parc_id = transacao_id * 100 + codigo_parcela
+    recebimento_id    = estab_id * 100000 + dias desde 1970-01-01
+
+Todas as funções recebem e devolvem pandas.DataFrame. cronograma_spark roda
+o mesmo código como estágios applyInPandas, agrupados por baldes de
+transacao_id, e agrega os recebimentos com um groupBy do Spark.
+
+Exemplo:
+    cal = calendario_liquidacao(transacoes_pd, estab_pos_pd)
+    cal["recebimentos"].head()
+"""
+
+import numpy as np
+import pandas as pd
+
+PRAZO_PARCELA_DIAS = 30
+_MAX_PARCELAS = 100
+_DIAS_POR_ESTAB = 100_000
+
+_UM_DIA = np.timedelta64(1, "D")
+
+COLUNAS_TAXAS = ["estab_pos_id", "estab_id", "taxa_mdr", "taxa_juros", "taxa_rav"]
+
+
+def _centavos(valores):
+    return np.round(np.asarray(valores, dtype=float), 2)
+
+
+def chave_recebimento(estab_id, data_recebimento):
+    dias = (pd.to_datetime(data_recebimento).to_numpy().astype("datetime64[D]").astype(np.int64))
+    return np.asarray(estab_id, dtype=np.int64) * _DIAS_POR_ESTAB + dias
+
+
+def taxas_por_transacao(transacoes, estab_pos):
+    """Traz estab_id e as taxas (em %) do estabelecimento_pos de cada transação."""
+    taxas = estab_pos[COLUNAS_TAXAS].astype({"estab_id": np.int64})
+    return transacoes.merge(taxas, on="estab_pos_id", how="left", validate="many_to_one")
+
+
+def expandir_parcelas(transacoes, prazo_dias=PRAZO_PARCELA_DIAS):
+    """Uma linha por parcela das transações de crédito (num_parcelas > 0).
+
+    valor_parcela divide o valor em centavos e joga a diferença de
+    arredondamento na primeira parcela; juros e MDR são aplicados sobre cada
+    parcela com taxa_juros e taxa_mdr (em %).
+    """
+    credito = transacoes[transacoes["num_parcelas"].fillna(0) > 0]
+    n_parc = credito["num_parcelas"].to_numpy(dtype=np.int64)
+    if (n_parc >= _MAX_PARCELAS).any():
+        raise ValueError(f"num_parcelas deve ser menor que {_MAX_PARCELAS}")
+
+    idx = np.repeat(np.arange(len(credito)), n_parc)
+    inicio = np.cumsum(n_parc) - n_parc
+    codigo = np.arange(len(idx)) - np.repeat(inicio, n_parc) + 1
+
+    def coluna(nome):
+        return credito[nome].to_numpy()[idx]
+
+    # Valor em centavos: parcelas iguais e o resto na primeira
+    total_cent = np.round(coluna("valor_transacao") * 100).astype(np.int64)
+    n_rep = n_parc[idx]
+    base_cent = total_cent // n_rep
+    valor_parcela = (base_cent + np.where(codigo == 1, total_cent - base_cent * n_rep, 0)) / 100
+
+    transacao_id = coluna("transacao_id").astype(np.int64)
+    data_base = pd.to_datetime(coluna("data_transacao")).to_numpy().astype("datetime64[D]")
+
+    return pd.DataFrame({
+        "transacao_parc_id": transacao_id * _MAX_PARCELAS + codigo,
+        "transacao_id": transacao_id,
+        "estab_id": coluna("estab_id").astype(np.int64),
+        "codigo_parcela": codigo,
+        "valor_parcela": valor_parcela,
+        "valor_juros": _centavos(valor_parcela * coluna("taxa_juros") / 100),
+        "valor_mdr": _centavos(valor_parcela * coluna("taxa_mdr") / 100),
+        "taxa_rav": coluna("taxa_rav").astype(float),
+        "data_vencimento": (data_base + codigo * prazo_dias * _UM_DIA).astype("datetime64[ns]"),
+    })
+
+
+def antecipar(parcelas, nr_dias_antecipados):
+    """Antecipa as parcelas dadas em nr_dias_antecipados (escalar ou array).
+
+    valor_rav = valor_parcela * taxa_rav% * dias / 30 (taxa RAV mensal).
+    """
+    dias = np.broadcast_to(np.asarray(nr_dias_antecipados, dtype=np.int64), (len(parcelas),))
+    valor_parcela = parcelas["valor_parcela"].to_numpy(dtype=float)
+    valor_rav = _centavos(valor_parcela * parcelas["taxa_rav"].to_numpy(dtype=float) / 100 * dias / 30)
+    vencimento = parcelas["data_vencimento"].to_numpy().astype("datetime64[D]")
+    return pd.DataFrame({
+        "transacao_parc_id": parcelas["transacao_parc_id"].to_numpy(),
+        "valor_parcela": valor_parcela,
+        "valor_juros": parcelas["valor_juros"].to_numpy(dtype=float),
+        "valor_mdr": parcelas["valor_mdr"].to_numpy(dtype=float),
+        "valor_rav": valor_rav,
+        "valor_liquido": _centavos(
+            valor_parcela - parcelas["valor_juros"].to_numpy(dtype=float)
+            - parcelas["valor_mdr"].to_numpy(dtype=float) - valor_rav
+        ),
+        "data_vencimento_original": vencimento.astype("datetime64[ns]"),
+        "data_vencimento_antecipado": (vencimento - dias * _UM_DIA).astype("datetime64[ns]"),
+        "nr_dias_antecipados": dias,
+    })
+
+
+def recebiveis(transacoes, parcelas, antecipacoes=None):
+    """Débitos (recebidos na data da transação) e parcelas de crédito.
+
+    Parcelas antecipadas são recebidas em data_vencimento_antecipado e
+    carregam o valor_rav da antecipação.
+    """
+    debito = transacoes[transacoes["num_parcelas"].fillna(0) == 0]
+    valor_debito = debito["valor_transacao"].to_numpy(dtype=float)
+    rec_debito = pd.DataFrame({
+        "transacao_id": debito["transacao_id"].to_numpy(dtype=np.int64),
+        "transacao_parc_id": pd.array([pd.NA] * len(debito), dtype="Int64"),
+        "estab_id": debito["estab_id"].to_numpy(dtype=np.int64),
+        "data_recebimento": pd.to_datetime(debito["data_transacao"]).dt.normalize().to_numpy(),
+        "valor_bruto": valor_debito,
+        "valor_juros": 0.0,
+        "valor_mdr": _centavos(valor_debito * debito["taxa_mdr"].to_numpy(dtype=float) / 100),
+        "valor_rav": 0.0,
+    })
+
+    data_recebimento = parcelas["data_vencimento"].to_numpy()
+    valor_rav = np.zeros(len(parcelas))
+    if antecipacoes is not None and len(antecipacoes):
+        ant = antecipacoes.set_index("transacao_parc_id")
+        pos = ant.index.get_indexer(parcelas["transacao_parc_id"])
+        antecipada = pos >= 0
+        data_recebimento = np.where(
+            antecipada, ant["data_vencimento_antecipado"].to_numpy()[pos], data_recebimento
+        )
+        valor_rav = np.where(antecipada, ant["valor_rav"].to_numpy(dtype=float)[pos], 0.0)
+
+    rec_credito = pd.DataFrame({
+        "transacao_id": parcelas["transacao_id"].to_numpy(dtype=np.int64),
+        "transacao_parc_id": pd.array(parcelas["transacao_parc_id"].to_numpy(), dtype="Int64"),
+        "estab_id": parcelas["estab_id"].to_numpy(dtype=np.int64),
+        "data_recebimento": pd.to_datetime(data_recebimento).normalize().to_numpy(),
+        "valor_bruto": (parcelas["valor_parcela"] + parcelas["valor_juros"]).to_numpy(dtype=float),
+        "valor_juros": parcelas["valor_juros"].to_numpy(dtype=float),
+        "valor_mdr": parcelas["valor_mdr"].to_numpy(dtype=float),
+        "valor_rav": valor_rav,
+    })
+
+    resultado = pd.concat([rec_debito, rec_credito], ignore_index=True)
+    resultado["recebimento_id"] = chave_recebimento(resultado["estab_id"], resultado["data_recebimento"])
+    return resultado
+
+
+def agregar_recebimentos(recebiveis_df, valor_pos=0.0):
+    """Um título por (estab_id, data_recebimento), com um único groupby."""
+    rec = recebiveis_df.groupby(["recebimento_id", "estab_id", "data_recebimento"], sort=True).agg(
+        quantidade_transacoes=("transacao_id", "size"),
+        valor_titulo_bruto=("valor_bruto", "sum"),
+        valor_mdr=("valor_mdr", "sum"),
+        valor_rav=("valor_rav", "sum"),
+    ).reset_index()
+    rec["valor_titulo_bruto"] = _centavos(rec["valor_titulo_bruto"])
+    rec["valor_mdr"] = _centavos(rec["valor_mdr"])
+    rec["valor_rav"] = _centavos(rec["valor_rav"])
+    rec["valor_pos"] = _centavos(np.broadcast_to(valor_pos, (len(rec),)))
+    rec["valor_liquido"] = _centavos(
+        rec["valor_titulo_bruto"] - rec["valor_mdr"] - rec["valor_rav"] - rec["valor_pos"]
+    )
+    return rec
+
+
+def calendario_liquidacao(transacoes, estab_pos, antecipacoes=None, prazo_dias=PRAZO_PARCELA_DIAS):
+    """Pipeline completo em pandas.
+
+    antecipacoes, se informado, é um DataFrame com transacao_parc_id e
+    nr_dias_antecipados. Retorna um dicionário com parcelas, antecipacoes,
+    recebiveis e recebimentos.
+    """
+    base = taxas_por_transacao(transacoes, estab_pos)
+    parcelas = expandir_parcelas(base, prazo_dias)
+    ant = None
+    if antecipacoes is not None:
+        selecionadas = parcelas.merge(
+            antecipacoes[["transacao_parc_id", "nr_dias_antecipados"]], on="transacao_parc_id"
+        )
+        ant = antecipar(selecionadas, selecionadas["nr_dias_antecipados"].to_numpy())
+    rec = recebiveis(base, parcelas, ant)
+    return {
+        "parcelas": parcelas,
+        "antecipacoes": ant,
+        "recebiveis": rec,
+        "recebimentos": agregar_recebimentos(rec),
+    }
+
+
+# =====================================
+# ESTÁGIOS SPARK (applyInPandas)
+# =====================================
+
+SCHEMA_RECEBIVEIS = (
+    "transacao_id long, transacao_parc_id long, estab_id long, data_recebimento date, "
+    "valor_bruto double, valor_juros double, valor_mdr double, valor_rav double, recebimento_id long"
+)
+
+SCHEMA_RECEBIMENTOS = (
+    "recebimento_id long, estab_id long, data_recebimento date, quantidade_transacoes long, "
+    "valor_titulo_bruto double, valor_mdr double, valor_rav double, valor_pos double, valor_liquido double"
+)
+
+
+def _datas_para_date(df, coluna="data_recebimento"):
+    # DateType no applyInPandas espera datetime.date
+    df[coluna] = pd.to_datetime(df[coluna]).dt.date
+    return df
+
+
+def cronograma_spark(df_transacoes, df_estab_pos, df_antecipacoes=None, prazo_dias=PRAZO_PARCELA_DIAS,
+                     n_baldes=None):
+    """Mesmo cálculo de calendario_liquidacao como estágios applyInPandas.
+
+    As transações são agrupadas em n_baldes pelo resto de transacao_id (padrão:
+    spark.sql.shuffle.partitions), e não por estabelecimento, para que um
+    estabelecimento grande não precise caber inteiro num único DataFrame pandas.
+    As antecipações calculam o mesmo balde a partir de transacao_parc_id e
+    chegam ao grupo certo via cogroup. Os recebimentos são agregados depois
+    com um groupBy do Spark (um shuffle, com agregação parcial nos mappers).
+    Retorna (df_recebiveis, df_recebimentos).
+    """
+    from pyspark.sql import functions as F
+
+    if n_baldes is None:
+        n_baldes = int(df_transacoes.sparkSession.conf.get("spark.sql.shuffle.partitions"))
+
+    base = df_transacoes.join(F.broadcast(df_estab_pos.select(*COLUNAS_TAXAS)), "estab_pos_id") \
+        .withColumn("_balde", F.pmod(F.col("transacao_id"), F.lit(n_baldes)))
+
+    def _recebiveis(transacoes_pd, antecipacoes_pd):
+        parcelas = expandir_parcelas(transacoes_pd, prazo_dias)
+        ant = None
+        if antecipacoes_pd is not None and len(antecipacoes_pd):
+            selecionadas = parcelas.merge(
+                antecipacoes_pd[["transacao_parc_id", "nr_dias_antecipados"]], on="transacao_parc_id"
+            )
+            ant = antecipar(selecionadas, selecionadas["nr_dias_antecipados"].to_numpy())
+        return _datas_para_date(recebiveis(transacoes_pd, parcelas, ant))
+
+    # applyInPandas decide entre f(pdf) e f(chave, pdf) pelo número de
+    # parâmetros (contando os com padrão), então cada estágio tem a sua função
+    def recebiveis_grupo(transacoes_pd):
+        return _recebiveis(transacoes_pd, None)
+
+    def recebiveis_cogrupo(transacoes_pd, antecipacoes_pd):
+        return _recebiveis(transacoes_pd, antecipacoes_pd)
+
+    if df_antecipacoes is None:
+        df_recebiveis = base.groupBy("_balde").applyInPandas(recebiveis_grupo, schema=SCHEMA_RECEBIVEIS)
+    else:
+        ant = df_antecipacoes.select("transacao_parc_id", "nr_dias_antecipados") \
+            .withColumn("_balde", F.pmod(F.floor(F.col("transacao_parc_id") / _MAX_PARCELAS), F.lit(n_baldes)))
+        df_recebiveis = base.groupBy("_balde").cogroup(ant.groupBy("_balde")) \
+            .applyInPandas(recebiveis_cogrupo, schema=SCHEMA_RECEBIVEIS)
+
+    df_recebimentos = df_recebiveis \
+        .groupBy("recebimento_id", "estab_id", "data_recebimento") \
+        .agg(
+            F.count(F.lit(1)).alias("quantidade_transacoes"),
+            F.round(F.sum("valor_bruto"), 2).alias("valor_titulo_bruto"),
+            F.round(F.sum("valor_mdr"), 2).alias("valor_mdr"),
+            F.round(F.sum("valor_rav"), 2).alias("valor_rav"),
+        ) \
+        .withColumn("valor_pos", F.lit(0.0)) \
+        .withColumn("valor_liquido", F.round(
+            F.col("valor_titulo_bruto") - F.col("valor_mdr") - F.col("valor_rav") - F.col("valor_pos"), 2
+        )) \
+        .select(*[c.split()[0] for c in SCHEMA_RECEBIMENTOS.split(", ")])
+    return df_recebiveis, df_recebimentos
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Diagnósticos de normalidade e ajuste de distribuição em DataFrames Spark.
+
+Versão distribuída da seção de normalidade de aula_4 (Shapiro, kstest,
+anderson, histograma e QQ-plot), para colunas que não cabem no driver, como
+fato_vendas.TotalVendas.
+
+Todas as colunas pedidas são resumidas em um único agg() no cluster:
+momentos (média, desvio, assimetria, curtose), mínimo/máximo e um sketch de
+quantis (percentile_approx). A partir desse resumo, já no driver, são
+calculados:
+    - Kolmogorov-Smirnov contra a Normal ajustada (máximo de |F_n - F| na grade de quantis)
+    - Anderson-Darling (integral de (F_n - F)^2 / F(1-F) sobre a mesma grade)
+    - Jarque-Bera (assimetria e curtose)
+    - pontos do QQ-plot e um histograma, como arrays prontos para plotar
+
+O histograma sai do sketch de quantis: as contagens por faixa são a ECDF
+interpolada nos limites vezes n, portanto aproximadas (o erro cresce com
+poucos quantis e em faixas com valores repetidos) e em geral não inteiras.
+Como os limites padrão dependem do mínimo e do máximo, não dá para contar
+exatamente no mesmo agg(); passando limites=, as contagens exatas são
+somadas no próprio agg() (uma soma condicional por faixa) e
+Histograma.exato fica True.
+
+Exemplo:
+    fato = spark.read.format("delta").load(f"{gold_path}/fato_vendas")
+    diag = diagnosticar_coluna(fato, "TotalVendas")
+    print(diag.ks, diag.jarque_bera)
+    plt.bar(diag.histograma.limites[:-1], diag.histograma.contagens,
+            width=np.diff(diag.histograma.limites), align="edge")
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from scipy import stats
+from pyspark.sql import functions as F
+from pyspark.sql.types import StringType
+
+Teste = namedtuple("Teste", ["estatistica", "p_valor"])
+TesteAnderson = namedtuple("TesteAnderson", ["estatistica", "valores_criticos", "niveis_significancia"])
+Histograma = namedtuple("Histograma", ["contagens", "limites", "exato"], defaults=[False])
+PontosQQ = namedtuple("PontosQQ", ["teoricos", "amostrais", "reta"])
+DiagnosticoDistribuicao = namedtuple(
+    "DiagnosticoDistribuicao",
+    [
+        "coluna", "n", "media", "desvio", "assimetria", "curtose", "minimo", "maximo",
+        "probabilidades", "quantis", "histograma", "ks", "anderson", "jarque_bera", "qq",
+    ],
+)
+
+# Valores críticos do Anderson-Darling para a Normal com média e desvio
+# estimados (os mesmos usados por stats.anderson)
+_AD_CRITICOS = np.array([0.576, 0.656, 0.787, 0.918, 1.092])
+_AD_NIVEIS = np.array([15.0, 10.0, 5.0, 2.5, 1.0])
+
+
+def _coluna_numerica(df, coluna):
+    # Colunas gravadas com format_number (ex.: TotalVendas = "1,234.56") vêm
+    # como string com separador de milhar
+    if isinstance(df.schema[coluna].dataType, StringType):
+        return F.regexp_replace(F.col(coluna), ",", "").cast("double")
+    return F.col(coluna).cast("double")
+
+
+def _grade_probabilidades(n_quantis):
+    # Grade simétrica que evita 0 e 1 (onde o inverso da Normal é infinito)
+    return (np.arange(1, n_quantis + 1) - 0.5) / n_quantis
+
+
+def _expressoes(df, coluna, probabilidades, precisao, limites=None):
+    x = _coluna_numerica(df, coluna)
+    prefixo = f"{coluna}__"
+    contagens = []
+    if limites is not None:
+        # Faixas [lo, hi), a última fechada, como np.histogram
+        ultima = len(limites) - 2
+        for i, (lo, hi) in enumerate(zip(limites[:-1], limites[1:])):
+            dentro = (x >= float(lo)) & ((x <= float(hi)) if i == ultima else (x < float(hi)))
+            contagens.append(F.sum(F.when(dentro, 1).otherwise(0)).alias(f"{prefixo}faixa_{i}"))
+    return contagens + [
+        F.count(x).alias(prefixo + "n"),
+        F.mean(x).alias(prefixo + "media"),
+        F.stddev_samp(x).alias(prefixo + "desvio"),
+        F.skewness(x).alias(prefixo + "assimetria"),
+        F.kurtosis(x).alias(prefixo + "curtose"),
+        F.min(x).alias(prefixo + "minimo"),
+        F.max(x).alias(prefixo + "maximo"),
+        F.percentile_approx(x, [float(p) for p in probabilidades], precisao).alias(prefixo + "quantis"),
+    ]
+
+
+def _histograma_do_sketch(probabilidades, quantis, n, minimo, maximo, bins):
+    # A ECDF é interpolada na grade de quantis; as contagens por faixa saem
+    # das diferenças da ECDF nos limites, sem uma segunda leitura dos dados
+    limites = np.linspace(minimo, maximo, bins + 1)
+    xs = np.concatenate([[minimo], quantis, [maximo]])
+    ps = np.concatenate([[0.0], probabilidades, [1.0]])
+    # Em valores repetidos a ECDF assume a maior probabilidade (continuidade à direita)
+    ultimos = len(xs) - 1 - np.unique(xs[::-1], return_index=True)[1]
+    ecdf = np.interp(limites, xs[ultimos], ps[ultimos])
+    contagens = np.diff(ecdf) * n
+    return Histograma(contagens, limites)
+
+
+def _montar_diagnostico(coluna, linha, probabilidades, bins, limites=None):
+    prefixo = f"{coluna}__"
+    n = int(linha[prefixo + "n"])
+    if n < 3:
+        raise ValueError(f"Coluna {coluna} tem menos de 3 valores não nulos")
+    media = float(linha[prefixo + "media"])
+    desvio = float(linha[prefixo + "desvio"])
+    assimetria = float(linha[prefixo + "assimetria"])
+    curtose = float(linha[prefixo + "curtose"])  # curtose em excesso (Normal = 0)
+    minimo = float(linha[prefixo + "minimo"])
+    maximo = float(linha[prefixo + "maximo"])
+    quantis = np.asarray(linha[prefixo + "quantis"], dtype=float)
+
+    # CDF da Normal ajustada nos quantis amostrais
+    cdf = stats.norm.cdf(quantis, loc=media, scale=desvio)
+
+    # Kolmogorov-Smirnov
+    ks_stat = float(np.max(np.abs(probabilidades - cdf)))
+    ks = Teste(ks_stat, float(stats.kstwo.sf(ks_stat, n)))
+
+    # Anderson-Darling: A² = n * ∫ (F_n - F)² / (F (1 - F)) dF
+    cdf_ext = np.concatenate([[0.0], cdf, [1.0]])
+    p_ext = np.concatenate([[0.0], probabilidades, [1.0]])
+    meio = 0.5 * (cdf_ext[1:] + cdf_ext[:-1])
+    peso = meio * (1 - meio)
+    dif = 0.5 * (p_ext[1:] + p_ext[:-1]) - meio
+    integral = np.sum(np.where(peso > 0, dif ** 2 / np.where(peso > 0, peso, 1), 0.0) * np.diff(cdf_ext))
+    ad_stat = float(n * integral)
+    anderson = TesteAnderson(ad_stat, np.round(_AD_CRITICOS / (1 + 4.0 / n - 25.0 / n ** 2), 3), _AD_NIVEIS)
+
+    # Jarque-Bera
+    jb_stat = n / 6.0 * (assimetria ** 2 + curtose ** 2 / 4.0)
+    jarque_bera = Teste(float(jb_stat), float(stats.chi2.sf(jb_stat, 2)))
+
+    # QQ-plot contra a Normal padrão, com a reta 's' do sm.qqplot
+    teoricos = stats.norm.ppf(probabilidades)
+    qq = PontosQQ(teoricos, quantis, media + desvio * teoricos)
+
+    if limites is None:
+        histograma = _histograma_do_sketch(probabilidades, quantis, n, minimo, maximo, bins)
+    else:
+        contagens = np.array([linha[f"{prefixo}faixa_{i}"] for i in range(len(limites) - 1)], dtype=np.int64)
+        histograma = Histograma(contagens, np.asarray(limites, dtype=float), True)
+
+    return DiagnosticoDistribuicao(
+        coluna, n, media, desvio, assimetria, curtose, minimo, maximo,
+        probabilidades, quantis, histograma, ks, anderson, jarque_bera, qq,
+    )
+
+
+def diagnosticar_colunas(df, colunas, n_quantis=1000, bins=30, precisao=10000, limites=None):
+    """Calcula os diagnósticos de várias colunas numéricas com um único agg().
+
+    n_quantis define a resolução da ECDF (e do QQ-plot); precisao é o
+    parâmetro accuracy do percentile_approx (erro relativo ~ 1/precisao).
+    Sem limites, o histograma tem `bins` faixas entre mínimo e máximo com
+    contagens aproximadas pelo sketch; limites ({coluna: limites} ou os
+    mesmos limites para todas) dá contagens exatas no mesmo agg().
+    Retorna um dicionário {coluna: DiagnosticoDistribuicao}.
+    """
+    probabilidades = _grade_probabilidades(n_quantis)
+    if limites is not None and not isinstance(limites, dict):
+        limites = {coluna: limites for coluna in colunas}
+    limites = limites or {}
+    expressoes = []
+    for coluna in colunas:
+        expressoes.extend(_expressoes(df, coluna, probabilidades, precisao, limites.get(coluna)))
+    linha = df.agg(*expressoes).collect()[0]
+    return {
+        coluna: _montar_diagnostico(coluna, linha, probabilidades, bins, limites.get(coluna))
+        for coluna in colunas
+    }
+
+
+def diagnosticar_coluna(df, coluna, **kwargs):
+    """Atalho de diagnosticar_colunas para uma única coluna."""
+    return diagnosticar_colunas(df, [coluna], **kwargs)[coluna]
+
+
+def plotar_diagnostico(diag, alpha=0.05):
+    """Histograma e QQ-plot lado a lado a partir dos arrays já agregados."""
+    import matplotlib.pyplot as plt
+
+    fig, (ax_hist, ax_qq) = plt.subplots(1, 2, figsize=(11, 4))
+    limites = diag.histograma.limites
+    ax_hist.bar(limites[:-1], diag.histograma.contagens, width=np.diff(limites),
+                align="edge", edgecolor="black")
+    ax_hist.set_title(f"Histograma de {diag.coluna}")
+    ax_hist.set_xlabel(diag.coluna)
+    ax_hist.set_ylabel("Frequência")
+
+    ax_qq.scatter(diag.qq.teoricos, diag.qq.amostrais, s=6)
+    ax_qq.plot(diag.qq.teoricos, diag.qq.reta, color="red")
+    ax_qq.set_title(f"QQ-Plot de {diag.coluna}")
+    ax_qq.set_xlabel("Quantis teóricos")
+    ax_qq.set_ylabel("Quantis amostrais")
+
+    normal = "não rejeita" if diag.ks.p_valor >= alpha else "rejeita"
+    fig.suptitle(f"KS = {diag.ks.estatistica:.4f} (p = {diag.ks.p_valor:.4g}) -> {normal} H0 de normalidade")
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+"""Gerador declarativo e vetorizado do modelo fake de pagamentos.
+
+Substitui os loops de data_fake/fake_data_mdb_AdvancedModeling.ipynb
+(random.choice, Row e .collect() das tabelas anteriores para montar as FKs).
+
+Cada tabela é descrita por uma Tabela(nome, linhas, colunas):
+    - linhas: um inteiro, PorPai(...) (n linhas por registro da tabela pai)
+      ou Amostra(...) (subconjunto de registros da tabela pai)
+    - colunas: lista de Coluna(nome, gerador, taxa_nulos)
+
+Um gerador é uma função que recebe o contexto da tabela e devolve um array
+NumPy com n valores. As FKs são sorteadas como arrays de índices da tabela
+pai (fk) e reaproveitadas por do_pai para trazer outros atributos do mesmo
+registro, sem join nem collect. Tabelas calculadas a partir das anteriores
+(parcelas, antecipações e recebimentos, via utils.cronograma) são descritas
+por Agregada(nome, funcao); funcao pode devolver um DataFrame ou um
+dicionário {nome: DataFrame}.
+
+Exemplo:
+    tabelas = gerar_modelo(ESPEC_PAGAMENTOS, semente=42)
+    dfs = para_spark(spark, tabelas)
+    display(dfs["transacoes"])
+
+Para volumes grandes, gerar_lotes_arrow gera uma tabela em lotes de
+pyarrow.RecordBatch, sem materializar tudo de uma vez.
+"""
+
+import zlib
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from . import cronograma
+
+Coluna = namedtuple("Coluna", ["nome", "gerador", "taxa_nulos"], defaults=[0.0])
+Tabela = namedtuple("Tabela", ["nome", "linhas", "colunas"])
+PorPai = namedtuple("PorPai", ["tabela", "minimo", "maximo", "coluna"], defaults=[1, 1, None])
+Amostra = namedtuple("Amostra", ["tabela", "fracao", "maximo"], defaults=[None])
+Agregada = namedtuple("Agregada", ["nome", "funcao"])
+
+_UM_DIA = np.timedelta64(1, "D")
+
+
+# =====================================
+# GERADORES DE COLUNA
+# =====================================
+# Cada fábrica abaixo devolve uma função gerador(ctx) -> array de ctx["n"] valores.
+# ctx contém: n, rng, offset, colunas (já geradas nesta tabela),
+# tabelas (DataFrames já gerados), indices (tabela pai -> índices) e rank.
+
+def sequencial(inicio=1):
+    return lambda ctx: np.arange(ctx["n"], dtype=np.int64) + inicio + ctx["offset"]
+
+
+def inteiro(minimo, maximo):
+    return lambda ctx: ctx["rng"].integers(minimo, maximo + 1, ctx["n"])
+
+
+def decimal(minimo, maximo, casas=2):
+    return lambda ctx: np.round(ctx["rng"].uniform(minimo, maximo, ctx["n"]), casas)
+
+
+def booleano(p=0.5):
+    return lambda ctx: ctx["rng"].random(ctx["n"]) < p
+
+
+def constante(valor):
+    return lambda ctx: np.full(ctx["n"], valor)
+
+
+def escolha(valores, pesos=None):
+    valores = np.asarray(valores, dtype=object)
+    if pesos is not None:
+        pesos = np.asarray(pesos, dtype=float) / np.sum(pesos)
+    return lambda ctx: valores[ctx["rng"].choice(len(valores), ctx["n"], p=pesos)]
+
+
+def data_hora(inicio=None, fim=None):
+    """Data/hora uniforme entre inicio e fim (padrão: esta década até agora).
+
+    "Agora" é lido a cada geração, não quando a especificação é montada.
+    """
+    def gerador(ctx):
+        agora = datetime.now()
+        ini = np.datetime64(inicio or datetime(agora.year - agora.year % 10, 1, 1), "s")
+        amplitude = int((np.datetime64(fim or agora, "s") - ini) / np.timedelta64(1, "s"))
+        return ini + ctx["rng"].integers(0, amplitude, ctx["n"]).astype("timedelta64[s]")
+    return gerador
+
+
+def deslocar_dias(coluna, minimo, maximo, sinal=1):
+    """Outra coluna de data somada (ou subtraída) de um número aleatório de dias.
+
+    Onde a coluna de origem for nula, esta também é.
+    """
+    def gerador(ctx):
+        dias = ctx["rng"].integers(minimo, maximo + 1, ctx["n"])
+        return ctx["colunas"][coluna] + sinal * dias * _UM_DIA
+    gerador.origem = coluna
+    return gerador
+
+
+def copiar(coluna):
+    def gerador(ctx):
+        return ctx["colunas"][coluna]
+    gerador.origem = coluna
+    return gerador
+
+
+_pools_faker = {}
+
+
+def fake(metodo, tamanho_pool=1000, locale="pt_BR"):
+    """Valor do Faker sorteado de um pool pré-gerado (o Faker é lento por linha).
+
+    A semente do pool sai de ctx["semente_faker"] (derivada da semente do
+    modelo) e do método, e faz parte da chave do cache: a mesma semente gera
+    os mesmos pools, tenham eles sido criados antes nesta sessão ou não.
+    """
+    def gerador(ctx):
+        semente_pool = int(np.random.SeedSequence(
+            [ctx["semente_faker"], zlib.crc32(f"{locale}:{metodo}".encode("utf-8"))]
+        ).generate_state(1)[0])
+        chave = (locale, metodo, tamanho_pool, semente_pool)
+        if chave not in _pools_faker:
+            from faker import Faker
+
+            faker = Faker(locale)
+            faker.seed_instance(semente_pool)
+            _pools_faker[chave] = np.array(
+                [getattr(faker, metodo)() for _ in range(tamanho_pool)], dtype=object
+            )
+        pool = _pools_faker[chave]
+        return pool[ctx["rng"].integers(0, len(pool), ctx["n"])]
+    return gerador
+
+
+def cnpj(formatado=True):
+    """CNPJ com dígitos verificadores válidos, gerado direto em NumPy."""
+    pesos1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    pesos2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+    def digito(base, pesos):
+        resto = (base * pesos).sum(axis=1) % 11
+        return np.where(resto < 2, 0, 11 - resto)
+
+    def gerador(ctx):
+        base = ctx["rng"].integers(0, 10, (ctx["n"], 12))
+        base[:, 8:12] = [0, 0, 0, 1]  # matriz
+        d1 = digito(base, pesos1)
+        base = np.column_stack([base, d1])
+        d2 = digito(base, pesos2)
+        digitos = np.column_stack([base, d2])
+        numero = pd.Series(digitos @ (10 ** np.arange(13, -1, -1, dtype=np.int64))).astype(str).str.zfill(14)
+        if not formatado:
+            return numero.to_numpy(dtype=object)
+        s = numero.str
+        return (s[:2] + "." + s[2:5] + "." + s[5:8] + "/" + s[8:12] + "-" + s[12:]).to_numpy(dtype=object)
+    return gerador
+
+
+def fk(tabela, coluna):
+    """Sorteia um registro da tabela pai e devolve a coluna-chave dele.
+
+    O array de índices sorteado fica em ctx["indices"][tabela] para que
+    do_pai traga outros atributos do mesmo registro.
+    """
+    def gerador(ctx):
+        pai = ctx["tabelas"][tabela]
+        if tabela not in ctx["indices"]:
+            ctx["indices"][tabela] = ctx["rng"].integers(0, len(pai), ctx["n"])
+        return pai[coluna].to_numpy()[ctx["indices"][tabela]]
+    return gerador
+
+
+def do_pai(tabela, coluna):
+    """Atributo do registro pai já escolhido por fk, PorPai ou Amostra."""
+    return lambda ctx: ctx["tabelas"][tabela][coluna].to_numpy()[ctx["indices"][tabela]]
+
+
+def derivada(funcao):
+    """Coluna calculada a partir do contexto: funcao(ctx) -> array."""
+    return funcao
+
+
+# =====================================
+# MOTOR DE GERAÇÃO
+# =====================================
+
+def _aplicar_nulos(valores, taxa, rng, herdada=None):
+    """(série com nulos, máscara de nulos); herdada vem da coluna de origem."""
+    serie = pd.Series(valores)
+    mascara = np.zeros(len(serie), dtype=bool)
+    if taxa > 0:
+        mascara = rng.random(len(serie)) < taxa
+    if herdada is not None:
+        mascara = mascara | herdada
+    if not mascara.any():
+        return serie, mascara
+    if pd.api.types.is_bool_dtype(serie):
+        serie = serie.astype("boolean")
+    elif pd.api.types.is_integer_dtype(serie):
+        serie = serie.astype("Int64")
+    elif serie.dtype == object:
+        return serie.where(~mascara, None), mascara
+    return serie.mask(mascara), mascara
+
+
+def _indices_linhas(linhas, tabelas, rng):
+    # Devolve (n, indices do pai ou None, rank dentro do pai ou None)
+    if isinstance(linhas, PorPai):
+        pai = tabelas[linhas.tabela]
+        if linhas.coluna is not None:
+            contagens = pai[linhas.coluna].fillna(0).to_numpy(dtype=np.int64)
+        else:
+            contagens = rng.integers(linhas.minimo, linhas.maximo + 1, len(pai))
+        idx = np.repeat(np.arange(len(pai)), contagens)
+        inicio = np.cumsum(contagens) - contagens
+        rank = np.arange(len(idx)) - np.repeat(inicio, contagens)
+        return len(idx), {linhas.tabela: idx}, rank
+    if isinstance(linhas, Amostra):
+        n_pai = len(tabelas[linhas.tabela])
+        k = int(round(n_pai * linhas.fracao))
+        if linhas.maximo is not None:
+            k = min(k, linhas.maximo)
+        idx = np.sort(rng.choice(n_pai, size=k, replace=False))
+        return k, {linhas.tabela: idx}, None
+    return int(linhas), {}, None
+
+
+def _gerar_colunas(tabela, n, indices, rank, tabelas, rng, offset=0, semente_faker=0):
+    ctx = dict(n=n, rng=rng, offset=offset, colunas={}, tabelas=tabelas,
+               indices=dict(indices), rank=rank, semente_faker=semente_faker)
+    for coluna in tabela.colunas:
+        ctx["colunas"][coluna.nome] = np.asarray(coluna.gerador(ctx))
+    # Nulos são aplicados no fim para que colunas derivadas vejam os valores
+    # completos; deslocar_dias e copiar herdam os nulos da coluna de origem
+    dados, mascaras = {}, {}
+    for coluna in tabela.colunas:
+        herdada = mascaras.get(getattr(coluna.gerador, "origem", None))
+        dados[coluna.nome], mascaras[coluna.nome] = _aplicar_nulos(
+            ctx["colunas"][coluna.nome], coluna.taxa_nulos, rng, herdada
+        )
+    return pd.DataFrame(dados)
+
+
+def gerar_tabela(tabela, tabelas, rng, semente_faker=0):
+    n, indices, rank = _indices_linhas(tabela.linhas, tabelas, rng)
+    return _gerar_colunas(tabela, n, indices, rank, tabelas, rng, semente_faker=semente_faker)
+
+
+def _sementes(semente):
+    # rng das colunas e semente dos pools do Faker, independentes entre si
+    sequencia = np.random.SeedSequence(semente)
+    return np.random.default_rng(sequencia), int(sequencia.generate_state(1)[0])
+
+
+def gerar_modelo(especificacao, semente=None, escala=None):
+    """Gera todas as tabelas da especificação, na ordem dada.
+
+    escala substitui o número de linhas das tabelas com linhas inteiras,
+    ex.: escala={"transacoes": 5_000_000}.
+    Retorna um dicionário {nome: pandas.DataFrame}.
+    """
+    rng, semente_faker = _sementes(semente)
+    escala = escala or {}
+    tabelas = {}
+    for item in especificacao:
+        if isinstance(item, Agregada):
+            resultado = item.funcao(tabelas, rng)
+            tabelas.update(resultado if isinstance(resultado, dict) else {item.nome: resultado})
+            continue
+        if item.nome in escala:
+            item = item._replace(linhas=escala[item.nome])
+        tabelas[item.nome] = gerar_tabela(item, tabelas, rng, semente_faker)
+    return tabelas
+
+
+def gerar_lotes_arrow(tabela, n_linhas, tabelas, tamanho_lote=1_000_000, semente=None):
+    """Gera uma tabela de linhas inteiras em lotes de pyarrow.RecordBatch.
+
+    As tabelas pai precisam estar em `tabelas`; IDs sequenciais continuam
+    de um lote para o outro.
+    """
+    import pyarrow as pa
+
+    rng, semente_faker = _sementes(semente)
+    for offset in range(0, n_linhas, tamanho_lote):
+        n = min(tamanho_lote, n_linhas - offset)
+        df = _gerar_colunas(tabela, n, {}, None, tabelas, rng, offset=offset, semente_faker=semente_faker)
+        yield pa.RecordBatch.from_pandas(df, preserve_index=False)
+
+
+def para_spark(spark, tabelas):
+    """Converte as tabelas geradas em DataFrames Spark usando Arrow."""
+    spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+    return {nome: spark.createDataFrame(df) for nome, df in tabelas.items()}
+
+
+# =====================================
+# ESPECIFICAÇÃO DO MODELO DE PAGAMENTOS
+# =====================================
+
+STATUS_GERAL = ["A", "B", "D", "P", "H"]
+
+CATEGORIAS = [
+    "RESTAURANTE", "SUPERMERCADO", "FARMACIA", "PADARIA", "LOJA DE ROUPAS",
+    "POSTO DE GASOLINA", "ACADEMIA", "PIZZARIA", "BAR", "SALAO DE BELEZA",
+]
+
+TIPOS_FISCAIS = [
+    ("MEI", "Microempreendedor Individual"),
+    ("LTDA", "Sociedade Limitada"),
+    ("EIRELI", "Empresa Individual de Responsabilidade Limitada"),
+    ("EI", "Empresário Individual"),
+    ("SA", "Sociedade Anônima"),
+    ("SIMPLES", "Simples Nacional"),
+    ("SCP", "Sociedade em Conta de Participação"),
+    ("SNC", "Sociedade em Nome Coletivo"),
+    ("SLU", "Sociedade Limitada Unipessoal"),
+    ("ME", "Microempresa"),
+]
+
+FABRICANTES_POS = ["Stone Pagamentos", "Cielo", "Rede", "Getnet", "PagSeguro"]
+
+MODELOS_POS = [
+    "Ingenico Move/5000", "Verifone VX 520", "PAX A920", "Gertec PPC930", "Ingenico iWL250",
+    "Verifone VX 680", "PAX D210", "Gertec MP35P", "Ingenico Desk/5000", "Verifone V200c",
+]
+
+TECNOLOGIAS_POS = ["NFC", "Chip", "Magstripe", "QR Code", "Bluetooth", "Wi-Fi", "3G", "4G", None]
+
+BANDEIRAS_CARTAO = ["Visa", "Mastercard", "Elo", "Hipercard", "Amex", "Cabal", "Sorocred", None]
+
+
+def _colunas_auditoria(taxa_atualizacao=0.5, dias=(1, 100)):
+    return [
+        Coluna("status_registro", booleano()),
+        Coluna("data_criacao", data_hora()),
+        Coluna("data_atualizacao", deslocar_dias("data_criacao", *dias), taxa_nulos=1 - taxa_atualizacao),
+    ]
+
+
+def _pos_distinto_por_estab(ctx):
+    # POS distintos dentro do mesmo estabelecimento: deslocamento aleatório
+    # por estabelecimento + posição do registro dentro dele
+    n_pos = len(ctx["tabelas"]["ponto_venda"])
+    idx_estab = ctx["indices"]["estabelecimentos"]
+    deslocamento = ctx["rng"].integers(0, n_pos, len(ctx["tabelas"]["estabelecimentos"]))
+    return ctx["tabelas"]["ponto_venda"]["pos_id"].to_numpy()[(deslocamento[idx_estab] + ctx["rank"]) % n_pos]
+
+
+def _num_parcela_permitida(ctx):
+    return np.where(ctx["colunas"]["permite_credito"], ctx["rng"].integers(1, 4, ctx["n"]), 0)
+
+
+def _num_parcelas_transacao(ctx):
+    # Respeita o limite de parcelas do estabelecimento_pos sorteado em estab_pos_id
+    permite_credito = do_pai("estabelecimento_pos", "permite_credito")(ctx).astype(bool)
+    num_parcela = do_pai("estabelecimento_pos", "num_parcela")(ctx).astype(float)
+    credito = (ctx["colunas"]["tipo_transacao"] == 1) & permite_credito
+    maximo = np.maximum(np.nan_to_num(num_parcela, nan=1), 1).astype(np.int64)
+    return np.where(credito, ctx["rng"].integers(1, maximo + 1), 0)
+
+
+def _bin_cartao(ctx):
+    bins = ctx["rng"].integers(400000, 700000, ctx["n"]).astype(str).astype(object)
+    return np.where(pd.isna(ctx["colunas"]["bandeira_cartao"]), None, bins)
+
+
+ESPEC_PAGAMENTOS = [
+    Tabela("cidades", 10, [
+        Coluna("cidade_id", sequencial()),
+        Coluna("nome", fake("city")),
+        Coluna("uf", fake("estado_sigla")),
+        Coluna("status_registro", constante(1)),
+        Coluna("data_criacao", data_hora()),
+        Coluna("data_atualizacao", deslocar_dias("data_criacao", 0, 100)),
+    ]),
+    Tabela("enderecos", PorPai("cidades", 3, 3), [
+        Coluna("CEP", fake("postcode")),
+        Coluna("logradouro", fake("street_suffix"), taxa_nulos=0.2),
+        Coluna("endereco", fake("street_name"), taxa_nulos=0.1),
+        Coluna("cidade_id", do_pai("cidades", "cidade_id")),
+        Coluna("status_registro", booleano()),
+        Coluna("data_criacao", data_hora()),
+        Coluna("data_atualizacao", copiar("data_criacao"), taxa_nulos=0.3),
+    ]),
+    Tabela("categoria_estabelecimentos", len(CATEGORIAS), [
+        Coluna("categoria_id", sequencial()),
+        Coluna("desc_categoria", lambda ctx: np.array(CATEGORIAS, dtype=object)),
+        Coluna("status_categoria", escolha(STATUS_GERAL)),
+        *_colunas_auditoria(),
+    ]),
+    Tabela("tipo_fiscal", len(TIPOS_FISCAIS), [
+        Coluna("fiscal_id", sequencial()),
+        Coluna("code_fiscal", lambda ctx: np.array([t[0] for t in TIPOS_FISCAIS], dtype=object)),
+        Coluna("desc_fiscal", lambda ctx: np.array([t[1] for t in TIPOS_FISCAIS], dtype=object)),
+        *_colunas_auditoria(),
+    ]),
+    Tabela("estabelecimentos", 20, [
+        Coluna("estab_id", sequencial()),
+        Coluna("num_cnpj", cnpj()),
+        Coluna("razao_social", fake("company")),
+        Coluna("nome_fantasia", fake("company_suffix"), taxa_nulos=0.2),
+        Coluna("categoria_id", fk("categoria_estabelecimentos", "categoria_id")),
+        Coluna("fiscal_id", fk("tipo_fiscal", "fiscal_id")),
+        Coluna("CEP", fk("enderecos", "CEP")),
+        Coluna("numero_endereco", fake("building_number"), taxa_nulos=0.1),
+        Coluna("complemento", constante("")),
+        Coluna("status_estabelecimento", escolha(STATUS_GERAL)),
+        Coluna("status_registro", booleano()),
+        Coluna("data_criacao", data_hora()),
+        Coluna("data_atualizacao", copiar("data_criacao"), taxa_nulos=0.3),
+    ]),
+    Tabela("fabricantes_pos", len(FABRICANTES_POS), [
+        Coluna("fabricante_id", sequencial()),
+        Coluna("nome_fabricante", lambda ctx: np.array(FABRICANTES_POS, dtype=object)),
+        Coluna("status_pos", escolha(STATUS_GERAL)),
+        *_colunas_auditoria(),
+    ]),
+    Tabela("ponto_venda", 20, [
+        Coluna("pos_id", sequencial()),
+        Coluna("modelo_pos", escolha(MODELOS_POS)),
+        Coluna("tecnologia_pos", escolha(TECNOLOGIAS_POS)),
+        Coluna("fabricante_id", fk("fabricantes_pos", "fabricante_id")),
+        Coluna("status_pos", escolha(STATUS_GERAL)),
+        *_colunas_auditoria(),
+    ]),
+    Tabela("estabelecimento_pos", PorPai("estabelecimentos", 1, 3), [
+        Coluna("estab_pos_id", sequencial()),
+        Coluna("estab_id", do_pai("estabelecimentos", "estab_id")),
+        Coluna("pos_id", derivada(_pos_distinto_por_estab)),
+        Coluna("data_criacao", data_hora()),
+        Coluna("data_ativacao", deslocar_dias("data_criacao", 0, 30), taxa_nulos=0.2),
+        Coluna("data_desativacao", deslocar_dias("data_ativacao", 1, 365), taxa_nulos=0.8),
+        Coluna("permite_debito", booleano()),
+        Coluna("permite_credito", booleano()),
+        Coluna("num_parcela", derivada(_num_parcela_permitida)),
+        Coluna("num_parcela_juros", derivada(
+            lambda ctx: np.where(ctx["colunas"]["permite_credito"], ctx["rng"].integers(4, 11, ctx["n"]), 0)
+        )),
+        # Juros de 1% a 5% por parcela, como no gerador original; a regra
+        # "10% acima de 3 parcelas" nunca se aplicava (num_parcela vai até 3)
+        Coluna("taxa_juros", derivada(lambda ctx: np.where(
+            ctx["colunas"]["permite_credito"], np.round(ctx["rng"].uniform(1.0, 5.0, ctx["n"]), 2), 0.0
+        ))),
+        Coluna("taxa_mdr", decimal(1.0, 4.0)),
+        Coluna("taxa_rav", decimal(0.5, 3.0)),
+        Coluna("equipamento_alugado", escolha([1, 2])),
+        Coluna("status_estab_pos", escolha(STATUS_GERAL + ["R"])),
+        Coluna("status_registro", booleano()),
+        Coluna("data_atualizacao", deslocar_dias("data_criacao", 1, 100), taxa_nulos=0.5),
+    ]),
+    Tabela("transacoes", 1000, [
+        Coluna("transacao_id", sequencial()),
+        Coluna("estab_pos_id", fk("estabelecimento_pos", "estab_pos_id")),
+        Coluna("data_transacao", data_hora()),
+        Coluna("valor_transacao", decimal(10.0, 2000.0)),
+        Coluna("tipo_transacao", inteiro(0, 1)),  # 0 = Débito, 1 = Crédito
+        Coluna("num_parcelas", derivada(_num_parcelas_transacao)),
+        Coluna("bandeira_cartao", escolha(BANDEIRAS_CARTAO)),
+        Coluna("bin_cartao", derivada(_bin_cartao)),
+        Coluna("status_transacao", escolha(["A", "P", "C", "N"])),
+        Coluna("status_registro", booleano()),
+        Coluna("data_criacao", deslocar_dias("data_transacao", 0, 10, sinal=-1)),
+        Coluna("data_atualizacao", deslocar_dias("data_criacao", 1, 10), taxa_nulos=0.7),
+    ]),
+    Agregada("cronograma", lambda tabelas, rng: _cronograma(tabelas, rng)),
+]
+
+
+def _auditoria(df, data_referencia, rng, taxa_atualizacao=0.3):
+    # status_registro, data_criacao (até 5 dias antes da referência) e data_atualizacao
+    n = len(df)
+    df["status_registro"] = rng.random(n) < 0.5
+    df["data_criacao"] = pd.to_datetime(data_referencia).to_numpy() - rng.integers(0, 6, n) * _UM_DIA
+    df["data_atualizacao"] = pd.Series(df["data_criacao"].to_numpy() + rng.integers(1, 6, n) * _UM_DIA) \
+        .mask(rng.random(n) >= taxa_atualizacao).to_numpy()
+    return df
+
+
+def _cronograma(tabelas, rng, fracao_antecipada=0.4):
+    # Parcelas, antecipações e recebimentos calculados pelo motor de cronograma,
+    # mais as colunas de status/auditoria do modelo
+    base = cronograma.taxas_por_transacao(tabelas["transacoes"], tabelas["estabelecimento_pos"])
+    parcelas = cronograma.expandir_parcelas(base)
+
+    n_ant = int(round(len(parcelas) * fracao_antecipada))
+    selecionadas = parcelas.iloc[np.sort(rng.choice(len(parcelas), n_ant, replace=False))]
+    antecipacoes = cronograma.antecipar(selecionadas, rng.integers(1, 26, n_ant))
+
+    recebiveis = cronograma.recebiveis(base, parcelas, antecipacoes)
+    n_rec = recebiveis["recebimento_id"].nunique()
+    valor_pos = np.where(rng.random(n_rec) < 0.2, np.round(rng.uniform(0, 50, n_rec), 2), 0.0)
+    recebimentos = cronograma.agregar_recebimentos(recebiveis, valor_pos)
+
+    data_transacao = parcelas["data_vencimento"] - parcelas["codigo_parcela"].to_numpy() * cronograma.PRAZO_PARCELA_DIAS * _UM_DIA
+    parcelas = parcelas.drop(columns=["estab_id", "taxa_rav"])
+    parcelas["status_parcela"] = np.array(["A", "P", "X"], dtype=object)[rng.integers(0, 3, len(parcelas))]
+    parcelas = _auditoria(parcelas, data_transacao, rng)
+
+    antecipacoes.insert(0, "antecipacao_id", np.arange(1, n_ant + 1))
+    antecipacoes["status_antecipacao"] = np.array(["A", "B", "R", "P"], dtype=object)[rng.integers(0, 4, n_ant)]
+    antecipacoes = _auditoria(antecipacoes, antecipacoes["data_vencimento_antecipado"], rng)
+
+    n_rec = len(recebimentos)
+    recebimentos.insert(1, "num_recebimento", np.arange(1000, 1000 + n_rec))
+    recebimentos["estab_id"] = recebimentos["estab_id"].astype(str)
+    recebimentos["status_recebimento"] = np.array(["A", "C"], dtype=object)[rng.integers(0, 2, n_rec)]
+    recebimentos = _auditoria(recebimentos, recebimentos["data_recebimento"], rng)
+
+    # Vínculo título x parcela: recebimento_id já vem calculado em cada recebível
+    credito = recebiveis[recebiveis["transacao_parc_id"].notna()]
+    ids_parc = credito["transacao_parc_id"].astype(np.int64).to_numpy()
+    por_parcela = parcelas.set_index("transacao_parc_id")
+    recebimento_transacoes = pd.DataFrame({
+        "recebimento_trn_id": np.arange(1, len(credito) + 1),
+        "recebimento_id": credito["recebimento_id"].to_numpy(),
+        "transacao_parc_id": ids_parc,
+        "status_registro": por_parcela["status_registro"].reindex(ids_parc).to_numpy(),
+        "data_criacao": por_parcela["data_criacao"].reindex(ids_parc).to_numpy(),
+        "data_atualizacao": por_parcela["data_atualizacao"].reindex(ids_parc).to_numpy(),
+    })
+
+    return {
+        "transacoes_parcelas": parcelas,
+        "antecipacoes": antecipacoes,
+        "recebimentos": recebimentos,
+        "recebimento_transacoes": recebimento_transacoes,
+    }
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""Índice de salto de arquivos (data skipping) para buscas pontuais em tabelas Delta.
+
+Particionar por Ano/Mes e ZORDER por DataVenda ajudam consultas por data, mas
+buscas por IDCliente, Email, sk_produto ou document_number (CNPJ) continuam
+lendo todos os arquivos. Este módulo mantém, para colunas escolhidas, um
+resumo por arquivo de dados numa tabela Delta auxiliar (<tabela>_indice):
+
+    arquivo, coluna, n_linhas, n_distintos, minimo, maximo, bloom (filtro de Bloom)
+
+atualizar_indice deve ser chamado depois de cada write/merge: só os arquivos
+novos do snapshot são lidos e as entradas de arquivos removidos (merge,
+optimize, overwrite) são apagadas. Na busca, o min/max e o filtro de Bloom de
+cada arquivo decidem se ele pode conter o valor, e só os candidatos são lidos
+(arquivos ainda fora do índice são sempre lidos, então um índice atrasado
+deixa a busca mais lenta, mas não incompleta).
+
+A poda é feita na leitura: sem deletion vectors nem column mapping os
+candidatos são lidos diretamente como Parquet, e o scan só abre esses
+arquivos. Com algum dos dois recursos ligados a leitura precisa passar pelo
+Delta, que ainda lista todos os arquivos e filtra pelo caminho em _metadata.
+Os caminhos são comparados decodificados: inputFiles() devolve o caminho
+decodificado, input_file_name() e _metadata.file_path o codificado em URL.
+
+Os valores são comparados pelo texto (cast para string no Spark), então a
+busca deve usar o mesmo tipo gravado: buscar(..., "IDCliente", 123).
+
+Exemplo:
+    with indexando(spark, f"{gold_path}/fato_vendas", ["sk_cliente", "sk_produto"]):
+        df.write.format("delta").mode("append").save(f"{gold_path}/fato_vendas")
+    df = buscar(spark, f"{gold_path}/fato_vendas", "sk_cliente", [42, 77])
+"""
+
+import logging
+import math
+from collections import namedtuple
+from contextlib import contextmanager
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+from pyspark.sql import functions as F
+from pyspark.sql.types import NumericType
+
+logger = logging.getLogger(__name__)
+
+EntradaIndice = namedtuple("EntradaIndice", ["arquivo", "minimo", "maximo", "bits", "hashes", "bloom"])
+
+SCHEMA_INDICE = (
+    "arquivo string, coluna string, n_linhas long, n_distintos long, "
+    "minimo string, maximo string, bits long, hashes int, bloom binary"
+)
+
+# Taxa de falso positivo alvo do filtro de Bloom
+FPP_PADRAO = 0.01
+_MIN_BITS = 64
+
+# Colunas indexadas por tabela, relativas ao gold_path / silver_path
+INDICES_PADRAO = {
+    "fato_vendas": ["sk_cliente", "sk_produto"],
+    "dim_cliente": ["IDCliente", "Email"],
+    "customers": ["customer_id", "document_number"],
+}
+
+
+def caminho_indice(caminho):
+    return caminho.rstrip("/") + "_indice"
+
+
+def _normalizar(arquivo):
+    # Mesmo arquivo pode vir codificado em URL (input_file_name, _metadata) ou não (inputFiles)
+    return unquote(arquivo)
+
+
+# =====================================
+# FILTRO DE BLOOM (NumPy)
+# =====================================
+
+def _dimensionar(n_distintos, fpp):
+    n = max(int(n_distintos), 1)
+    bits = max(_MIN_BITS, int(math.ceil(-n * math.log(fpp) / math.log(2) ** 2)))
+    hashes = max(1, int(round(bits / n * math.log(2))))
+    return bits, hashes
+
+
+def _posicoes(valores_str, bits, hashes):
+    # Double hashing: h1 + i*h2 (mod bits), com o hash estável do pandas
+    h1 = pd.util.hash_array(np.asarray(valores_str, dtype=object)).astype(np.uint64)
+    h2 = pd.util.hash_array(np.asarray(valores_str, dtype=object), hash_key="indice_salto_002").astype(np.uint64) | np.uint64(1)
+    i = np.arange(hashes, dtype=np.uint64)[:, np.newaxis]
+    return ((h1 + i * h2) % np.uint64(bits)).astype(np.int64)
+
+
+def _construir_bloom(valores_str, bits, hashes):
+    vetor = np.zeros(bits, dtype=bool)
+    vetor[_posicoes(valores_str, bits, hashes).ravel()] = True
+    return np.packbits(vetor).tobytes()
+
+
+def _bloom_contem(bloom, bits, hashes, valores_str):
+    vetor = np.unpackbits(np.frombuffer(bloom, dtype=np.uint8))[:bits].astype(bool)
+    return vetor[_posicoes(valores_str, bits, hashes)].all(axis=0)
+
+
+# =====================================
+# CONSTRUÇÃO / ATUALIZAÇÃO
+# =====================================
+
+def _resumir_arquivo(colunas, fpp):
+    def resumir(pdf):
+        linhas = []
+        arquivo = _normalizar(pdf["_arquivo"].iloc[0])
+        for coluna in colunas:
+            serie = pdf[coluna].dropna()
+            textos = pdf[f"_str_{coluna}"].dropna().unique()
+            bits, hashes = _dimensionar(len(textos), fpp)
+            linhas.append({
+                "arquivo": arquivo,
+                "coluna": coluna,
+                "n_linhas": len(pdf),
+                "n_distintos": len(textos),
+                "minimo": str(serie.min()) if len(serie) else None,
+                "maximo": str(serie.max()) if len(serie) else None,
+                "bits": bits,
+                "hashes": hashes,
+                "bloom": _construir_bloom(textos, bits, hashes),
+            })
+        return pd.DataFrame(linhas)
+    return resumir
+
+
+def _arquivos_atuais(spark, caminho):
+    return {_normalizar(a) for a in spark.read.format("delta").load(caminho).inputFiles()}
+
+
+def atualizar_indice(spark, caminho, colunas, fpp=FPP_PADRAO):
+    """Indexa os arquivos novos do snapshot atual e remove os que saíram dele.
+
+    Deve ser chamado depois de cada gravação ou MERGE na tabela.
+    Retorna (arquivos indexados, arquivos removidos do índice).
+    """
+    from delta.tables import DeltaTable
+
+    destino = caminho_indice(caminho)
+    atuais = _arquivos_atuais(spark, caminho)
+    existe = DeltaTable.isDeltaTable(spark, destino)
+
+    gravados = []
+    if existe:
+        gravados = spark.read.format("delta").load(destino).select("arquivo", "coluna").distinct().collect()
+    indexados = {(_normalizar(r.arquivo), r.coluna) for r in gravados}
+    novos = sorted({a for a in atuais if any((a, c) not in indexados for c in colunas)})
+    # Entradas gravadas antes da normalização podem estar codificadas: apaga pelo valor gravado
+    removidos = sorted({r.arquivo for r in gravados if _normalizar(r.arquivo) not in atuais})
+
+    if novos:
+        # Lê só os arquivos novos; basePath recupera as colunas de partição
+        dados = spark.read.option("basePath", caminho).parquet(*novos) \
+            .withColumn("_arquivo", F.input_file_name())
+        selecao = ["_arquivo"]
+        for c in colunas:
+            selecao += [F.col(c), F.col(c).cast("string").alias(f"_str_{c}")]
+        resumo = dados.select(*selecao) \
+            .groupBy("_arquivo") \
+            .applyInPandas(_resumir_arquivo(colunas, fpp), schema=SCHEMA_INDICE)
+        if existe:
+            # Reindexação de colunas novas em arquivos já indexados
+            DeltaTable.forPath(spark, destino).alias("t").merge(
+                resumo.alias("s"), "t.arquivo = s.arquivo AND t.coluna = s.coluna"
+            ).whenMatchedUpdateAll().whenNotMatchedInsertAll().execute()
+        else:
+            resumo.write.format("delta").mode("overwrite").save(destino)
+
+    if removidos and existe:
+        DeltaTable.forPath(spark, destino).delete(F.col("arquivo").isin(removidos))
+
+    logger.info("Índice %s: %d arquivos indexados, %d removidos", destino, len(novos), len(removidos))
+    return novos, removidos
+
+
+@contextmanager
+def indexando(spark, caminho, colunas, fpp=FPP_PADRAO):
+    """Atualiza o índice ao fim do bloco que grava na tabela (write ou MERGE).
+
+        with indexando(spark, silver_customers, INDICES_PADRAO["customers"]):
+            delta_table.alias("target").merge(...).execute()
+    """
+    yield
+    atualizar_indice(spark, caminho, colunas, fpp)
+
+
+# =====================================
+# BUSCA
+# =====================================
+
+def _podem_conter(entradas, valores, numerico):
+    """Arquivos das entradas do índice cujo min/max e Bloom admitem algum valor."""
+    def converter(v):
+        return float(v) if numerico else str(v)
+
+    textos = np.array([str(v) for v in valores], dtype=object)
+    convertidos = [converter(v) for v in valores]
+    arquivos = []
+    for e in entradas:
+        if e.minimo is None:
+            continue
+        minimo, maximo = converter(e.minimo), converter(e.maximo)
+        no_intervalo = np.array([minimo <= v <= maximo for v in convertidos])
+        if not no_intervalo.any():
+            continue
+        if _bloom_contem(e.bloom, e.bits, e.hashes, textos[no_intervalo]).any():
+            arquivos.append(e.arquivo)
+    return arquivos
+
+
+def arquivos_candidatos(spark, caminho, coluna, valores):
+    """Arquivos do snapshot atual que podem conter algum dos valores.
+
+    Arquivos indexados passam pelo min/max e pelo filtro de Bloom; arquivos
+    gravados sem atualizar o índice entram sempre como candidatos.
+    """
+    valores = list(valores) if isinstance(valores, (list, tuple, set)) else [valores]
+    entradas = [
+        EntradaIndice(_normalizar(r.arquivo), r.minimo, r.maximo, r.bits, r.hashes, r.bloom)
+        for r in spark.read.format("delta").load(caminho_indice(caminho))
+        .filter(F.col("coluna") == coluna)
+        .collect()
+    ]
+    if not entradas:
+        raise ValueError(f"Coluna {coluna} não está indexada para {caminho}")
+
+    tabela = spark.read.format("delta").load(caminho)
+    atuais = {_normalizar(a) for a in tabela.inputFiles()}
+    numerico = isinstance(tabela.schema[coluna].dataType, NumericType)
+    nao_indexados = atuais - {e.arquivo for e in entradas}
+    candidatos = sorted((set(_podem_conter(entradas, valores, numerico)) & atuais) | nao_indexados)
+    logger.info("Busca em %s.%s: %d de %d arquivos candidatos (%d fora do índice)",
+                caminho, coluna, len(candidatos), len(atuais), len(nao_indexados))
+    return candidatos
+
+
+def _leitura_direta_permitida(spark, caminho):
+    """Os arquivos Parquet da tabela podem ser lidos sem o Delta?
+
+    Deletion vectors escondem linhas apagadas dentro dos arquivos e column
+    mapping troca os nomes físicos das colunas; com qualquer um deles ligado
+    a leitura precisa passar pelo snapshot Delta.
+    """
+    detalhe = spark.sql(f"DESCRIBE DETAIL delta.`{caminho}`").collect()[0]
+    propriedades = detalhe["properties"] or {}
+    recursos = set(detalhe["tableFeatures"] or []) if "tableFeatures" in detalhe.asDict() else set()
+    return (
+        propriedades.get("delta.enableDeletionVectors", "false").lower() != "true"
+        and propriedades.get("delta.columnMapping.mode", "none").lower() == "none"
+        and not recursos & {"deletionVectors", "columnMapping"}
+    )
+
+
+def _ler_arquivos(spark, caminho, arquivos, schema):
+    """Só os arquivos dados, com o schema da tabela e as colunas de partição."""
+    return spark.read.schema(schema) \
+        .option("basePath", caminho) \
+        .parquet(*arquivos) \
+        .select(*schema.fieldNames())
+
+
+def buscar(spark, caminho, coluna, valores):
+    """Linhas com coluna em `valores`, lendo só os arquivos candidatos.
+
+    Os candidatos são lidos diretamente como Parquet quando a tabela não usa
+    deletion vectors nem column mapping; senão a leitura passa pelo snapshot
+    Delta e é restrita aos candidatos pelo caminho do arquivo em _metadata.
+    """
+    valores = list(valores) if isinstance(valores, (list, tuple, set)) else [valores]
+    candidatos = arquivos_candidatos(spark, caminho, coluna, valores)
+    tabela = spark.read.format("delta").load(caminho)
+    if not candidatos:
+        return tabela.limit(0)
+    if _leitura_direta_permitida(spark, caminho):
+        dados = _ler_arquivos(spark, caminho, candidatos, tabela.schema)
+    else:
+        decodificar = F.udf(_normalizar, "string")
+        dados = tabela.filter(decodificar(F.col("_metadata.file_path")).isin(candidatos))
+    return dados.filter(F.col(coluna).isin(valores))
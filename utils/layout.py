@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""Escolha do layout físico de tabelas Delta a partir das consultas realmente feitas.
+
+Hoje o layout é chutado: partitionBy("Ano", "Mes") na fato_vendas, ZORDER BY
+(DataVenda) no 008, geo_regiao particionada por Regiao. Aqui:
+
+1. as consultas passam por consultar(), que registra as colunas de filtro,
+   join e agrupamento (com os valores dos filtros) num log JSON lines;
+2. recomendar() lê uma amostra da tabela, simula para cada layout candidato
+   (partição, Z-order ou clustering) como as linhas ficariam distribuídas em
+   arquivos e quantos deles cada consulta registrada pularia pelo min/max de
+   cada arquivo, e escolhe o que lê menos bytes; se nenhum candidato lê
+   menos que o layout atual por uma margem, a recomendação é LAYOUT_ATUAL;
+3. reorganizar() regrava a tabela no layout escolhido (nunca no LAYOUT_ATUAL)
+   e mede os bytes varridos por cada consulta antes e depois.
+
+O clustering (CLUSTER BY do Delta, curva de Hilbert) é simulado com a mesma
+curva Z do ZORDER; a diferença entre as duas é pequena para poucas colunas.
+
+Exemplo:
+    registro = RegistroConsultas()
+    df = consultar(spark, fato, filtros={"Ano": 2012, "Mes": 10}, registro=registro)
+    df = consultar(spark, fato, juntar=[(f"{gold}/dim_categoria", "sk_categoria")],
+                   agrupar=["Categoria", "Ano"], registro=registro)
+    res = reorganizar(spark, fato, registro)
+    print(res.recomendacao.layout, res.relatorio)
+"""
+
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from pyspark.sql import functions as F
+
+logger = logging.getLogger(__name__)
+
+Consulta = namedtuple("Consulta", ["tabela", "filtros", "juntas", "agrupamentos", "momento"])
+Layout = namedtuple("Layout", ["particao", "ordem", "tipo"], defaults=[(), (), "zorder"])
+Simulacao = namedtuple("Simulacao", ["layout", "fracao_lida", "arquivos", "por_consulta"])
+Recomendacao = namedtuple("Recomendacao", ["layout", "fracao_lida", "atual", "simulacoes"])
+ResultadoReorganizacao = namedtuple("ResultadoReorganizacao", ["recomendacao", "relatorio"])
+
+LAYOUT_ATUAL = Layout((), (), "atual")
+
+# Bits por coluna na curva Z (até 3 colunas cabem em 64 bits)
+_BITS_ZORDER = 20
+_MAX_CARDINALIDADE_PARTICAO = 1000
+# Redução relativa mínima da fração lida para valer a pena regravar a tabela
+MARGEM_PADRAO = 0.1
+
+
+def _chave(caminho):
+    return caminho.rstrip("/")
+
+
+# =====================================
+# REGISTRO DAS CONSULTAS
+# =====================================
+
+def _normalizar_filtros(filtros):
+    """{coluna: valor | [valores] | (min, max)} -> [[coluna, op, valor]] serializável.
+
+    Tupla é intervalo fechado (None deixa o lado aberto); lista ou set é IN.
+    """
+    normalizados = []
+    for coluna, valor in (filtros or {}).items():
+        if isinstance(valor, tuple):
+            normalizados.append([coluna, "entre", list(valor)])
+        elif isinstance(valor, (list, set)):
+            normalizados.append([coluna, "in", sorted(valor, key=str)])
+        else:
+            normalizados.append([coluna, "=", valor])
+    return normalizados
+
+
+class RegistroConsultas:
+    """Log JSON lines das consultas feitas por consultar()."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or os.path.join(tempfile.gettempdir(), "consultas_layout.jsonl")
+        self._trava = threading.Lock()
+
+    def registrar(self, tabela, filtros=None, juntas=(), agrupamentos=()):
+        consulta = Consulta(_chave(tabela), _normalizar_filtros(filtros), list(juntas), list(agrupamentos), time.time())
+        with self._trava, open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(consulta._asdict(), default=str) + "\n")
+        return consulta
+
+    def consultas(self, tabela=None):
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                todas = [Consulta(**json.loads(linha)) for linha in f if linha.strip()]
+        except FileNotFoundError:
+            return []
+        if tabela is None:
+            return todas
+        return [c for c in todas if c.tabela == _chave(tabela)]
+
+    def frequencias(self, tabela):
+        """Quantas consultas usaram cada coluna, por papel (filtro, junta, agrupamento)."""
+        contagem = {"filtro": Counter(), "junta": Counter(), "agrupamento": Counter()}
+        for c in self.consultas(tabela):
+            contagem["filtro"].update({coluna for coluna, _, _ in c.filtros})
+            contagem["junta"].update(set(c.juntas))
+            contagem["agrupamento"].update(set(c.agrupamentos))
+        return contagem
+
+
+def _predicado(filtros):
+    condicao = F.lit(True)
+    for coluna, op, valor in filtros:
+        if op == "=":
+            condicao &= F.col(coluna) == valor
+        elif op == "in":
+            condicao &= F.col(coluna).isin(valor)
+        else:
+            minimo, maximo = valor
+            if minimo is not None:
+                condicao &= F.col(coluna) >= minimo
+            if maximo is not None:
+                condicao &= F.col(coluna) <= maximo
+    return condicao
+
+
+def consultar(spark, caminho, filtros=None, juntar=(), agrupar=(), agregacoes=None, registro=None):
+    """Lê a tabela Delta com filtros, joins (broadcast) e agrupamento, registrando as colunas.
+
+    juntar: [(caminho_dimensao, coluna_chave)]; agregacoes: expressões para
+    .agg() (padrão: contagem de linhas).
+    """
+    df = spark.read.format("delta").load(caminho)
+    normalizados = _normalizar_filtros(filtros)
+    if normalizados:
+        df = df.filter(_predicado(normalizados))
+    for caminho_dim, chave in juntar:
+        df = df.join(F.broadcast(spark.read.format("delta").load(caminho_dim)), chave)
+    if agrupar:
+        df = df.groupBy(*agrupar).agg(*(agregacoes or [F.count(F.lit(1)).alias("linhas")]))
+    if registro is not None:
+        registro.registrar(caminho, filtros, [chave for _, chave in juntar], agrupar)
+    return df
+
+
+# =====================================
+# SIMULAÇÃO DE LAYOUTS (amostra em pandas)
+# =====================================
+
+def _codificar(amostra, colunas):
+    """Posto de cada valor entre os valores distintos da amostra (numérico ou texto)."""
+    codigos, universos = {}, {}
+    for coluna in colunas:
+        serie = amostra[coluna]
+        numerico = pd.api.types.is_numeric_dtype(serie)
+        valores = serie.astype(float).to_numpy() if numerico else serie.astype(str).to_numpy()
+        universo = np.unique(valores)
+        codigos[coluna] = np.searchsorted(universo, valores)
+        universos[coluna] = (universo, numerico)
+    return pd.DataFrame(codigos, index=amostra.index), universos
+
+
+def _intervalos(filtros, universos):
+    # Converte cada filtro em intervalos [lo, hi] de postos
+    intervalos = []
+    for coluna, op, valor in filtros:
+        if coluna not in universos:
+            continue
+        universo, numerico = universos[coluna]
+        converter = float if numerico else str
+        if op == "entre":
+            minimo, maximo = valor
+            lo = 0 if minimo is None else np.searchsorted(universo, converter(minimo), "left")
+            hi = len(universo) - 1 if maximo is None else np.searchsorted(universo, converter(maximo), "right") - 1
+            intervalos.append((coluna, [(lo, hi)]))
+        else:
+            valores = valor if op == "in" else [valor]
+            intervalos.append((coluna, [
+                (np.searchsorted(universo, converter(v), "left"), np.searchsorted(universo, converter(v), "right") - 1)
+                for v in valores
+            ]))
+    return intervalos
+
+
+def _fracao_lida(minimos, maximos, linhas, intervalos):
+    """Fração das linhas em arquivos que o min/max não permite pular."""
+    lidos = np.ones(len(linhas), dtype=bool)
+    for coluna, faixas in intervalos:
+        alguma = np.zeros(len(linhas), dtype=bool)
+        for lo, hi in faixas:
+            alguma |= (minimos[coluna].to_numpy() <= hi) & (maximos[coluna].to_numpy() >= lo)
+        lidos &= alguma
+    return linhas[lidos].sum() / linhas.sum()
+
+
+def _valor_z(codigos, colunas):
+    # Postos reescalados para a mesma faixa, como o ZORDER faz com as colunas
+    escalados = []
+    for coluna in colunas:
+        c = codigos[coluna].to_numpy().astype(float)
+        maximo = max(c.max(), 1.0)
+        escalados.append(np.floor(c / maximo * ((1 << _BITS_ZORDER) - 1)).astype(np.uint64))
+    z = np.zeros(len(codigos), dtype=np.uint64)
+    for bit in range(_BITS_ZORDER):
+        for j, c in enumerate(escalados):
+            z |= ((c >> np.uint64(bit)) & np.uint64(1)) << np.uint64(bit * len(colunas) + j)
+    return z
+
+
+def _arquivos_simulados(codigos, layout, linhas_por_arquivo):
+    """Número do arquivo de cada linha da amostra no layout candidato."""
+    chave = pd.Series(0, index=codigos.index)
+    if layout.particao:
+        chave = codigos.groupby(list(layout.particao)).ngroup()
+    if layout.ordem:
+        ordem = _valor_z(codigos, layout.ordem)
+    else:
+        ordem = np.arange(len(codigos), dtype=np.uint64)
+    ordenado = np.lexsort((ordem, chave.to_numpy()))
+    particao = chave.to_numpy()[ordenado]
+    # Posição dentro da partição -> arquivo de até linhas_por_arquivo linhas
+    inicio = np.r_[0, np.flatnonzero(np.diff(particao)) + 1]
+    posicao = np.arange(len(particao)) - np.repeat(inicio, np.diff(np.r_[inicio, len(particao)]))
+    arquivo = np.empty(len(particao), dtype=np.int64)
+    arquivo[ordenado] = particao * (len(codigos) + 1) + posicao // max(linhas_por_arquivo, 1)
+    return arquivo
+
+
+def _simular(codigos, arquivos, layout, consultas, universos):
+    por_arquivo = codigos.groupby(arquivos)
+    minimos, maximos = por_arquivo.min(), por_arquivo.max()
+    linhas = por_arquivo.size().to_numpy()
+    por_consulta = [
+        _fracao_lida(minimos, maximos, linhas, _intervalos(c.filtros, universos)) for c in consultas
+    ]
+    fracao = float(np.mean(por_consulta)) if por_consulta else 1.0
+    return Simulacao(layout, fracao, len(linhas), por_consulta)
+
+
+def candidatos(frequencias, cardinalidades, max_colunas_ordem=3):
+    """Layouts candidatos a partir das colunas mais usadas nas consultas."""
+    filtro, junta, agrupamento = frequencias["filtro"], frequencias["junta"], frequencias["agrupamento"]
+    usadas = [c for c, _ in (filtro + junta).most_common() if c in cardinalidades]
+    particoes = [
+        c for c, _ in (filtro + agrupamento).most_common()
+        if c in cardinalidades and cardinalidades[c] <= _MAX_CARDINALIDADE_PARTICAO
+    ]
+    opcoes_particao = [()] + [(p,) for p in particoes] + [tuple(par) for par in combinations(particoes[:3], 2)]
+    layouts = []
+    for particao in opcoes_particao:
+        resto = [c for c in usadas if c not in particao]
+        layouts.append(Layout(particao, ()))
+        for n in range(1, min(max_colunas_ordem, len(resto)) + 1):
+            layouts.append(Layout(particao, tuple(resto[:n])))
+    layouts += [Layout((), tuple(usadas[:n]), "cluster") for n in range(1, min(max_colunas_ordem, len(usadas)) + 1)]
+    return layouts
+
+
+def _escolher(atual, simulacoes, margem=MARGEM_PADRAO):
+    """Simulação que lê menos; a do layout atual se nenhuma o supera pela margem.
+
+    Empates na fração lida ficam com o layout mais simples.
+    """
+    ordenadas = sorted(simulacoes, key=lambda s: (s.fracao_lida, len(s.layout.particao) + len(s.layout.ordem)))
+    if ordenadas and ordenadas[0].fracao_lida < atual.fracao_lida * (1 - margem):
+        return ordenadas[0]
+    return atual
+
+
+def recomendar(spark, caminho, registro, fracao_amostra=0.1, linhas_por_arquivo=1000000, semente=42,
+               margem=MARGEM_PADRAO):
+    """Simula os layouts candidatos sobre uma amostra e escolhe o que menos lê.
+
+    Layouts que gerariam arquivos com menos de um quarto de linhas_por_arquivo
+    em média (excesso de partições) são descartados. O candidato só é
+    recomendado se ler menos que (1 - margem) da fração lida hoje; senão a
+    recomendação é manter o layout atual (LAYOUT_ATUAL).
+    """
+    consultas = [c for c in registro.consultas(caminho) if c.filtros]
+    if not consultas:
+        raise ValueError(f"Nenhuma consulta com filtros registrada para {caminho}")
+    frequencias = registro.frequencias(caminho)
+    tabela = spark.read.format("delta").load(caminho)
+    colunas = sorted({c for papel in frequencias.values() for c in papel} & set(tabela.columns))
+
+    total = tabela.count()
+    amostra = tabela.select(*colunas) \
+        .withColumn("_arquivo", F.input_file_name()) \
+        .sample(fraction=fracao_amostra, seed=semente) \
+        .toPandas()
+    codigos, universos = _codificar(amostra, colunas)
+    cardinalidades = {c: len(universos[c][0]) for c in colunas}
+    linhas_amostra = max(1, int(linhas_por_arquivo * len(amostra) / max(total, 1)))
+
+    atual = _simular(codigos, amostra["_arquivo"].to_numpy(), LAYOUT_ATUAL, consultas, universos)
+    simulacoes = []
+    for layout in candidatos(frequencias, cardinalidades):
+        if layout.particao:
+            n_particoes = codigos.groupby(list(layout.particao)).ngroups
+            if total / n_particoes < linhas_por_arquivo / 4:
+                logger.info("Layout %s descartado: %d partições para %d linhas", layout, n_particoes, total)
+                continue
+        arquivos = _arquivos_simulados(codigos, layout, linhas_amostra)
+        simulacoes.append(_simular(codigos, arquivos, layout, consultas, universos))
+
+    simulacoes.sort(key=lambda s: (s.fracao_lida, len(s.layout.particao) + len(s.layout.ordem)))
+    melhor = _escolher(atual, simulacoes, margem)
+    if melhor is atual:
+        logger.info("Layout atual mantido para %s: nenhum candidato lê menos que %.1f%% (hoje %.1f%%)",
+                    caminho, 100 * atual.fracao_lida * (1 - margem), 100 * atual.fracao_lida)
+    else:
+        logger.info("Layout recomendado para %s: %s (lê %.1f%% contra %.1f%% hoje)",
+                    caminho, melhor.layout, 100 * melhor.fracao_lida, 100 * atual.fracao_lida)
+    return Recomendacao(melhor.layout, melhor.fracao_lida, atual, simulacoes)
+
+
+# =====================================
+# REESCRITA E RELATÓRIO DE VARREDURA
+# =====================================
+
+def bytes_varridos(spark, df):
+    """(arquivos, bytes) lidos pelos scans de arquivos ao executar `df`.
+
+    Usa as métricas numFiles/filesSize dos FileSourceScanExec, que já refletem
+    o partition pruning e o data skipping do Delta. O AQE é desligado durante
+    a medição para que os scans fiquem nas folhas do plano executado.
+    """
+    aqe = spark.conf.get("spark.sql.adaptive.enabled", "true")
+    spark.conf.set("spark.sql.adaptive.enabled", "false")
+    try:
+        execucao = df._jdf.queryExecution()
+        execucao.toRdd().count()
+        folhas = execucao.executedPlan().collectLeaves()
+        arquivos = tamanho = 0
+        for i in range(folhas.size()):
+            metricas = folhas.apply(i).metrics()
+            if metricas.contains("filesSize"):
+                arquivos += int(metricas.apply("numFiles").value())
+                tamanho += int(metricas.apply("filesSize").value())
+        return arquivos, tamanho
+    finally:
+        spark.conf.set("spark.sql.adaptive.enabled", aqe)
+
+
+def relatorio_varredura(spark, caminho, consultas):
+    """Arquivos e bytes varridos por cada consulta registrada (só os filtros da tabela)."""
+    tabela = spark.read.format("delta").load(caminho)
+    relatorio = []
+    for c in consultas:
+        arquivos, tamanho = bytes_varridos(spark, tabela.filter(_predicado(c.filtros)))
+        relatorio.append({"filtros": c.filtros, "arquivos": arquivos, "bytes": tamanho})
+    return relatorio
+
+
+def aplicar_layout(spark, caminho, layout, linhas_por_arquivo=1000000):
+    """Regrava a tabela no layout: partição + ZORDER, ou CLUSTER BY (liquid clustering)."""
+    if layout.tipo == LAYOUT_ATUAL.tipo:
+        raise ValueError("LAYOUT_ATUAL não é aplicável: a tabela já está nesse layout")
+    colunas_ordem = ", ".join(layout.ordem)
+    if layout.tipo == "cluster":
+        spark.sql(f"""
+            CREATE OR REPLACE TABLE delta.`{caminho}`
+            CLUSTER BY ({colunas_ordem})
+            AS SELECT * FROM delta.`{caminho}`
+        """)
+        spark.sql(f"OPTIMIZE delta.`{caminho}`")
+        return
+
+    spark.read.format("delta").load(caminho) \
+        .write.format("delta") \
+        .mode("overwrite") \
+        .option("overwriteSchema", "true") \
+        .option("maxRecordsPerFile", linhas_por_arquivo) \
+        .partitionBy(*layout.particao) \
+        .save(caminho)
+    if layout.ordem:
+        spark.sql(f"OPTIMIZE delta.`{caminho}` ZORDER BY ({colunas_ordem})")
+
+
+def reorganizar(spark, caminho, registro, fracao_amostra=0.1, linhas_por_arquivo=1000000, aplicar=True,
+                margem=MARGEM_PADRAO):
+    """Recomenda o layout, regrava a tabela e compara os bytes varridos antes e depois.
+
+    Quando a recomendação é LAYOUT_ATUAL a tabela não é regravada, mesmo com
+    aplicar=True.
+    """
+    recomendacao = recomendar(spark, caminho, registro, fracao_amostra, linhas_por_arquivo, margem=margem)
+    consultas = [c for c in registro.consultas(caminho) if c.filtros]
+    antes = relatorio_varredura(spark, caminho, consultas)
+    if not aplicar or recomendacao.layout == LAYOUT_ATUAL:
+        return ResultadoReorganizacao(recomendacao, antes)
+
+    aplicar_layout(spark, caminho, recomendacao.layout, linhas_por_arquivo)
+    depois = relatorio_varredura(spark, caminho, consultas)
+    relatorio = [
+        {**a, "arquivos_depois": d["arquivos"], "bytes_depois": d["bytes"],
+         "reducao": 1 - d["bytes"] / a["bytes"] if a["bytes"] else math.nan}
+        for a, d in zip(antes, depois)
+    ]
+    total_antes = sum(r["bytes"] for r in relatorio)
+    total_depois = sum(r["bytes_depois"] for r in relatorio)
+    logger.info("Layout %s aplicado em %s: %d -> %d bytes varridos pelas %d consultas",
+                recomendacao.layout, caminho, total_antes, total_depois, len(relatorio))
+    return ResultadoReorganizacao(recomendacao, relatorio)
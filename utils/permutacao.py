@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""Testes de permutação e qui-quadrado exato/Monte Carlo.
+
+Alternativas não paramétricas aos testes usados em aula_4 (ttest_ind,
+ttest_rel, f_oneway e chi2_contingency) para quando os testes de
+normalidade rejeitam H0, como acontece com o IMC.
+
+As permutações são geradas em lotes, como matrizes de índices embaralhados
+(uma linha por permutação), e a estatística é calculada de forma vetorizada
+sobre o lote inteiro. Depois de cada rodada o intervalo de Clopper-Pearson do
+p-valor é comparado com alfa: se ficar claramente acima ou abaixo, o teste
+para antes de atingir n_permutacoes. Com n_jobs > 1 cada rodada é dividida
+entre processos, cada um com sua própria semente.
+
+Exemplo:
+    res = teste_permutacao_duas_amostras(imc_homens, imc_mulheres, n_permutacoes=100_000)
+    print(res.estatistica, res.p_valor, res.n_permutacoes)
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import stats
+
+ResultadoPermutacao = namedtuple(
+    "ResultadoPermutacao",
+    ["estatistica", "p_valor", "n_permutacoes", "parada_antecipada"],
+)
+
+ALTERNATIVAS = ("bilateral", "maior", "menor")
+
+# Limite de elementos por matriz de índices (lote x n) para não estourar memória
+_MAX_ELEMENTOS_LOTE = 2_000_000
+
+
+# =====================================
+# ESTATÍSTICAS POR LOTE
+# =====================================
+# Cada função recebe os dados preparados, o tamanho do lote e um gerador
+# aleatório, e devolve um array com a estatística de cada permutação.
+# Com rng=None devolve a estatística observada (sem embaralhar).
+
+def _indices_permutados(n, tamanho, rng):
+    # Matriz (tamanho x n) em que cada linha é uma permutação de 0..n-1
+    idx = np.tile(np.arange(n), (tamanho, 1))
+    rng.permuted(idx, axis=1, out=idx)
+    return idx
+
+
+def _diferenca_medias(dados, tamanho, rng):
+    x, n1 = dados
+    if rng is None:
+        return np.array([x[:n1].mean() - x[n1:].mean()])
+    n2 = len(x) - n1
+    total = x.sum()
+    # Só precisamos dos n1 primeiros índices de cada permutação
+    idx = _indices_permutados(len(x), tamanho, rng)[:, :n1]
+    soma1 = x[idx].sum(axis=1)
+    return soma1 / n1 - (total - soma1) / n2
+
+
+def _media_diferencas_pareadas(dados, tamanho, rng):
+    (d,) = dados
+    if rng is None:
+        return np.array([d.mean()])
+    # Sob H0 o sinal de cada diferença é trocável
+    sinais = rng.integers(0, 2, size=(tamanho, len(d)), dtype=np.int8) * 2 - 1
+    return sinais @ d / len(d)
+
+
+def _estatistica_f(dados, tamanho, rng):
+    x, rotulos, n_grupos, tamanhos = dados
+    n = len(x)
+    if rng is None:
+        perm = rotulos[np.newaxis, :]
+    else:
+        perm = rotulos[_indices_permutados(n, tamanho, rng)]
+    linhas = perm.shape[0]
+    # Soma por grupo de cada permutação com um único bincount
+    chave = perm + n_grupos * np.arange(linhas)[:, np.newaxis]
+    somas = np.bincount(chave.ravel(), weights=np.tile(x, linhas), minlength=linhas * n_grupos)
+    somas = somas.reshape(linhas, n_grupos)
+    sq_total = ((x - x.mean()) ** 2).sum()
+    sq_entre = (somas ** 2 / tamanhos).sum(axis=1) - x.sum() ** 2 / n
+    sq_dentro = sq_total - sq_entre
+    return (sq_entre / (n_grupos - 1)) / (sq_dentro / (n - n_grupos))
+
+
+def _estatistica_qui_quadrado(dados, tamanho, rng):
+    linhas_cod, colunas_cod, n_linhas, n_colunas, esperado = dados
+    n = len(linhas_cod)
+    if rng is None:
+        perm = colunas_cod[np.newaxis, :]
+    else:
+        # Embaralhar uma das variáveis mantém as marginais fixas
+        perm = colunas_cod[_indices_permutados(n, tamanho, rng)]
+    lotes = perm.shape[0]
+    celulas = n_linhas * n_colunas
+    chave = linhas_cod * n_colunas + perm + celulas * np.arange(lotes)[:, np.newaxis]
+    observado = np.bincount(chave.ravel(), minlength=lotes * celulas).reshape(lotes, celulas)
+    return ((observado - esperado) ** 2 / esperado).sum(axis=1)
+
+
+_ESTATISTICAS = {
+    "duas_amostras": _diferenca_medias,
+    "pareado": _media_diferencas_pareadas,
+    "k_grupos": _estatistica_f,
+    "qui_quadrado": _estatistica_qui_quadrado,
+}
+
+
+# =====================================
+# MOTOR DE PERMUTAÇÃO
+# =====================================
+
+# Estado de cada processo do pool, definido uma única vez pelo inicializador
+_dados_worker = None
+
+
+def _inicializar_worker(tipo, dados):
+    global _dados_worker
+    _dados_worker = (tipo, dados)
+
+
+def _contar_extremos(estatisticas, observado, alternativa):
+    if alternativa == "bilateral":
+        return int((np.abs(estatisticas) >= abs(observado) - 1e-12).sum())
+    if alternativa == "maior":
+        return int((estatisticas >= observado - 1e-12).sum())
+    return int((estatisticas <= observado + 1e-12).sum())
+
+
+def _rodar_lote(tipo, dados, tamanho, semente, observado, alternativa):
+    rng = np.random.default_rng(semente)
+    estatisticas = _ESTATISTICAS[tipo](dados, tamanho, rng)
+    return _contar_extremos(estatisticas, observado, alternativa)
+
+
+def _rodar_lote_worker(tamanho, semente, observado, alternativa):
+    tipo, dados = _dados_worker
+    return _rodar_lote(tipo, dados, tamanho, semente, observado, alternativa)
+
+
+def _intervalo_p(extremos, total, confianca):
+    # Intervalo de Clopper-Pearson para a proporção de permutações extremas
+    cauda = (1 - confianca) / 2
+    inferior = stats.beta.ppf(cauda, extremos, total - extremos + 1) if extremos > 0 else 0.0
+    superior = stats.beta.ppf(1 - cauda, extremos + 1, total - extremos) if extremos < total else 1.0
+    return inferior, superior
+
+
+def _motor_permutacao(tipo, dados, n_obs, alternativa, n_permutacoes, alpha,
+                      parada_antecipada, confianca, tamanho_lote, n_jobs, semente):
+    if alternativa not in ALTERNATIVAS:
+        raise ValueError(f"alternativa deve ser uma de {ALTERNATIVAS}")
+
+    observado = float(_ESTATISTICAS[tipo](dados, 1, None)[0])
+
+    if tamanho_lote is None:
+        tamanho_lote = int(max(1, min(1000, _MAX_ELEMENTOS_LOTE // max(n_obs, 1))))
+    n_jobs = max(1, int(n_jobs))
+    sementes = np.random.SeedSequence(semente)
+
+    extremos = 0
+    feitas = 0
+    parou = False
+    executor = None
+    if n_jobs > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_inicializar_worker, initargs=(tipo, dados)
+        )
+    try:
+        while feitas < n_permutacoes:
+            # Uma rodada = um lote por processo
+            restantes = n_permutacoes - feitas
+            tamanhos = []
+            for _ in range(n_jobs):
+                t = min(tamanho_lote, restantes - sum(tamanhos))
+                if t <= 0:
+                    break
+                tamanhos.append(t)
+            filhas = sementes.spawn(len(tamanhos))
+
+            if executor is None:
+                extremos += sum(
+                    _rodar_lote(tipo, dados, t, s, observado, alternativa)
+                    for t, s in zip(tamanhos, filhas)
+                )
+            else:
+                extremos += sum(executor.map(
+                    _rodar_lote_worker, tamanhos, filhas,
+                    [observado] * len(tamanhos), [alternativa] * len(tamanhos),
+                ))
+            feitas += sum(tamanhos)
+
+            if parada_antecipada and feitas < n_permutacoes:
+                inferior, superior = _intervalo_p(extremos, feitas, confianca)
+                if superior < alpha or inferior > alpha:
+                    parou = True
+                    break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # Correção +1 para o p-valor nunca ser zero
+    p_valor = (extremos + 1) / (feitas + 1)
+    return ResultadoPermutacao(observado, p_valor, feitas, parou)
+
+
+def _opcoes_padrao(kwargs):
+    opcoes = dict(
+        n_permutacoes=10_000, alpha=0.05, parada_antecipada=True, confianca=0.999,
+        tamanho_lote=None, n_jobs=1, semente=None,
+    )
+    desconhecidas = set(kwargs) - set(opcoes)
+    if desconhecidas:
+        raise TypeError(f"Parâmetros desconhecidos: {sorted(desconhecidas)}")
+    opcoes.update(kwargs)
+    return opcoes
+
+
+# =====================================
+# TESTES
+# =====================================
+
+def teste_permutacao_duas_amostras(a, b, alternativa="bilateral", **kwargs):
+    """Equivalente não paramétrico de stats.ttest_ind (diferença de médias a - b).
+
+    Parâmetros comuns a todos os testes: n_permutacoes, alpha,
+    parada_antecipada, confianca (do intervalo usado na parada), tamanho_lote,
+    n_jobs e semente.
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    x = np.concatenate([a, b])
+    return _motor_permutacao("duas_amostras", (x, len(a)), len(x), alternativa, **_opcoes_padrao(kwargs))
+
+
+def teste_permutacao_pareado(a, b, alternativa="bilateral", **kwargs):
+    """Equivalente não paramétrico de stats.ttest_rel (média das diferenças a - b)."""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    if a.shape != b.shape:
+        raise ValueError("As amostras pareadas devem ter o mesmo tamanho")
+    d = a - b
+    return _motor_permutacao("pareado", (d,), len(d), alternativa, **_opcoes_padrao(kwargs))
+
+
+def teste_permutacao_k_grupos(*grupos, **kwargs):
+    """Equivalente não paramétrico de stats.f_oneway (estatística F, cauda superior)."""
+    if len(grupos) < 2:
+        raise ValueError("São necessários pelo menos 2 grupos")
+    grupos = [np.asarray(g, dtype=float) for g in grupos]
+    x = np.concatenate(grupos)
+    tamanhos = np.array([len(g) for g in grupos], dtype=float)
+    rotulos = np.repeat(np.arange(len(grupos)), tamanhos.astype(int))
+    dados = (x, rotulos, len(grupos), tamanhos)
+    return _motor_permutacao("k_grupos", dados, len(x), "maior", **_opcoes_padrao(kwargs))
+
+
+def teste_qui_quadrado_permutacao(x, y, metodo="monte_carlo", **kwargs):
+    """Teste de independência entre duas variáveis categóricas.
+
+    metodo="monte_carlo" permuta uma das variáveis mantendo as marginais da
+    tabela de contingência e a estatística é o qui-quadrado de Pearson;
+    metodo="exato" usa o teste exato de Fisher, só está disponível para
+    tabelas 2x2 e devolve como estatística a razão de chances (odds ratio)
+    de stats.fisher_exact.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if x.shape != y.shape:
+        raise ValueError("As variáveis devem ter o mesmo tamanho")
+    niveis_x, linhas_cod = np.unique(x, return_inverse=True)
+    niveis_y, colunas_cod = np.unique(y, return_inverse=True)
+
+    if metodo == "exato":
+        if len(niveis_x) != 2 or len(niveis_y) != 2:
+            raise ValueError("O método exato só está disponível para tabelas 2x2")
+        tabela = np.zeros((2, 2), dtype=int)
+        np.add.at(tabela, (linhas_cod, colunas_cod), 1)
+        razao_chances, p_valor = stats.fisher_exact(tabela)
+        return ResultadoPermutacao(float(razao_chances), float(p_valor), 0, False)
+    if metodo != "monte_carlo":
+        raise ValueError("metodo deve ser 'monte_carlo' ou 'exato'")
+
+    n = len(x)
+    marg_x = np.bincount(linhas_cod, minlength=len(niveis_x))
+    marg_y = np.bincount(colunas_cod, minlength=len(niveis_y))
+    esperado = (np.outer(marg_x, marg_y) / n).ravel()
+    dados = (linhas_cod, colunas_cod, len(niveis_x), len(niveis_y), esperado)
+    return _motor_permutacao("qui_quadrado", dados, n, "maior", **_opcoes_padrao(kwargs))
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""Provisionamento declarativo de catálogos, schemas, volumes e tabelas.
+
+Os notebooks MyCatalog/01 e 02 e o 007 criam cada objeto com um spark.sql
+(e um SHOW TABLES().show() depois de cada CREATE TABLE). Aqui o ambiente é
+descrito numa especificação
+
+    Catalogo -> Esquema -> Volume / Tabela (colunas, local, propriedades)
+
+que é comparada com o estado atual e só o que falta ou mudou é aplicado:
+
+1. inventário: uma consulta por catálogo (UNION ALL sobre o
+   information_schema no Unity Catalog). O metastore Hive/Delta local não tem
+   information_schema nem uma listagem de tabelas de todos os databases de
+   uma vez: são um SHOW DATABASES e um SHOW TABLES IN por schema da
+   especificação (spark.catalog.listTables ainda buscaria cada tabela);
+2. detalhes (DESCRIBE DETAIL e schema) só das tabelas da especificação que já
+   existem, em paralelo;
+3. plano em níveis (catálogo, schemas, volumes e tabelas, alterações), cada
+   nível executado em paralelo.
+
+Colunas novas viram ALTER TABLE ADD COLUMNS e propriedades diferentes viram
+SET TBLPROPERTIES. Mudança de LOCATION ou de tipo de coluna não é aplicada:
+fica em `conflitos`, e provisionar levanta ValueError antes de executar
+qualquer ação (ignorar_conflitos=True aplica o resto e só registra
+os conflitos no log). Rodar de novo sem mudanças na especificação não
+executa nada.
+
+Exemplo:
+    res = provisionar(spark, espec_data_catalog("_d"))
+    print(res.acoes, res.conflitos)
+    provisionar(spark, ESPEC_LHDW_VENDAS)          # metastore local (007)
+"""
+
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+Catalogo = namedtuple("Catalogo", ["nome", "esquemas", "comentario"], defaults=[(), None])
+Esquema = namedtuple("Esquema", ["nome", "volumes", "tabelas", "comentario"], defaults=[(), (), None])
+Volume = namedtuple("Volume", ["nome", "comentario"], defaults=[None])
+Tabela = namedtuple(
+    "Tabela",
+    ["nome", "colunas", "local", "propriedades", "particao", "comentario"],
+    defaults=[(), None, {}, (), None],
+)
+# colunas: [(nome, tipo)] ou [(nome, tipo, comentario)]
+
+Acao = namedtuple("Acao", ["nivel", "objeto", "sql"])
+ResultadoProvisionamento = namedtuple("ResultadoProvisionamento", ["acoes", "conflitos", "tempo"])
+
+PROPRIEDADES_CDF = {"delta.enableChangeDataFeed": "true"}
+PROPRIEDADES_AUTO_OPTIMIZE = {
+    "delta.autoOptimize.optimizeWrite": "true",
+    "delta.autoOptimize.autoCompact": "true",
+}
+
+_CATALOGO_HIVE = (None, "spark_catalog", "hive_metastore")
+_SINONIMOS_TIPO = {"integer": "int", "long": "bigint", "short": "smallint", "byte": "tinyint"}
+
+# Níveis do plano: cada um só começa depois que o anterior terminou
+_NIVEL_CATALOGO, _NIVEL_ESQUEMA, _NIVEL_OBJETO, _NIVEL_ALTERACAO = range(4)
+
+
+def _hive(catalogo):
+    return catalogo.nome in _CATALOGO_HIVE
+
+
+def _nome(catalogo, *partes):
+    return ".".join(([] if _hive(catalogo) else [catalogo.nome]) + list(partes))
+
+
+def _texto(valor):
+    return "'" + str(valor).replace("'", "\\'") + "'"
+
+
+def _normalizar_tipo(tipo):
+    tipo = tipo.lower().replace(" ", "")
+    return _SINONIMOS_TIPO.get(tipo, tipo)
+
+
+def _normalizar_local(local):
+    local = local.rstrip("/")
+    for prefixo in ("dbfs:", "file:"):
+        if local.startswith(prefixo):
+            return local[len(prefixo):]
+    return local
+
+
+def _coluna_ddl(coluna):
+    nome, tipo, *comentario = coluna
+    return f"{nome} {tipo}" + (f" COMMENT {_texto(comentario[0])}" if comentario and comentario[0] else "")
+
+
+def _propriedades_ddl(propriedades):
+    return ", ".join(f"{_texto(k)} = {_texto(v)}" for k, v in propriedades.items())
+
+
+# =====================================
+# SQL DE CRIAÇÃO
+# =====================================
+
+def _sql_catalogo(catalogo):
+    sql = f"CREATE CATALOG IF NOT EXISTS {catalogo.nome}"
+    return sql + (f" COMMENT {_texto(catalogo.comentario)}" if catalogo.comentario else "")
+
+
+def _sql_esquema(catalogo, esquema):
+    sql = f"CREATE SCHEMA IF NOT EXISTS {_nome(catalogo, esquema.nome)}"
+    return sql + (f" COMMENT {_texto(esquema.comentario)}" if esquema.comentario else "")
+
+
+def _sql_volume(catalogo, esquema, volume):
+    sql = f"CREATE VOLUME IF NOT EXISTS {_nome(catalogo, esquema.nome, volume.nome)}"
+    return sql + (f" COMMENT {_texto(volume.comentario)}" if volume.comentario else "")
+
+
+def _sql_tabela(catalogo, esquema, tabela):
+    partes = [f"CREATE TABLE IF NOT EXISTS {_nome(catalogo, esquema.nome, tabela.nome)}"]
+    if tabela.colunas:
+        partes.append("(\n    " + ",\n    ".join(_coluna_ddl(c) for c in tabela.colunas) + "\n)")
+    partes.append("USING DELTA")
+    if tabela.particao:
+        partes.append(f"PARTITIONED BY ({', '.join(tabela.particao)})")
+    if tabela.local:
+        partes.append(f"LOCATION {_texto(tabela.local)}")
+    if tabela.comentario:
+        partes.append(f"COMMENT {_texto(tabela.comentario)}")
+    if tabela.propriedades:
+        partes.append(f"TBLPROPERTIES ({_propriedades_ddl(tabela.propriedades)})")
+    return "\n".join(partes)
+
+
+# =====================================
+# ESTADO ATUAL
+# =====================================
+
+def _inventario(spark, catalogo):
+    """(existe catálogo, {esquemas}, {(esquema, volume)}, {(esquema, tabela)})."""
+    esquemas_espec = [e.nome for e in catalogo.esquemas]
+    if _hive(catalogo):
+        # Metastore local: sem information_schema nem volumes. SHOW TABLES só
+        # lista nomes (listTables faz um getTable por tabela)
+        existentes = {r[0] for r in spark.sql("SHOW DATABASES").collect()}
+        tabelas = {
+            (db, r.tableName)
+            for db in esquemas_espec if db in existentes
+            for r in spark.sql(f"SHOW TABLES IN `{db}`").collect()
+            if not r.isTemporary
+        }
+        return True, existentes, set(), tabelas
+
+    if not spark.sql(f"SHOW CATALOGS LIKE '{catalogo.nome}'").collect():
+        return False, set(), set(), set()
+    linhas = spark.sql(f"""
+        SELECT 'esquema' AS tipo, schema_name AS esquema, NULL AS objeto
+        FROM {catalogo.nome}.information_schema.schemata
+        UNION ALL
+        SELECT 'volume', volume_schema, volume_name
+        FROM {catalogo.nome}.information_schema.volumes
+        UNION ALL
+        SELECT 'tabela', table_schema, table_name
+        FROM {catalogo.nome}.information_schema.tables
+    """).collect()
+    esquemas = {r.esquema for r in linhas if r.tipo == "esquema"}
+    volumes = {(r.esquema, r.objeto) for r in linhas if r.tipo == "volume"}
+    tabelas = {(r.esquema, r.objeto) for r in linhas if r.tipo == "tabela"}
+    return True, esquemas, volumes, tabelas
+
+
+def _detalhe_tabela(spark, nome):
+    detalhe = spark.sql(f"DESCRIBE DETAIL {nome}").collect()[0]
+    colunas = {f.name: f.dataType.simpleString() for f in spark.table(nome).schema.fields}
+    return detalhe.location, dict(detalhe.properties or {}), colunas
+
+
+# =====================================
+# PLANO E EXECUÇÃO
+# =====================================
+
+def _diferencas_tabela(catalogo, esquema, tabela, detalhe):
+    nome = _nome(catalogo, esquema.nome, tabela.nome)
+    local, propriedades, colunas = detalhe
+    acoes, conflitos = [], []
+
+    if tabela.local and _normalizar_local(tabela.local) != _normalizar_local(local):
+        conflitos.append(f"{nome}: LOCATION atual {local}, especificado {tabela.local}")
+
+    novas = []
+    for coluna in tabela.colunas:
+        nome_coluna, tipo = coluna[0], coluna[1]
+        if nome_coluna not in colunas:
+            novas.append(coluna)
+        elif _normalizar_tipo(tipo) != _normalizar_tipo(colunas[nome_coluna]):
+            conflitos.append(f"{nome}.{nome_coluna}: tipo atual {colunas[nome_coluna]}, especificado {tipo}")
+    if novas:
+        acoes.append(Acao(_NIVEL_ALTERACAO, nome,
+                          f"ALTER TABLE {nome} ADD COLUMNS ({', '.join(_coluna_ddl(c) for c in novas)})"))
+
+    diferentes = {
+        k: v for k, v in tabela.propriedades.items()
+        if str(propriedades.get(k, "")).lower() != str(v).lower()
+    }
+    if diferentes:
+        acoes.append(Acao(_NIVEL_ALTERACAO, nome,
+                          f"ALTER TABLE {nome} SET TBLPROPERTIES ({_propriedades_ddl(diferentes)})"))
+    return acoes, conflitos
+
+
+def planejar(spark, catalogo, max_paralelo=8):
+    """Ações necessárias para levar o catálogo ao estado da especificação: (acoes, conflitos)."""
+    existe, esquemas, volumes, tabelas = _inventario(spark, catalogo)
+    acoes, conflitos = [], []
+
+    if not existe:
+        acoes.append(Acao(_NIVEL_CATALOGO, catalogo.nome, _sql_catalogo(catalogo)))
+
+    existentes = []
+    for esquema in catalogo.esquemas:
+        if esquema.nome not in esquemas:
+            acoes.append(Acao(_NIVEL_ESQUEMA, _nome(catalogo, esquema.nome), _sql_esquema(catalogo, esquema)))
+        for volume in esquema.volumes:
+            if _hive(catalogo):
+                conflitos.append(f"{esquema.nome}.{volume.nome}: volumes não existem no metastore Hive")
+            elif (esquema.nome, volume.nome) not in volumes:
+                acoes.append(Acao(_NIVEL_OBJETO, _nome(catalogo, esquema.nome, volume.nome),
+                                  _sql_volume(catalogo, esquema, volume)))
+        for tabela in esquema.tabelas:
+            if (esquema.nome, tabela.nome) in tabelas:
+                existentes.append((esquema, tabela))
+            else:
+                acoes.append(Acao(_NIVEL_OBJETO, _nome(catalogo, esquema.nome, tabela.nome),
+                                  _sql_tabela(catalogo, esquema, tabela)))
+
+    # Detalhes só das tabelas que já existem, em paralelo
+    if existentes:
+        with ThreadPoolExecutor(max_workers=max_paralelo) as executor:
+            detalhes = list(executor.map(
+                lambda par: _detalhe_tabela(spark, _nome(catalogo, par[0].nome, par[1].nome)), existentes
+            ))
+        for (esquema, tabela), detalhe in zip(existentes, detalhes):
+            novas, novos_conflitos = _diferencas_tabela(catalogo, esquema, tabela, detalhe)
+            acoes += novas
+            conflitos += novos_conflitos
+
+    return acoes, conflitos
+
+
+def _executar(spark, acao):
+    inicio = time.perf_counter()
+    spark.sql(acao.sql)
+    logger.info("%s aplicado em %.2fs", acao.objeto, time.perf_counter() - inicio)
+
+
+def provisionar(spark, espec, max_paralelo=8, executar=True, ignorar_conflitos=False):
+    """Compara a especificação com o catálogo e aplica só o que falta ou mudou.
+
+    Com executar=False devolve o plano (e os conflitos) sem aplicar nada.
+    Havendo conflitos, levanta ValueError sem executar nenhuma ação, a menos
+    que ignorar_conflitos=True.
+    """
+    inicio = time.perf_counter()
+    acoes, conflitos = planejar(spark, espec, max_paralelo)
+    if executar and conflitos and not ignorar_conflitos:
+        raise ValueError("Conflitos no provisionamento (LOCATION ou tipo de coluna):\n" + "\n".join(conflitos))
+    for conflito in conflitos:
+        logger.warning("Conflito não aplicado: %s", conflito)
+
+    if executar and acoes:
+        with ThreadPoolExecutor(max_workers=max_paralelo) as executor:
+            for nivel in sorted({a.nivel for a in acoes}):
+                do_nivel = [a for a in acoes if a.nivel == nivel]
+                # list() propaga a primeira exceção antes de passar ao próximo nível
+                list(executor.map(lambda a: _executar(spark, a), do_nivel))
+
+    tempo = time.perf_counter() - inicio
+    logger.info("Provisionamento de %s: %d ações, %d conflitos em %.1fs",
+                espec.nome or "spark_catalog", len(acoes), len(conflitos), tempo)
+    return ResultadoProvisionamento(acoes, conflitos, tempo)
+
+
+# =====================================
+# ESPECIFICAÇÕES DO PROJETO
+# =====================================
+
+COLUNAS_BRONZE_CLIENTES = [
+    ("id", "BIGINT"),
+    ("cnpj", "STRING"),
+    ("razao_social", "STRING"),
+    ("fantasia", "STRING"),
+    ("cidade", "STRING"),
+    ("endereco", "STRING"),
+    ("numero", "STRING"),
+    ("estado", "STRING"),
+    ("vendedor", "STRING"),
+    ("data_carga", "TIMESTAMP"),
+]
+
+COLUNAS_SILVER_CUSTOMERS = [
+    ("customer_id", "STRING", "Identificador único do cliente"),
+    ("document_number", "STRING", "Número do documento formatado (CNPJ)"),
+    ("company_name", "STRING", "Razão social da empresa"),
+    ("nick_name", "STRING", "Nome fantasia da empresa"),
+    ("sales_person", "STRING", "Nome do vendedor responsável"),
+    ("address", "STRING", "Endereço do cliente"),
+    ("address_number", "STRING", "Número do endereço"),
+    ("city_name", "STRING", "Nome da cidade"),
+    ("state", "STRING", "Estado"),
+    ("insert_date", "TIMESTAMP", "Data de inserção do registro"),
+    ("update_date", "TIMESTAMP", "Data de última atualização do registro"),
+]
+
+
+def espec_data_catalog(sufixo):
+    """Catálogo data_catalog_01{sufixo} (MyCatalog 01/02): sufixo "_p" ou "_d"."""
+    return Catalogo(f"data_catalog_01{sufixo}", [
+        Esquema("bronze",
+                volumes=[Volume("vol_data")],
+                tabelas=[Tabela("clientes", COLUNAS_BRONZE_CLIENTES)]),
+        Esquema("silver",
+                tabelas=[Tabela("customers", COLUNAS_SILVER_CUSTOMERS,
+                                propriedades={**PROPRIEDADES_CDF, **PROPRIEDADES_AUTO_OPTIMIZE})]),
+        Esquema("gold"),
+    ])
+
+
+GOLD_VENDAS_DELTA = "dbfs:/mnt/lhdw/gold/vendas_delta"
+
+# Tabelas da Gold registradas no metastore local (007); o schema vem do _delta_log
+ESPEC_LHDW_VENDAS = Catalogo(None, [
+    Esquema("lhdw_vendas", tabelas=[
+        Tabela(nome, local=f"{GOLD_VENDAS_DELTA}/{nome}")
+        for nome in ["dim_produto", "dim_categoria", "dim_segmento", "dim_fabricante", "dim_geografia", "dim_cliente"]
+    ] + [
+        Tabela("fato_vendas", local=f"{GOLD_VENDAS_DELTA}/fato_vendas", propriedades=PROPRIEDADES_AUTO_OPTIMIZE),
+    ]),
+])
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""Regras de qualidade de dados e integridade referencial para DataFrames Spark.
+
+Cada tabela recebe uma lista de regras (nao_nulo, unico, fk_existe, regex,
+intervalo) que são compiladas em:
+    - uma coluna booleana de violação por regra
+    - unico: groupBy(chaves).count() só das chaves repetidas, juntado de
+      volta à tabela como marcador
+    - fk_existe: left_anti das chaves distintas da tabela contra as da
+      referência (broadcast por padrão, já que as dimensões são pequenas); só
+      as chaves faltantes são juntadas de volta como marcador
+    - um único agg() com o total de linhas e o total de violações por regra
+
+Os conjuntos juntados de volta (chaves repetidas, chaves faltantes) costumam
+ser pequenos, e o AQE troca esses joins por broadcast depois de calculá-los.
+
+Só quando há violações as linhas com problema são gravadas na quarentena
+(Delta, em <caminho_quarentena>/<tabela>), com a lista de regras violadas.
+A tabela de entrada é persistida uma vez e as agregações, a contagem e a
+quarentena leem dessa cópia, então a validação custa uma leitura da fonte
+mesmo quando há violações.
+
+Exemplo:
+    regras = [
+        nao_nulo("customer_id"),
+        unico("customer_id"),
+        regex("document_number", REGEX_CNPJ_DIGITOS, nome="cnpj_valido"),
+    ]
+    res = validar(df_silver_clientes, regras, "silver.customers",
+                  caminho_quarentena="/mnt/lhdw/quarentena")
+    display(metricas(spark, [res]))
+"""
+
+from collections import namedtuple
+from datetime import datetime
+
+from pyspark import StorageLevel
+from pyspark.sql import functions as F
+
+Regra = namedtuple("Regra", ["nome", "tipo", "colunas", "parametros"])
+ResultadoQualidade = namedtuple(
+    "ResultadoQualidade", ["tabela", "total_linhas", "violacoes", "data_execucao"]
+)
+
+# tratar_cnpj devolve "XX.XXX.XXX/XXXX-XX" (ou "" quando o documento é inválido);
+# a silver.customers guarda só os 14 dígitos
+REGEX_CNPJ_FORMATADO = r"^\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}$"
+REGEX_CNPJ_DIGITOS = r"^\d{14}$"
+REGEX_EMAIL = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+_PREFIXO = "_dq_"
+
+
+# =====================================
+# REGRAS
+# =====================================
+
+def nao_nulo(*colunas, nome=None):
+    return Regra(nome or f"nao_nulo_{'_'.join(colunas)}", "nao_nulo", list(colunas), {})
+
+
+def unico(*colunas, nome=None):
+    return Regra(nome or f"unico_{'_'.join(colunas)}", "unico", list(colunas), {})
+
+
+def fk_existe(colunas, referencia, colunas_ref=None, nome=None, broadcast=True):
+    """As colunas (não nulas) devem existir em `referencia` (DataFrame)."""
+    colunas = [colunas] if isinstance(colunas, str) else list(colunas)
+    colunas_ref = colunas if colunas_ref is None else (
+        [colunas_ref] if isinstance(colunas_ref, str) else list(colunas_ref)
+    )
+    if len(colunas) != len(colunas_ref):
+        raise ValueError("colunas e colunas_ref devem ter o mesmo tamanho")
+    return Regra(
+        nome or f"fk_{'_'.join(colunas)}", "fk_existe", colunas,
+        {"referencia": referencia, "colunas_ref": colunas_ref, "broadcast": broadcast},
+    )
+
+
+def regex(coluna, padrao, nome=None):
+    """Valores não nulos devem casar com o padrão (string vazia viola)."""
+    return Regra(nome or f"regex_{coluna}", "regex", [coluna], {"padrao": padrao})
+
+
+def intervalo(coluna, minimo=None, maximo=None, nome=None):
+    return Regra(nome or f"intervalo_{coluna}", "intervalo", [coluna], {"minimo": minimo, "maximo": maximo})
+
+
+# =====================================
+# COMPILAÇÃO
+# =====================================
+
+def _flag(regra):
+    return _PREFIXO + regra.nome
+
+
+def _anotar(df, regras):
+    # Acrescenta uma coluna booleana de violação por regra; as agregações
+    # de unico e fk_existe leem a tabela de entrada, não a já anotada
+    nomes = [r.nome for r in regras]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError("Os nomes das regras devem ser únicos")
+
+    base = df
+    for i, regra in enumerate(regras):
+        cols = [F.col(c) for c in regra.colunas]
+        if regra.tipo == "nao_nulo":
+            cond = F.lit(False)
+            for c in cols:
+                cond = cond | c.isNull()
+        elif regra.tipo == "regex":
+            c = cols[0]
+            cond = c.isNotNull() & ~c.cast("string").rlike(regra.parametros["padrao"])
+        elif regra.tipo == "intervalo":
+            c = cols[0]
+            cond = F.lit(False)
+            if regra.parametros["minimo"] is not None:
+                cond = cond | (c < F.lit(regra.parametros["minimo"]))
+            if regra.parametros["maximo"] is not None:
+                cond = cond | (c > F.lit(regra.parametros["maximo"]))
+            cond = c.isNotNull() & cond
+        elif regra.tipo == "unico":
+            df, cond = _juntar_repetidas(df, base, regra, i)
+        elif regra.tipo == "fk_existe":
+            df, cond = _juntar_referencia(df, base, regra, i)
+        else:
+            raise ValueError(f"Tipo de regra desconhecido: {regra.tipo}")
+        df = df.withColumn(_flag(regra), F.coalesce(cond, F.lit(False)))
+    return df
+
+
+def _juntar_marcador(df, chaves, regra, apelidos, marcador):
+    # Left join de um conjunto de chaves (sem repetição) marcado com True
+    condicao = [F.col(c).eqNullSafe(F.col(a)) for c, a in zip(regra.colunas, apelidos)]
+    df = df.join(chaves.withColumn(marcador, F.lit(True)), condicao, "left").drop(*apelidos)
+    return df, F.col(marcador).isNotNull()
+
+
+def _juntar_repetidas(df, base, regra, i):
+    # Chaves com mais de uma linha (nulos contam como um mesmo valor)
+    marcador = f"{_PREFIXO}rep_{i}"
+    apelidos = [f"{_PREFIXO}rep_{i}_{c}" for c in regra.colunas]
+    repetidas = base.groupBy(*[F.col(c).alias(a) for c, a in zip(regra.colunas, apelidos)]) \
+        .count() \
+        .filter(F.col("count") > 1) \
+        .drop("count")
+    return _juntar_marcador(df, repetidas, regra, apelidos, marcador)
+
+
+def _juntar_referencia(df, base, regra, i):
+    # Chaves preenchidas da tabela que não existem na referência (left_anti)
+    marcador = f"{_PREFIXO}ref_{i}"
+    apelidos = [f"{_PREFIXO}ref_{i}_{c}" for c in regra.colunas]
+    referencia = regra.parametros["referencia"] \
+        .select(*[F.col(c).alias(a) for c, a in zip(regra.parametros["colunas_ref"], apelidos)]) \
+        .distinct()
+    if regra.parametros["broadcast"]:
+        referencia = F.broadcast(referencia)
+    faltantes = base.select(*[F.col(c).alias(a) for c, a in zip(regra.colunas, apelidos)]) \
+        .dropna() \
+        .distinct() \
+        .join(referencia, apelidos, "left_anti")
+    return _juntar_marcador(df, faltantes, regra, apelidos, marcador)
+
+
+# =====================================
+# EXECUÇÃO
+# =====================================
+
+def validar(df, regras, tabela, caminho_quarentena=None):
+    """Aplica as regras à tabela e grava as linhas violadas na quarentena.
+
+    Retorna ResultadoQualidade com o total de linhas e um dicionário
+    {regra: linhas violadas}.
+    """
+    data_execucao = datetime.now()
+    flags = [_flag(r) for r in regras]
+    # unico e fk_existe releem a entrada para agregar as chaves, e a
+    # quarentena a lê de novo; com ela em cache a fonte é lida uma vez só
+    persistido = df.persist(StorageLevel.MEMORY_AND_DISK)
+    anotado = _anotar(persistido, regras)
+    try:
+        linha = anotado.agg(
+            F.count(F.lit(1)).alias("total"),
+            *[F.sum(F.col(f).cast("long")).alias(f) for f in flags],
+        ).collect()[0]
+        violacoes = {r.nome: int(linha[_flag(r)] or 0) for r in regras}
+        if caminho_quarentena and any(violacoes.values()):
+            _gravar_quarentena(anotado, regras, tabela, caminho_quarentena, data_execucao)
+    finally:
+        persistido.unpersist()
+
+    return ResultadoQualidade(tabela, int(linha["total"]), violacoes, data_execucao)
+
+
+def _gravar_quarentena(anotado, regras, tabela, caminho_quarentena, data_execucao):
+    # Linhas com alguma violação, com a lista de regras violadas
+    regras_violadas = F.filter(
+        F.array(*[F.when(F.col(_flag(r)), F.lit(r.nome)) for r in regras]),
+        lambda x: x.isNotNull(),
+    )
+    qualquer = F.lit(False)
+    for r in regras:
+        qualquer = qualquer | F.col(_flag(r))
+    colunas_internas = [c for c in anotado.columns if c.startswith(_PREFIXO)]
+    anotado.filter(qualquer) \
+        .withColumn("dq_regras", regras_violadas) \
+        .drop(*colunas_internas) \
+        .withColumn("dq_tabela", F.lit(tabela)) \
+        .withColumn("dq_data_execucao", F.lit(data_execucao)) \
+        .write.format("delta").mode("append").option("mergeSchema", "true") \
+        .save(f"{caminho_quarentena}/{tabela}")
+
+
+def metricas(spark, resultados):
+    """Resume uma lista de ResultadoQualidade em um DataFrame (uma linha por regra)."""
+    linhas = [
+        (r.tabela, regra, r.total_linhas, n, (n / r.total_linhas) if r.total_linhas else 0.0, r.data_execucao)
+        for r in resultados
+        for regra, n in r.violacoes.items()
+    ]
+    return spark.createDataFrame(
+        linhas,
+        "tabela string, regra string, total_linhas long, violacoes long, taxa_violacao double, data_execucao timestamp",
+    )
+
+
+# =====================================
+# REGRAS PRONTAS
+# =====================================
+
+def regras_fato_vendas(spark, gold_path):
+    """SKs da fato_vendas devem existir nas dimensões gravadas em gold_path."""
+    def dim(nome):
+        return spark.read.format("delta").load(f"{gold_path}/{nome}")
+
+    regras = [nao_nulo("DataVenda")]
+    for sk, dimensao in [
+        ("sk_produto", "dim_produto"),
+        ("sk_categoria", "dim_categoria"),
+        ("sk_segmento", "dim_segmento"),
+        ("sk_fabricante", "dim_fabricante"),
+        ("sk_cliente", "dim_cliente"),
+    ]:
+        regras.append(nao_nulo(sk))
+        regras.append(fk_existe(sk, dim(dimensao)))
+    regras.append(intervalo("Unidades", minimo=0))
+    return regras
+
+
+def regras_pagamentos(tabelas):
+    """Regras do modelo fake de pagamentos, a partir de {nome: DataFrame Spark}."""
+    return {
+        "estabelecimentos": [
+            unico("estab_id"),
+            regex("num_cnpj", REGEX_CNPJ_FORMATADO, nome="cnpj_valido"),
+        ],
+        "estabelecimento_pos": [
+            unico("estab_pos_id"),
+            fk_existe("estab_id", tabelas["estabelecimentos"]),
+            fk_existe("pos_id", tabelas["ponto_venda"]),
+            intervalo("taxa_mdr", 0, 100),
+            intervalo("taxa_rav", 0, 100),
+        ],
+        "transacoes": [
+            unico("transacao_id"),
+            nao_nulo("estab_pos_id"),
+            fk_existe("estab_pos_id", tabelas["estabelecimento_pos"]),
+            intervalo("valor_transacao", minimo=0),
+        ],
+        "transacoes_parcelas": [
+            unico("transacao_parc_id"),
+            fk_existe("transacao_id", tabelas["transacoes"]),
+        ],
+        "antecipacoes": [
+            fk_existe("transacao_parc_id", tabelas["transacoes_parcelas"]),
+        ],
+        "recebimento_transacoes": [
+            fk_existe("recebimento_id", tabelas["recebimentos"]),
+            fk_existe("transacao_parc_id", tabelas["transacoes_parcelas"]),
+        ],
+    }
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""Cache local de snapshots de tabelas Delta pequenas, indexado por versão.
+
+Os notebooks 006 e 008 releem as dimensões da Gold (DeltaTable.forPath(...)
+.toDF().show(), leituras com versionAsOf) em várias sessões, e cada leitura
+refaz o replay do _delta_log e a leitura dos parquets. Aqui cada snapshot
+(caminho da tabela + versão) é gravado uma vez como Parquet no disco local e
+servido dali como pandas, Arrow ou DataFrame Spark (opcionalmente broadcast).
+
+Para saber se a cópia local está atualizada basta listar o _delta_log e pegar
+o maior <versão>.json, sem abrir nenhum arquivo da tabela. Snapshots antigos
+(versionAsOf) ficam no mesmo cache, que é limitado em bytes e descarta os
+menos usados recentemente (LRU).
+
+O Parquet local guarda os tipos do schema Delta (chaves inteiras anuláveis
+continuam inteiras, tabelas vazias mantêm as colunas) e o próprio schema
+Spark nos metadados do arquivo; ler_spark recria o DataFrame com ele, então
+joins contra a cópia local usam os mesmos tipos da tabela.
+
+O diretório pode ser compartilhado por vários processos (sessões, jobs no
+mesmo driver): cada snapshot é gravado num temporário próprio (mkstemp) e
+renomeado, e a leitura-alteração-gravação do índice fica sob uma trava de
+arquivo (fcntl.flock, onde existir) além da trava entre threads.
+
+Exemplo:
+    snapshots = SnapshotCache(spark)
+    dim_produto = snapshots.ler_pandas(f"{delta_path}/dim_produto")
+    dim_fab_v5 = snapshots.ler_spark(f"{delta_path}/dim_fabricante", versao=5)
+    categoria = snapshots.ler_spark(f"{delta_path}/dim_categoria", broadcast=True)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: só a trava entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_ARQUIVO_LOG = re.compile(r"^(\d{20})\.json$")
+_LIMITE_PADRAO = 2 * 1024 ** 3
+# Chave dos metadados do Parquet com o schema Spark (JSON) do snapshot
+_META_SCHEMA = b"schema_spark"
+
+
+def versao_delta(spark, caminho):
+    """Versão mais recente da tabela Delta, listando só o _delta_log."""
+    jvm = spark._jvm
+    log = jvm.org.apache.hadoop.fs.Path(caminho.rstrip("/") + "/_delta_log")
+    fs = log.getFileSystem(spark._jsc.hadoopConfiguration())
+    versoes = [
+        int(m.group(1))
+        for status in fs.listStatus(log)
+        for m in [_ARQUIVO_LOG.match(status.getPath().getName())]
+        if m
+    ]
+    if not versoes:
+        raise FileNotFoundError(f"Nenhum commit encontrado em {caminho}/_delta_log")
+    return max(versoes)
+
+
+def _tabela_arrow(df):
+    """pyarrow.Table com os tipos do schema Spark de `df` e o schema nos metadados."""
+    import pyarrow as pa
+    from pyspark.sql.pandas.types import to_arrow_schema
+    from pyspark.sql.types import TimestampType
+
+    schema = to_arrow_schema(df.schema)
+    # toPandas devolve timestamps sem fuso (hora local da sessão); guarda assim
+    for i, campo in enumerate(df.schema.fields):
+        if isinstance(campo.dataType, TimestampType):
+            schema = schema.set(i, schema.field(i).with_type(pa.timestamp("us")))
+    schema = schema.with_metadata({_META_SCHEMA: df.schema.json().encode("utf-8")})
+    pdf = df.toPandas()
+    if pdf.empty:
+        return schema.empty_table()
+    return pa.Table.from_pandas(pdf, schema=schema, preserve_index=False)
+
+
+def _schema_spark(tabela):
+    from pyspark.sql.pandas.types import from_arrow_schema
+    from pyspark.sql.types import StructType
+
+    metadados = tabela.schema.metadata or {}
+    if _META_SCHEMA in metadados:
+        return StructType.fromJson(json.loads(metadados[_META_SCHEMA]))
+    # Snapshots gravados antes do schema nos metadados
+    return from_arrow_schema(tabela.schema)
+
+
+class SnapshotCache:
+    """Snapshots Parquet locais de tabelas Delta, com descarte LRU por tamanho."""
+
+    def __init__(self, spark, diretorio=None, limite_bytes=_LIMITE_PADRAO):
+        self.spark = spark
+        self.diretorio = diretorio or os.path.join(tempfile.gettempdir(), "snapshots_delta")
+        self.limite_bytes = limite_bytes
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._indice_path = os.path.join(self.diretorio, "indice.json")
+        self._trava_path = os.path.join(self.diretorio, "indice.lock")
+        self._trava = threading.Lock()
+
+    # ---------- índice ----------
+
+    @contextmanager
+    def _travado(self):
+        """Exclusão mútua no índice entre threads e entre processos."""
+        with self._trava, open(self._trava_path, "a") as trava:
+            if fcntl is not None:
+                fcntl.flock(trava.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(trava.fileno(), fcntl.LOCK_UN)
+
+    def _ler_indice(self):
+        try:
+            with open(self._indice_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _gravar_indice(self, indice):
+        # Grava em arquivo temporário e troca, para não deixar o índice pela metade
+        fd, tmp = tempfile.mkstemp(dir=self.diretorio, suffix=".json.tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(indice, f)
+            os.replace(tmp, self._indice_path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _registrar(self, chave, caminho, versao):
+        with self._travado():
+            indice = self._ler_indice()
+            indice[chave] = {
+                "caminho": caminho,
+                "versao": versao,
+                "bytes": os.path.getsize(self._arquivo(chave)),
+                "ultimo_acesso": time.time(),
+            }
+            self._descartar_excedente(indice, manter=chave)
+            self._gravar_indice(indice)
+
+    @staticmethod
+    def _chave(caminho, versao):
+        return f"{hashlib.sha1(caminho.rstrip('/').encode('utf-8')).hexdigest()[:16]}_v{versao}"
+
+    def _arquivo(self, chave):
+        return os.path.join(self.diretorio, chave + ".parquet")
+
+    def _descartar_excedente(self, indice, manter):
+        total = sum(e["bytes"] for e in indice.values())
+        for chave, entrada in sorted(indice.items(), key=lambda kv: kv[1]["ultimo_acesso"]):
+            if total <= self.limite_bytes:
+                break
+            if chave == manter:
+                continue
+            try:
+                os.remove(self._arquivo(chave))
+            except FileNotFoundError:
+                pass
+            total -= entrada["bytes"]
+            del indice[chave]
+            logger.info("Snapshot %s v%s descartado (LRU)", entrada["caminho"], entrada["versao"])
+
+    # ---------- leitura ----------
+
+    def versao_atual(self, caminho):
+        return versao_delta(self.spark, caminho)
+
+    def ler_arrow(self, caminho, versao=None):
+        """pyarrow.Table do snapshot; versao=None usa a versão mais recente."""
+        import pyarrow.parquet as pq
+
+        if versao is None:
+            versao = self.versao_atual(caminho)
+        chave = self._chave(caminho, versao)
+        arquivo = self._arquivo(chave)
+
+        with self._travado():
+            indice = self._ler_indice()
+            if chave in indice and os.path.exists(arquivo):
+                indice[chave]["ultimo_acesso"] = time.time()
+                self._gravar_indice(indice)
+                logger.debug("Snapshot %s v%s servido do cache local", caminho, versao)
+                return pq.read_table(arquivo)
+
+        # Cache ausente: lê do Delta exatamente a versão sondada
+        tabela = _tabela_arrow(self.spark.read.format("delta").option("versionAsOf", versao).load(caminho))
+        # Temporário exclusivo: outro processo pode estar gravando a mesma chave
+        fd, tmp = tempfile.mkstemp(dir=self.diretorio, prefix=chave + "_", suffix=".parquet.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pq.write_table(tabela, f)
+            os.replace(tmp, arquivo)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        self._registrar(chave, caminho, versao)
+        logger.info("Snapshot %s v%s gravado em %s", caminho, versao, arquivo)
+        return tabela
+
+    def ler_pandas(self, caminho, versao=None):
+        return self.ler_arrow(caminho, versao).to_pandas()
+
+    def ler_spark(self, caminho, versao=None, broadcast=False):
+        """DataFrame Spark criado a partir da cópia local (sem replay do _delta_log).
+
+        Usa o schema da tabela Delta guardado com o snapshot. A conversão usa
+        Arrow se a sessão tiver spark.sql.execution.arrow.pyspark.enabled.
+        """
+        tabela = self.ler_arrow(caminho, versao)
+        # Nulos como None (e não NaN/NaT), para inteiros e textos anuláveis
+        pdf = tabela.to_pandas(integer_object_nulls=True, date_as_object=True, timestamp_as_object=True)
+        pdf = pdf.astype(object).where(pdf.notna(), None)
+        df = self.spark.createDataFrame(pdf, schema=_schema_spark(tabela))
+        if broadcast:
+            from pyspark.sql.functions import broadcast as _broadcast
+
+            df = _broadcast(df)
+        return df
+
+    # ---------- manutenção ----------
+
+    def entradas(self):
+        """Snapshots em cache: lista de dicionários (caminho, versao, bytes, ultimo_acesso)."""
+        return list(self._ler_indice().values())
+
+    def invalidar(self, caminho=None):
+        """Remove os snapshots de uma tabela (ou todos, com caminho=None)."""
+        with self._travado():
+            indice = self._ler_indice()
+            for chave, entrada in list(indice.items()):
+                if caminho is None or entrada["caminho"].rstrip("/") == caminho.rstrip("/"):
+                    try:
+                        os.remove(self._arquivo(chave))
+                    except FileNotFoundError:
+                        pass
+                    del indice[chave]
+            self._gravar_indice(indice)
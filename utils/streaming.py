@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""Modo Structured Streaming do pipeline de vendas (landing -> bronze -> silver -> gold).
+
+Mesmas transformações dos notebooks 002, 003 e 005, mas incrementais:
+    - bronze: leitura em streaming dos CSVs de landingzone/vendas/processar,
+      gravação em Delta particionada por Ano/Mes; os arquivos lidos são
+      movidos para landingzone/vendas/processado (cleanSource=archive), como
+      o dbutils.fs.mv do 002
+    - silver: leitura em streaming da bronze Delta com as transformações do 003
+    - gold: foreachBatch que faz MERGE das dimensões (chaves novas ganham SK,
+      chaves existentes com atributos alterados são atualizadas)
+      e append da fato_vendas com txnAppId/txnVersion = batch_id, o que torna
+      a gravação idempotente se o micro-lote for reprocessado
+
+A gold do streaming fica em gold/vendas_stream, separada das tabelas do 004
+(gold/vendas_delta), que não têm a coluna data_atualizacao usada no MERGE.
+
+Cada estágio tem seu próprio checkpoint. O trigger pode ser um intervalo
+("1 minute"), "availableNow" (processa o que houver e para) ou "once".
+
+Exemplo (local, com diretório temporário):
+    caminhos = caminhos_locais(tempfile.mkdtemp())
+    executar_disponivel(spark, caminhos)
+    print(metricas())
+"""
+
+import logging
+import os
+import time
+from collections import deque, namedtuple
+
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    DateType, DoubleType, IntegerType, StringType, StructField, StructType,
+)
+from pyspark.sql.window import Window
+
+from .indice import atualizar_indice
+
+logger = logging.getLogger(__name__)
+
+CaminhosStreaming = namedtuple(
+    "CaminhosStreaming", ["landing", "processado", "bronze", "silver", "gold", "checkpoints"]
+)
+
+CAMINHOS_LHDW = CaminhosStreaming(
+    landing="/mnt/lhdw/landingzone/vendas/processar",
+    processado="/mnt/lhdw/landingzone/vendas/processado",
+    bronze="/mnt/lhdw/bronze/vendas_stream",
+    silver="/mnt/lhdw/silver/vendas_stream",
+    gold="/mnt/lhdw/gold/vendas_stream",
+    checkpoints="/mnt/lhdw/checkpoints/vendas",
+)
+
+# Esquema dos CSVs da landing zone (mesmo do 002 Load Bronze)
+SCHEMA_LZ = StructType([
+    StructField("IDProduto", IntegerType(), True),
+    StructField("Data", DateType(), True),
+    StructField("IDCliente", IntegerType(), True),
+    StructField("IDCampanha", IntegerType(), True),
+    StructField("Unidades", IntegerType(), True),
+    StructField("Produto", StringType(), True),
+    StructField("Categoria", StringType(), True),
+    StructField("Segmento", StringType(), True),
+    StructField("IDFabricante", IntegerType(), True),
+    StructField("Fabricante", StringType(), True),
+    StructField("CustoUnitario", DoubleType(), True),
+    StructField("PrecoUnitario", DoubleType(), True),
+    StructField("CodigoPostal", StringType(), True),
+    StructField("EmailNome", StringType(), True),
+    StructField("Cidade", StringType(), True),
+    StructField("Estado", StringType(), True),
+    StructField("Regiao", StringType(), True),
+    StructField("Distrito", StringType(), True),
+    StructField("Pais", StringType(), True),
+])
+
+COLUNAS_GEOGRAFIA = ["Cidade", "Estado", "Regiao", "Distrito", "Pais", "CodigoPostal"]
+
+# Dimensão: (chaves naturais, atributos, coluna SK)
+DIMENSOES = {
+    "dim_produto": (["IDProduto"], ["Produto", "Categoria"], "sk_produto"),
+    "dim_categoria": (["Categoria"], [], "sk_categoria"),
+    "dim_segmento": (["Segmento"], [], "sk_segmento"),
+    "dim_fabricante": (["IDFabricante"], ["Fabricante"], "sk_fabricante"),
+    "dim_geografia": (COLUNAS_GEOGRAFIA, [], "sk_geografia"),
+    "dim_cliente": (["IDCliente"], ["Nome", "Email", "sk_geografia"], "sk_cliente"),
+}
+
+# Queries e latências do foreachBatch do pipeline corrente, para metricas().
+# Zeradas por iniciar_pipeline/executar_disponivel; os limites valem para
+# quem só chama iniciar_* ou deixa o pipeline rodando por muito tempo
+_MAX_CONSULTAS = 50
+_MAX_LOTES_GOLD = 1000
+_consultas = deque(maxlen=_MAX_CONSULTAS)
+_metricas_gold = deque(maxlen=_MAX_LOTES_GOLD)
+
+
+def caminhos_locais(base):
+    """Mesma estrutura de CAMINHOS_LHDW dentro de um diretório local (testes)."""
+    return CaminhosStreaming(*[os.path.join(base, *c.split("/")[-2:]) for c in CAMINHOS_LHDW])
+
+
+# =====================================
+# TRANSFORMAÇÕES (batch ou streaming)
+# =====================================
+
+def transformar_bronze(df):
+    return df.withColumn("filename", F.regexp_extract(F.input_file_name(), "([^/]+)$", 0)) \
+        .withColumn("Ano", F.year("Data")) \
+        .withColumn("Mes", F.month("Data"))
+
+
+def transformar_silver(df):
+    return df.withColumn("Data", F.to_date(F.col("Data"), "yyyy-MM-dd")) \
+        .withColumn("Email", F.lower(F.expr("regexp_replace(split(EmailNome, ':')[0], '[()]', '')"))) \
+        .withColumn("Nome", F.expr("split(split(EmailNome, ':')[1], ', ')")) \
+        .withColumn("Nome", F.expr("concat(Nome[1], ' ', Nome[0])")) \
+        .withColumn("Cidade", F.expr("split(Cidade, ',')[0]")) \
+        .withColumn("PrecoUnitario", F.format_number(F.col("PrecoUnitario"), 2)) \
+        .withColumn("CustoUnitario", F.format_number(F.col("CustoUnitario"), 2)) \
+        .withColumn("TotalVendas", F.format_number(F.col("PrecoUnitario") * F.col("Unidades"), 2)) \
+        .drop("EmailNome") \
+        .drop("IdCampanha")
+
+
+def _iniciar(writer, trigger, caminho=None):
+    if trigger == "availableNow":
+        writer = writer.trigger(availableNow=True)
+    elif trigger == "once":
+        writer = writer.trigger(once=True)
+    else:
+        writer = writer.trigger(processingTime=trigger)
+    query = writer.start(caminho) if caminho else writer.start()
+    _consultas.append(query)
+    return query
+
+
+# =====================================
+# ESTÁGIOS
+# =====================================
+
+def iniciar_bronze(spark, caminhos, trigger="1 minute", max_arquivos_por_lote=100):
+    df = spark.readStream \
+        .schema(SCHEMA_LZ) \
+        .option("header", "true") \
+        .option("maxFilesPerTrigger", max_arquivos_por_lote) \
+        .option("cleanSource", "archive") \
+        .option("sourceArchiveDir", caminhos.processado) \
+        .csv(caminhos.landing)
+    writer = transformar_bronze(df).writeStream \
+        .queryName("vendas_bronze") \
+        .format("delta") \
+        .outputMode("append") \
+        .partitionBy("Ano", "Mes") \
+        .option("checkpointLocation", f"{caminhos.checkpoints}/bronze")
+    return _iniciar(writer, trigger, caminhos.bronze)
+
+
+def iniciar_silver(spark, caminhos, trigger="1 minute"):
+    df = spark.readStream.format("delta").load(caminhos.bronze)
+    writer = transformar_silver(df).writeStream \
+        .queryName("vendas_silver") \
+        .format("delta") \
+        .outputMode("append") \
+        .partitionBy("Ano", "Mes") \
+        .option("checkpointLocation", f"{caminhos.checkpoints}/silver")
+    return _iniciar(writer, trigger, caminhos.silver)
+
+
+def _upsert_dimensao(spark, lote, gold_path, tb_destino, chaves, atributos, sk):
+    """MERGE do lote na dimensão: chaves novas ganham SK = max(SK) + n e chaves
+    existentes têm os atributos atualizados quando algum deles mudou."""
+    from delta.tables import DeltaTable
+
+    caminho = f"{gold_path}/{tb_destino}"
+    novos = lote.select(*chaves, *atributos).dropDuplicates(chaves)
+
+    if not DeltaTable.isDeltaTable(spark, caminho):
+        novos.withColumn(sk, F.row_number().over(Window.orderBy(*chaves)).cast("long")) \
+            .withColumn("data_atualizacao", F.current_timestamp()) \
+            .write.format("delta").mode("overwrite").save(caminho)
+        return spark.read.format("delta").load(caminho)
+
+    destino = DeltaTable.forPath(spark, caminho)
+    atual = destino.toDF()
+    max_sk = atual.agg(F.max(sk)).collect()[0][0] or 0
+    # SK numerada só entre as chaves que ainda não estão na dimensão
+    existentes = atual.select(*[F.col(c).alias(f"_t_{c}") for c in chaves]).withColumn("_existe", F.lit(True))
+    junta = None
+    for c in chaves:
+        igual = F.col(c).eqNullSafe(F.col(f"_t_{c}"))
+        junta = igual if junta is None else junta & igual
+    novos = novos.join(existentes, junta, "left") \
+        .withColumn(sk, F.when(
+            F.col("_existe").isNull(),
+            F.row_number().over(Window.partitionBy("_existe").orderBy(*chaves)) + F.lit(max_sk),
+        ).cast("long")) \
+        .withColumn("data_atualizacao", F.current_timestamp()) \
+        .select(*chaves, *atributos, sk, "data_atualizacao")
+
+    # O MERGE protege contra chaves inseridas por um lote concorrente/reprocessado
+    condicao = " AND ".join(f"t.`{c}` <=> s.`{c}`" for c in chaves)
+    merge = destino.alias("t").merge(novos.alias("s"), condicao)
+    if atributos:
+        # Lote reprocessado com os mesmos atributos não reescreve a linha
+        mudou = " OR ".join(f"NOT (t.`{a}` <=> s.`{a}`)" for a in atributos)
+        merge = merge.whenMatchedUpdate(
+            condition=mudou,
+            set={**{f"`{a}`": f"s.`{a}`" for a in atributos}, "data_atualizacao": "s.data_atualizacao"},
+        )
+    merge.whenNotMatchedInsertAll().execute()
+    return spark.read.format("delta").load(caminho)
+
+
+def processar_lote_gold(spark, gold_path, app_id="vendas_gold", indices=None):
+    """Função para foreachBatch: dimensões por MERGE e fato por append idempotente.
+
+    indices: {tabela: colunas} cujos índices de salto (utils.indice) são
+    atualizados depois de cada lote.
+    """
+    def processar(lote, batch_id):
+        inicio = time.perf_counter()
+        lote = lote.persist()
+        try:
+            linhas = lote.count()
+            if linhas == 0:
+                return
+            dims = {}
+            for tb in ["dim_produto", "dim_categoria", "dim_segmento", "dim_fabricante", "dim_geografia"]:
+                chaves, atributos, sk = DIMENSOES[tb]
+                dims[tb] = _upsert_dimensao(spark, lote, gold_path, tb, chaves, atributos, sk)
+
+            # Cliente precisa da SK de geografia
+            clientes = lote.join(F.broadcast(dims["dim_geografia"].select(*COLUNAS_GEOGRAFIA, "sk_geografia")),
+                                 COLUNAS_GEOGRAFIA, "left")
+            chaves, atributos, sk = DIMENSOES["dim_cliente"]
+            dims["dim_cliente"] = _upsert_dimensao(spark, clientes, gold_path, "dim_cliente", chaves, atributos, sk)
+
+            fato = lote.alias("s")
+            for tb, (chaves, _, sk) in DIMENSOES.items():
+                if tb == "dim_geografia":
+                    continue
+                fato = fato.join(F.broadcast(dims[tb].select(*chaves, sk)), chaves)
+            fato = fato.select(
+                F.col("s.Data").alias("DataVenda"),
+                "sk_produto", "sk_categoria", "sk_segmento", "sk_fabricante", "sk_cliente",
+                "Unidades", F.col("s.PrecoUnitario"), F.col("s.CustoUnitario"), F.col("s.TotalVendas"),
+                F.current_timestamp().alias("data_atualizacao"),
+            )
+            # txnAppId + txnVersion: o Delta ignora o append se este batch_id já foi gravado
+            fato.withColumn("Ano", F.year("DataVenda")) \
+                .withColumn("Mes", F.month("DataVenda")) \
+                .write.format("delta") \
+                .mode("append") \
+                .option("txnAppId", app_id) \
+                .option("txnVersion", batch_id) \
+                .option("mergeSchema", "true") \
+                .partitionBy("Ano", "Mes") \
+                .save(f"{gold_path}/fato_vendas")
+            for tb, colunas in (indices or {}).items():
+                atualizar_indice(spark, f"{gold_path}/{tb}", colunas)
+        finally:
+            lote.unpersist()
+        latencia = time.perf_counter() - inicio
+        _metricas_gold.append({"batch_id": batch_id, "linhas": linhas, "latencia_s": latencia})
+        logger.info("Gold: lote %s com %d linhas em %.1fs", batch_id, linhas, latencia)
+    return processar
+
+
+def iniciar_gold(spark, caminhos, trigger="1 minute", indices=None):
+    df = spark.readStream.format("delta").load(caminhos.silver)
+    writer = df.writeStream \
+        .queryName("vendas_gold") \
+        .foreachBatch(processar_lote_gold(spark, caminhos.gold, indices=indices)) \
+        .option("checkpointLocation", f"{caminhos.checkpoints}/gold")
+    return _iniciar(writer, trigger)
+
+
+# =====================================
+# ORQUESTRAÇÃO E MÉTRICAS
+# =====================================
+
+def _reiniciar_metricas():
+    _consultas.clear()
+    _metricas_gold.clear()
+
+
+def iniciar_pipeline(spark, caminhos=CAMINHOS_LHDW, trigger="1 minute"):
+    """Inicia os três estágios em paralelo, contínuos. Retorna {estágio: query}."""
+    _reiniciar_metricas()
+    return {
+        "bronze": iniciar_bronze(spark, caminhos, trigger),
+        "silver": iniciar_silver(spark, caminhos, trigger),
+        "gold": iniciar_gold(spark, caminhos, trigger),
+    }
+
+
+def executar_disponivel(spark, caminhos=CAMINHOS_LHDW):
+    """Processa tudo o que estiver disponível, estágio por estágio, e para (availableNow)."""
+    _reiniciar_metricas()
+    for iniciar in (iniciar_bronze, iniciar_silver, iniciar_gold):
+        query = iniciar(spark, caminhos, trigger="availableNow")
+        query.awaitTermination()
+
+
+def metricas():
+    """Latência por micro-lote do último pipeline iniciado e do foreachBatch gold.
+
+    Cobre as queries desde o último iniciar_pipeline/executar_disponivel (no
+    máximo os _MAX_LOTES_GOLD lotes gold mais recentes). Retorna uma lista de dicionários com query, batch_id, linhas de entrada,
+    duração do trigger (ms) e linhas/segundo.
+    """
+    linhas = []
+    for query in _consultas:
+        for progresso in query.recentProgress:
+            linhas.append({
+                "query": progresso.get("name"),
+                "batch_id": progresso.get("batchId"),
+                "linhas": progresso.get("numInputRows"),
+                "duracao_ms": progresso.get("durationMs", {}).get("triggerExecution"),
+                "linhas_por_segundo": progresso.get("processedRowsPerSecond"),
+            })
+    linhas.extend(
+        {
+            "query": "vendas_gold_foreachBatch",
+            "batch_id": m["batch_id"],
+            "linhas": m["linhas"],
+            "duracao_ms": 1000 * m["latencia_s"],
+            "linhas_por_segundo": m["linhas"] / m["latencia_s"] if m["latencia_s"] else None,
+        }
+        for m in _metricas_gold
+    )
+    return linhas
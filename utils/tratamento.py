@@ -1,21 +1,87 @@
+"""Limpeza de CNPJ e de textos livres.
+
+As funções puras (tratar_cnpj, tratar_string e as versões vetorizadas para
+pandas) não dependem do PySpark. As UDFs são criadas só no primeiro acesso e
+reaproveitadas, então importar este módulo num script pandas, num teste ou
+num worker Python não carrega o PySpark.
+
+Exemplo:
+    from utils.tratamento import tratar_cnpj, tratar_cnpj_udf
+    tratar_cnpj("12345678000195")                  # '12.345.678/0001-95'
+    df.withColumn("document_number", tratar_cnpj_udf(F.col("cnpj")))
+"""
+
 # Salve o código abaixo em um arquivo chamado tratamento.py dentro da pasta utils do seu workspace Databricks
 
 import re
-from pyspark.sql.functions import udf
-from pyspark.sql.types import StringType
+import threading
+
+_NAO_DIGITO = re.compile(r'\D')
+_NAO_ALFANUMERICO = re.compile(r'[^A-Z0-9 ]')
+
 
 def tratar_cnpj(cnpj):
     if cnpj is None:
         return None
-    cnpj_num = re.sub(r'\D', '', cnpj)
+    cnpj_num = _NAO_DIGITO.sub('', cnpj)
     return f"{cnpj_num[:2]}.{cnpj_num[2:5]}.{cnpj_num[5:8]}/{cnpj_num[8:12]}-{cnpj_num[12:14]}" if len(cnpj_num) == 14 else ""
 
+
 def tratar_string(valor):
     if valor is None:
         return None
     valor = valor.strip().upper()
-    valor = re.sub(r'[^A-Z0-9 ]', '', valor)
+    valor = _NAO_ALFANUMERICO.sub('', valor)
     return valor
 
-tratar_cnpj_udf = udf(tratar_cnpj, StringType())
-tratar_string_udf = udf(tratar_string, StringType())
\ No newline at end of file
+
+def tratar_cnpj_serie(serie):
+    """tratar_cnpj sobre uma pandas.Series inteira (nulos continuam nulos)."""
+    digitos = serie.str.replace(r'\D', '', regex=True)
+    formatado = digitos.str.replace(r'^(\d{2})(\d{3})(\d{3})(\d{4})(\d{2})$', r'\1.\2.\3/\4-\5', regex=True)
+    return formatado.where(digitos.str.len() == 14, "").where(serie.notna(), None)
+
+
+def tratar_string_serie(serie):
+    """tratar_string sobre uma pandas.Series inteira (nulos continuam nulos)."""
+    return serie.str.strip().str.upper().str.replace(r'[^A-Z0-9 ]', '', regex=True)
+
+
+# =====================================
+# UDFs SPARK (criadas no primeiro acesso)
+# =====================================
+
+def _criar_udf(funcao):
+    from pyspark.sql.functions import udf
+    from pyspark.sql.types import StringType
+
+    return udf(funcao, StringType())
+
+
+def _criar_pandas_udf(funcao_serie):
+    from pyspark.sql.functions import pandas_udf
+
+    return pandas_udf(funcao_serie, "string")
+
+
+_FABRICAS = {
+    "tratar_cnpj_udf": lambda: _criar_udf(tratar_cnpj),
+    "tratar_string_udf": lambda: _criar_udf(tratar_string),
+    "tratar_cnpj_pandas_udf": lambda: _criar_pandas_udf(tratar_cnpj_serie),
+    "tratar_string_pandas_udf": lambda: _criar_pandas_udf(tratar_string_serie),
+}
+_udfs = {}
+_trava = threading.Lock()
+
+
+def __getattr__(nome):
+    if nome not in _FABRICAS:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    with _trava:
+        if nome not in _udfs:
+            _udfs[nome] = _FABRICAS[nome]()
+    return _udfs[nome]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_FABRICAS))